@@ -1,6 +1,24 @@
-from servidor_word_final import app
+"""Punto de entrada desde la raíz del repositorio.
+
+El servidor es backend/app.py (ver backend/README.md). En producción se levanta desde
+backend/ con el comando del Procfile (gunicorn con gunicorn.conf.py); este archivo
+solo carga esa misma app para quien corra `python app.py` o `gunicorn app:app` aquí.
+"""
+import importlib.util
+import os
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, BACKEND)
+
+# Se carga con el nombre 'app' para que gunicorn.conf.py y los motores encuentren el mismo módulo
+_spec = importlib.util.spec_from_file_location('app', os.path.join(BACKEND, 'app.py'))
+servidor = importlib.util.module_from_spec(_spec)
+sys.modules['app'] = servidor
+_spec.loader.exec_module(servidor)
+app = servidor.app
 
 if __name__ == '__main__':
-    import os
     port = int(os.environ.get('PORT', 5000))
+    servidor.calentar()
     app.run(debug=False, host='0.0.0.0', port=port)
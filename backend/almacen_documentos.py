@@ -0,0 +1,164 @@
+"""Almacén de documentos generados en disco, direccionado por contenido.
+
+Cada documento se guarda con su clave (el hash de cache_documentos, que también es su
+ETag) en `<directorio>/<ab>/<cd>/<clave>.docx`: los dos primeros niveles son los
+primeros caracteres del hash, para que ningún directorio junte demasiados archivos.
+Como la clave no cambia para los mismos bytes, un archivo ya guardado no se vuelve a
+escribir, y `GET /documentos/<clave>` puede servirlo con sendfile y rangos.
+
+El total se acota a `max_bytes`: al pasarse se borran los menos usados. El índice
+(clave -> tamaño, en orden de uso) vive en memoria y se reconstruye al arrancar con
+los archivos del directorio, ordenados por fecha de modificación; leer un documento
+la actualiza, así que el orden sobrevive a un reinicio. Cada proceso lleva su propio
+índice: con varios workers sobre el mismo directorio el límite es aproximado y un
+archivo borrado por otro proceso se trata como ausente.
+"""
+from collections import OrderedDict
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Hash SHA-256 en hexadecimal, con el sufijo del nivel de compresión si no es el predeterminado
+CLAVE_VALIDA = re.compile(r'[0-9a-f]{64}(?:-z[0-9])?')
+EXTENSION = '.docx'
+
+
+class AlmacenDocumentos:
+    """Documentos por clave en `directorio`, hasta `max_bytes` en total ('' o 0 lo deshabilitan)"""
+
+    def __init__(self, directorio, max_bytes):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._indice = OrderedDict()  # clave -> tamaño, del menos al más usado
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.expulsiones = 0
+        if self.habilitado:
+            os.makedirs(directorio, exist_ok=True)
+            self._cargar()
+
+    @property
+    def habilitado(self):
+        return bool(self.directorio) and self.max_bytes > 0
+
+    def ruta(self, clave):
+        return os.path.join(self.directorio, clave[:2], clave[2:4], clave + EXTENSION)
+
+    def _cargar(self):
+        archivos = []
+        for raiz, _, nombres in os.walk(self.directorio):
+            for nombre in nombres:
+                clave, extension = os.path.splitext(nombre)
+                if extension != EXTENSION or not CLAVE_VALIDA.fullmatch(clave):
+                    continue  # temporales de escrituras interrumpidas y archivos ajenos
+                try:
+                    estado = os.stat(os.path.join(raiz, nombre))
+                except FileNotFoundError:
+                    continue
+                archivos.append((estado.st_mtime, clave, estado.st_size))
+        for _, clave, tamano in sorted(archivos):
+            self._indice[clave] = tamano
+            self._bytes += tamano
+        with self._lock:
+            self._recolectar()
+        logger.info("Almacén de documentos cargado", extra={'campos': {
+            'directorio': self.directorio, 'documentos': len(self._indice), 'bytes': self._bytes
+        }})
+
+    def contiene(self, clave):
+        with self._lock:
+            return clave in self._indice
+
+    def abrir(self, clave):
+        """(archivo, tamaño) del documento abierto para lectura, o None si no está.
+        Cuenta como uso para la recolección"""
+        if not self.habilitado or not CLAVE_VALIDA.fullmatch(clave):
+            return None
+        with self._lock:
+            if clave not in self._indice:
+                return None
+            self._indice.move_to_end(clave)
+        ruta = self.ruta(clave)
+        try:
+            archivo = open(ruta, 'rb')
+            os.utime(archivo.fileno())
+        except FileNotFoundError:
+            self._olvidar(clave)
+            return None
+        return archivo, os.fstat(archivo.fileno()).st_size
+
+    def leer(self, clave):
+        """Bytes del documento, o None si no está"""
+        abierto = self.abrir(clave)
+        if abierto is None:
+            return None
+        with abierto[0] as archivo:
+            return archivo.read()
+
+    def guardar(self, clave, contenido):
+        """Guarda los bytes del documento si aún no está"""
+        self._escribir(clave, len(contenido), lambda destino: destino.write(contenido))
+
+    def guardar_archivo(self, clave, archivo, tamano):
+        """Copia un documento desde un archivo abierto (desde su inicio) y lo deja como estaba"""
+        def copiar(destino):
+            archivo.seek(0)
+            shutil.copyfileobj(archivo, destino)
+            archivo.seek(0)
+        self._escribir(clave, tamano, copiar)
+
+    def _escribir(self, clave, tamano, escribir):
+        if not self.habilitado or tamano > self.max_bytes or self.contiene(clave):
+            return
+        directorio = os.path.dirname(self.ruta(clave))
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            # Se escribe a un temporal y se renombra: nunca se ve un documento a medias
+            descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'wb') as destino:
+                    escribir(destino)
+                os.replace(temporal, self.ruta(clave))
+            except BaseException:
+                os.unlink(temporal)
+                raise
+        except OSError:
+            # Sin espacio o sin permisos el documento igual se entrega; solo no queda guardado
+            logger.warning("No se pudo guardar el documento en el almacén", exc_info=True)
+            return
+        with self._lock:
+            if clave not in self._indice:
+                self._indice[clave] = tamano
+                self._bytes += tamano
+            self._recolectar()
+
+    def _recolectar(self):
+        # Con el lock tomado: borra los menos usados hasta caber en el límite
+        while self._bytes > self.max_bytes:
+            clave, tamano = self._indice.popitem(last=False)
+            self._bytes -= tamano
+            self.expulsiones += 1
+            try:
+                os.unlink(self.ruta(clave))
+            except FileNotFoundError:
+                pass
+
+    def _olvidar(self, clave):
+        with self._lock:
+            tamano = self._indice.pop(clave, None)
+            if tamano is not None:
+                self._bytes -= tamano
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'documentos': len(self._indice),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'expulsiones': self.expulsiones,
+            }
@@ -1,405 +1,1074 @@
-from flask import Flask, request, jsonify, send_file
-from docx import Document
-from docx.shared import Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.table import WD_TABLE_ALIGNMENT
-from docx.oxml.shared import OxmlElement, qn
+import time
+
+# La carga de la app se mide desde aquí hasta el final del módulo (ver DURACION_CARGA)
+_inicio_carga = time.perf_counter()
+
+from flask import Flask, Response, g, has_request_context, request, jsonify, send_file, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge, RequestedRangeNotSatisfiable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from io import BytesIO
+import hashlib
+import hmac
+import importlib
+import json
 import logging
+import os
+
+from planeacion import (
+    MODALIDADES, MODALIDADES_CONFIG, NOMBRES_MODALIDADES, PLANEACION_CALENTAMIENTO, Fases, buscar_modalidad,
+    nombre_modalidad, es_modalidad_simplificada, resolver_momentos
+)
+from modelo import compilar_planeacion
+from paquete_docx import RUTA_PLANTILLA, validar_nivel
+from esquema import ErrorEsquema, compilar_esquema, leer_json
+import bitacora
+from metricas import BUCKETS_BYTES, BUCKETS_FASES, BUCKETS_MEMORIA, RegistroMetricas
+import perfilado
+from perfilado import FORMATOS as FORMATOS_PERFIL, FormatoNoDisponible, PerfilesLentos
+from cache_documentos import CacheDocumentos, clave_documento
+from almacen_documentos import AlmacenDocumentos
+from envio_documentos import ArchivoObservado, enviar_por_partes, generar_en_spool
+from lotes import leer_ndjson, resultados_en_orden, zip_por_partes
+from pool_render import PoolRender, PoolSaturado
+from vuelos import RegistroIdempotencia, VuelosEnCurso
+import memoria
+from memoria import GobernadorMemoria, MemoriaInsuficiente, rango_tamano
+from trabajos import GestorTrabajos, ColaTrabajosLlena, TERMINADO, FALLIDO
+import motor_vista
 
 app = Flask(__name__)
 
-# Configurar logging para evitar problemas con WSGI servers
-logging.basicConfig(level=logging.INFO)
+# Nivel de zlib del zip de los documentos (0 los guarda sin comprimir: menos CPU, más
+# bytes). LOTE_COMPRESION es el de los documentos de POST /generar-word/batch
+COMPRESION_WORD = validar_nivel(int(os.environ.get('COMPRESION_WORD', '6')))
+LOTE_COMPRESION = validar_nivel(int(os.environ.get('LOTE_COMPRESION', str(COMPRESION_WORD))))
+
+def motor_perezoso(nombre):
+    """generar_documento de motor_<nombre>, que se importa en la primera llamada.
+
+    Los motores cargan python-docx/lxml y arman sus esqueletos o plantillas al
+    importarse; así /, /test y /modalidades responden sin pagar ese costo (ver calentar).
+    Sin `compresion` se usa COMPRESION_WORD"""
+    def generar_documento(data, modalidad, destino, tiempos=None, compresion=None):
+        return importlib.import_module(f'motor_{nombre}').generar_documento(
+            data, modalidad, destino, tiempos, COMPRESION_WORD if compresion is None else compresion)
+    return generar_documento
+
+# Motores disponibles para generar el Word; se elige con la variable de entorno MOTOR_WORD
+MOTORES_WORD = {nombre: motor_perezoso(nombre) for nombre in ('docx', 'ooxml', 'plantilla')}
+MOTOR_WORD = os.environ.get('MOTOR_WORD', 'docx')
+if MOTOR_WORD not in MOTORES_WORD:
+    raise ValueError(f"MOTOR_WORD '{MOTOR_WORD}' no válido, opciones: {list(MOTORES_WORD)}")
+
+def version_motor(nombre):
+    """Lo que, además de la solicitud, decide los bytes del documento: el motor y, con
+    `plantilla`, el hash del archivo de la plantilla. Entra en la clave de los
+    documentos, así que al cambiar de motor o de plantilla ni la cache, ni el almacén
+    en disco, ni un ETag de antes sirven el documento viejo"""
+    if nombre != 'plantilla':
+        return nombre
+    with open(RUTA_PLANTILLA, 'rb') as plantilla:
+        return f"{nombre}:{hashlib.sha256(plantilla.read()).hexdigest()[:16]}"
+
+VERSION_MOTOR = version_motor(MOTOR_WORD)
+
+# Cache de documentos ya generados (0 en cualquier límite la deshabilita)
+cache_documentos = CacheDocumentos(
+    max_bytes=int(os.environ.get('CACHE_DOCUMENTOS_MAX_MB', '64')) * 1024 * 1024,
+    max_entradas=int(os.environ.get('CACHE_DOCUMENTOS_MAX_ENTRADAS', '256')),
+    ttl=int(os.environ.get('CACHE_DOCUMENTOS_TTL', '600'))
+)
+
+# Almacén de documentos en disco (almacen_documentos.py) que sirve GET /documentos/<clave>;
+# deshabilitado sin ALMACEN_DOCUMENTOS_DIR. Al pasar ALMACEN_DOCUMENTOS_MAX_MB se borran
+# los menos usados
+almacen_documentos = AlmacenDocumentos(
+    directorio=os.environ.get('ALMACEN_DOCUMENTOS_DIR', ''),
+    max_bytes=int(os.environ.get('ALMACEN_DOCUMENTOS_MAX_MB', '512')) * 1024 * 1024
+)
+
+# Solicitudes idénticas (vuelos.py): las que llegan mientras se genera el mismo documento
+# esperan sus bytes. Con el encabezado Idempotency-Key la respuesta se recuerda además
+# IDEMPOTENCIA_TTL segundos después de terminar (0 lo deshabilita)
+vuelos = VuelosEnCurso()
+idempotencia = RegistroIdempotencia(
+    ttl=int(os.environ.get('IDEMPOTENCIA_TTL', '60')),
+    max_entradas=int(os.environ.get('IDEMPOTENCIA_MAX_ENTRADAS', '128')),
+    max_bytes=int(os.environ.get('IDEMPOTENCIA_MAX_MB', '16')) * 1024 * 1024
+)
+IDEMPOTENCIA_MAX_LLAVE = 255
+
+# Pool de procesos generadores (RENDER_PROCESOS=0 genera en el hilo de la solicitud)
+pool_render = PoolRender(
+    procesos=int(os.environ.get('RENDER_PROCESOS', '0')),
+    max_cola=int(os.environ.get('RENDER_COLA_MAX', '8')),
+    trabajos_por_proceso=int(os.environ.get('RENDER_TRABAJOS_POR_PROCESO', '200')),
+    motor=MOTOR_WORD,
+    timeout=int(os.environ.get('RENDER_TIMEOUT', '110'))
+)
+RENDER_RETRY_AFTER = int(os.environ.get('RENDER_RETRY_AFTER', '2'))
+
+# Memoria del worker (memoria.py). Un render en el hilo de la solicitud reserva
+# MEMORIA_RENDER_BASE_MB más MEMORIA_RENDER_FACTOR veces el tamaño de la planeación; si
+# con eso la RSS pasaría MEMORIA_LIMITE_MB espera hasta MEMORIA_ESPERA segundos y luego
+# responde 503. Pasando MEMORIA_RECICLAR_MB el worker se recicla (ver gunicorn.conf.py,
+# que también lee MEMORIA_MAX_SOLICITUDES). MEMORIA_MUESTREO=N mide el pico de 1 de
+# cada N documentos. 0 deshabilita cada parte
+gobernador_memoria = GobernadorMemoria(
+    limite=int(os.environ.get('MEMORIA_LIMITE_MB', '0')) * 1024 * 1024,
+    reciclar_en=int(os.environ.get('MEMORIA_RECICLAR_MB', '0')) * 1024 * 1024,
+    base=int(os.environ.get('MEMORIA_RENDER_BASE_MB', '8')) * 1024 * 1024,
+    factor=int(os.environ.get('MEMORIA_RENDER_FACTOR', '12')),
+    espera=float(os.environ.get('MEMORIA_ESPERA', '10')),
+    muestreo=int(os.environ.get('MEMORIA_MUESTREO', '10'))
+)
+
+# Pool para generar los documentos de POST /generar-word/batch
+LOTE_HILOS = int(os.environ.get('LOTE_HILOS', '2'))
+LOTE_MAX_DOCUMENTOS = int(os.environ.get('LOTE_MAX_DOCUMENTOS', '100'))
+pool_lotes = ThreadPoolExecutor(max_workers=LOTE_HILOS, thread_name_prefix='lote')
+
+# Trabajos asíncronos de POST /jobs
+TRABAJOS_ESPERA_MAXIMA = int(os.environ.get('TRABAJOS_ESPERA_MAXIMA', '30'))
+
+# Cómo se envía el documento de POST /generar-word cuando se genera en el hilo de la solicitud:
+# 'memoria' (BytesIO), 'spool' (a disco arriba de RESPUESTA_UMBRAL_KB) o 'partes' (por partes)
+RESPUESTA_WORD = os.environ.get('RESPUESTA_WORD', 'spool')
+if RESPUESTA_WORD not in ('memoria', 'spool', 'partes'):
+    raise ValueError(f"RESPUESTA_WORD '{RESPUESTA_WORD}' no válido, opciones: ['memoria', 'spool', 'partes']")
+RESPUESTA_UMBRAL = int(os.environ.get('RESPUESTA_UMBRAL_KB', '1024')) * 1024
+
+# Perfilado del render (perfilado.py). Sin ADMIN_TOKEN no se pueden pedir perfiles ni
+# consultar /admin/perfiles. PERFIL_MUESTREO=N perfila 1 de cada N documentos y guarda
+# los PERFIL_GUARDAR más lentos (0 lo deshabilita)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+perfiles_lentos = PerfilesLentos(
+    cada=int(os.environ.get('PERFIL_MUESTREO', '0')),
+    maximo=int(os.environ.get('PERFIL_GUARDAR', '10'))
+)
+PERFIL_MUESTREO_FORMATO = os.environ.get('PERFIL_MUESTREO_FORMATO', 'pstats')
+if PERFIL_MUESTREO_FORMATO not in FORMATOS_PERFIL:
+    raise ValueError(f"PERFIL_MUESTREO_FORMATO '{PERFIL_MUESTREO_FORMATO}' no válido, opciones: {list(FORMATOS_PERFIL)}")
+
+# Límites de las solicitudes. MAX_CONTENT_LENGTH_MB acota cualquier cuerpo (también los
+# lotes) antes de leerlo; una planeación además no puede pasar de PLANEACION_MAX_KB, y el
+# esquema limita los caracteres de cada texto y los elementos de cada lista
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH_MB', '16')) * 1024 * 1024
+PLANEACION_MAX_BYTES = int(os.environ.get('PLANEACION_MAX_KB', '512')) * 1024
+esquema_planeacion = compilar_esquema(
+    max_texto=int(os.environ.get('PLANEACION_MAX_TEXTO', '20000')),
+    max_elementos=int(os.environ.get('PLANEACION_MAX_ELEMENTOS', '500'))
+)
+
+MIMETYPE_DOCX = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+# Vistas previas de POST /generar-word (?format= o Accept): formato -> (mimetype, motor
+# que recibe el modelo compilado de la planeación)
+VISTAS_PREVIAS = {
+    'html': ('text/html', motor_vista.generar_html),
+    'json': ('application/json', motor_vista.generar_json),
+}
+
+# Logging estructurado: un registro por solicitud y la escritura en un hilo aparte.
+# LOG_MUESTREO_DEBUG es la fracción de solicitudes cuyo detalle de debug se registra
+LOG_MUESTREO_DEBUG = bitacora.configurar(
+    nivel=os.environ.get('LOG_NIVEL', 'INFO'),
+    tasa_debug=float(os.environ.get('LOG_MUESTREO_DEBUG', '0')),
+    formato=os.environ.get('LOG_FORMATO', 'json')
+)
 logger = logging.getLogger(__name__)
 
+def campos_registro():
+    """Campos que la ruta agrega al registro de la solicitud en curso"""
+    if 'campos_registro' not in g:
+        g.campos_registro = {}
+    return g.campos_registro
+
+def tiempos_solicitud():
+    """Milisegundos por fase (json, esqueleto, tabla1..tabla5, guardar) de la solicitud en curso"""
+    if 'tiempos' not in g:
+        g.tiempos = {}
+    return g.tiempos
+
+# Métricas de GET /metrics. SERVER_TIMING=0 deja de enviar las fases en el encabezado Server-Timing
+metricas = RegistroMetricas()
+solicitudes_total = metricas.contador(
+    'plantcher_solicitudes_total', 'Solicitudes atendidas por ruta, método y código', ('ruta', 'metodo', 'estado'))
+errores_total = metricas.contador(
+    'plantcher_errores_total', 'Respuestas con código 5xx por ruta', ('ruta',))
+solicitudes_en_curso = metricas.medidor(
+    'plantcher_solicitudes_en_curso', 'Solicitudes que se están atendiendo')
+duracion_solicitud = metricas.histograma(
+    'plantcher_solicitud_segundos', 'Tiempo de la vista hasta la respuesta, por ruta', ('ruta',))
+duracion_documento = metricas.histograma(
+    'plantcher_documento_segundos', 'Tiempo de POST /generar-word por modalidad', ('modalidad',))
+duracion_fase = metricas.histograma(
+    'plantcher_fase_segundos', 'Tiempo de cada fase de POST /generar-word (json, esqueleto, tabla1..tabla5, '
+    'guardar, envio)', ('fase',), buckets=BUCKETS_FASES)
+tamano_documento = metricas.histograma(
+    'plantcher_documento_bytes', 'Tamaño de los documentos enviados', buckets=BUCKETS_BYTES)
+tamano_solicitud = metricas.histograma(
+    'plantcher_solicitud_bytes', 'Tamaño del cuerpo de las solicitudes de documentos', buckets=BUCKETS_BYTES)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') != '0'
+solicitudes_coalescidas = metricas.contador(
+    'plantcher_solicitudes_coalescidas_total', 'Solicitudes de documentos atendidas con el resultado de otra: '
+    'en_curso (esperaron el mismo render) o idempotencia (repetidas con Idempotency-Key)', ('motivo',))
+pico_memoria = metricas.histograma(
+    'plantcher_memoria_pico_bytes', 'Pico de RSS del proceso sobre la inicial en las solicitudes muestreadas '
+    'de POST /generar-word (MEMORIA_MUESTREO) cuyo render corrió solo, por modalidad y tamaño del cuerpo',
+    ('modalidad', 'tamano'),
+    buckets=BUCKETS_MEMORIA)
+memoria_rss = metricas.medidor(
+    'plantcher_memoria_rss_bytes', 'RSS del worker al consultar /metrics')
+rechazos_memoria = metricas.contador(
+    'plantcher_memoria_rechazos_total', 'Renders rechazados por la guardia de memoria (MEMORIA_LIMITE_MB)')
+duracion_arranque = metricas.medidor(
+    'plantcher_arranque_segundos', 'Tiempo de arranque del proceso por etapa (carga de la app, calentamiento)',
+    ('etapa',))
+
+def etiqueta_modalidad(modalidad):
+    """Clave canónica de la modalidad para las etiquetas de las métricas: 'ABJ ' y
+    'aprendizaje basado en el juego' van a la misma serie"""
+    encontrada = buscar_modalidad(modalidad) if modalidad else None
+    return encontrada.clave if encontrada is not None else 'desconocida'
+
 @app.before_request
-def log_request_info():
-    try:
-        logger.info(f"SOLICITUD ENTRANTE: {request.method} {request.path}")
-        logger.info(f"IP Cliente: {request.remote_addr}")
-        if request.is_json:
-            logger.info("Tiene datos JSON: Sí")
-        else:
-            logger.info("Tiene datos JSON: No")
-    except Exception as e:
-        # Silenciar errores de logging
-        pass
+def iniciar_registro_solicitud():
+    g.inicio_solicitud = time.perf_counter()
+    bitacora.muestrear_solicitud(LOG_MUESTREO_DEBUG)
+    solicitudes_en_curso.inc()
+    g.en_curso = True
+    if request.method == 'POST' and request.endpoint == 'generar_word':
+        g.muestra_memoria = gobernador_memoria.muestrear()
 
-@app.after_request
-def after_request(response):
-    try:
-        logger.info(f"Respuesta enviada: {response.status_code}")
-    except Exception as e:
-        # Silenciar errores de logging
-        pass
-    return response
+@app.teardown_request
+def terminar_solicitud(error=None):
+    if g.pop('en_curso', False):
+        solicitudes_en_curso.dec()
+    muestra = g.pop('muestra_memoria', None)
+    if muestra is not None:
+        gobernador_memoria.terminar_muestra(muestra)  # la solicitud falló antes de registrarse
+    gobernador_memoria.solicitud_terminada()
 
-def set_table_borders(table):
-    """Aplica bordes negros a toda la tabla"""
-    tbl = table._tbl
-    tblPr = tbl.tblPr
-    
-    # Crear elemento de bordes
-    tblBorders = OxmlElement('w:tblBorders')
-    
-    # Definir todos los bordes (top, left, bottom, right, insideH, insideV)
-    border_types = ['top', 'left', 'bottom', 'right', 'insideH', 'insideV']
-    
-    for border_type in border_types:
-        border = OxmlElement(f'w:{border_type}')
-        border.set(qn('w:val'), 'single')  # Tipo de línea
-        border.set(qn('w:sz'), '4')        # Grosor (4 = 0.5pt)
-        border.set(qn('w:space'), '0')     # Espaciado
-        border.set(qn('w:color'), '000000') # Color negro
-        tblBorders.append(border)
-    
-    tblPr.append(tblBorders)
-    
-    # Centrar tabla
-    table.alignment = WD_TABLE_ALIGNMENT.CENTER
-
-def format_table_headers(table):
-    """Formatea los headers en negrita y centrados"""
-    if len(table.rows) > 0:
-        header_row = table.rows[0]
-        for cell in header_row.cells:
-            for paragraph in cell.paragraphs:
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                for run in paragraph.runs:
-                    run.font.bold = True
-                    run.font.size = Inches(0.12)  # 12pt
-
-def format_table_content(table):
-    """Formatea el contenido de las tablas"""
-    for row in table.rows[1:]:
-        for cell in row.cells:
-            for paragraph in cell.paragraphs:
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                for run in paragraph.runs:
-                    run.font.size = Inches(0.1)  # 10pt
-
-# Configuración de momentos para cada modalidad
-MODALIDADES_CONFIG = {
-    'abj': ['planteamiento_juego', 'desarrollo_actividades', 'compartamos_experiencia', 'comunidad_juego'],
-    'aprendizaje basado en el juego': ['planteamiento_juego', 'desarrollo_actividades', 'compartamos_experiencia', 'comunidad_juego'],
-    'centros': ['contacto_realidad', 'identificacion_integracion', 'expresion'],
-    'centros de interes': ['contacto_realidad', 'identificacion_integracion', 'expresion'],
-    'centros de interés': ['contacto_realidad', 'identificacion_integracion', 'expresion'],
-    'talleres': ['situacion_inicial', 'organizacion_acciones', 'puesta_marcha', 'valoramos_aprendido'],
-    'taller crítico': ['situacion_inicial', 'organizacion_acciones', 'puesta_marcha', 'valoramos_aprendido'],
-    'taller critico': ['situacion_inicial', 'organizacion_acciones', 'puesta_marcha', 'valoramos_aprendido'],
-    'rincones': ['punto_partida', 'asamblea_inicial', 'exploracion_rincones', 'exploracion_descubrimiento', 'compartimos_aprendido', 'evaluamos_experiencia'],
-    'rincones de aprendizaje': ['punto_partida', 'asamblea_inicial', 'exploracion_rincones', 'exploracion_descubrimiento', 'compartimos_aprendido', 'evaluamos_experiencia'],
-    'proyecto': ['punto_partida', 'planeacion', 'a_trabajar', 'comunicamos_logros', 'reflexion_aprendizaje'],
-    'unidad': ['lectura_realidad', 'identificacion_trama', 'planificacion', 'exploracion', 'participacion', 'conclusion'],
-    'unidad didactica': ['lectura_realidad', 'identificacion_trama', 'planificacion', 'exploracion', 'participacion', 'conclusion'],
-    'unidad didáctica': ['lectura_realidad', 'identificacion_trama', 'planificacion', 'exploracion', 'participacion', 'conclusion'],
-    # ✅ NUEVA MODALIDAD AGREGADA
-    'situacion didactica': ['inicio', 'desarrollo', 'cierre'],
-    'situación didáctica': ['inicio', 'desarrollo', 'cierre']
-}
+def observar_envio(inicio, tiempos, archivo):
+    """Al cerrar la respuesta: tiempo de envío y fases del render (en el modo 'partes' el
+    motor termina de escribir mientras se envía)"""
+    tiempos['envio'] = (time.perf_counter() - inicio) * 1000
+    for fase, ms in dict(tiempos).items():
+        duracion_fase.observar(ms / 1000, fase=fase)
+    if archivo is not None:
+        tamano_documento.observar(archivo.enviados)
 
-# Mapeo de nombres internos a nombres bonitos para mostrar en el Word
-NOMBRES_MOMENTOS = {
-    # ABJ
-    'planteamiento_juego': '1. Planteamiento del Juego',
-    'desarrollo_actividades': '2. Desarrollo de las Actividades', 
-    'compartamos_experiencia': '3. Compartamos la Experiencia',
-    'comunidad_juego': '4. Comunidad de Juego',
-    
-    # Centros de Interés
-    'contacto_realidad': '1. En contacto de la realidad',
-    'identificacion_integracion': '2. Identificación e integración',
-    'expresion': '3. Expresión',
-    
-    # Talleres
-    'situacion_inicial': '1. Situación inicial',
-    'organizacion_acciones': '2. Organización de las acciones',
-    'puesta_marcha': '3. Puesta en marcha',
-    'valoramos_aprendido': '4. Valoramos lo aprendido',
+def observar_pico(muestra, modalidad, tamano):
+    """Termina la muestra de memoria de la solicitud y registra su pico; lo regresa"""
+    pico = gobernador_memoria.terminar_muestra(muestra)
+    if pico is not None:
+        pico_memoria.observar(pico, modalidad=etiqueta_modalidad(modalidad), tamano=rango_tamano(tamano))
+    return pico
+
+@app.after_request
+def registrar_solicitud(response):
+    final = time.perf_counter()
+    duracion = final - g.inicio_solicitud
+    ruta = request.url_rule.rule if request.url_rule is not None else 'desconocida'
+    campos = {
+        'metodo': request.method,
+        'ruta': request.path,
+        'estado': response.status_code,
+        'duracion_ms': round(duracion * 1000, 2),
+        'bytes': response.content_length,
+        'ip': request.remote_addr,
+    }
+    campos.update(campos_registro())
     
-    # Rincones / Rincones de Aprendizaje
-    'punto_partida': '1. Punto de partida (Saberes previos)',
-    'asamblea_inicial': '2. Asamblea inicial y planeación',
-    'exploracion_rincones': '3. Exploración de los rincones',
-    'exploracion_descubrimiento': '4. Exploración y descubrimiento',
-    'compartimos_aprendido': '5. Compartimos lo aprendido',
-    'evaluamos_experiencia': '6. Evaluamos la experiencia',
+    solicitudes_total.inc(ruta=ruta, metodo=request.method, estado=str(response.status_code))
+    duracion_solicitud.observar(duracion, ruta=ruta)
+    if response.status_code >= 500:
+        errores_total.inc(ruta=ruta)
     
-    # Proyecto
-    'punto_partida': '1. Punto de partida',
-    'planeacion': '2. Planeación',
-    'a_trabajar': '3. ¡A trabajar!',
-    'comunicamos_logros': '4. Comunicamos nuestros logros',
-    'reflexion_aprendizaje': '5. Reflexión sobre el aprendizaje',
+    tiempos = g.get('tiempos')
+    if tiempos is not None:
+        # Copia: en el modo 'partes' el motor puede seguir corriendo en otro hilo
+        fases_terminadas = dict(tiempos)
+        if 'modalidad' in campos:
+            duracion_documento.observar(duracion, modalidad=etiqueta_modalidad(campos['modalidad']))
+        if response.status_code == 200:
+            archivo = g.get('archivo_por_partes')
+            if archivo is None and response.content_length is not None and response.mimetype == MIMETYPE_DOCX:
+                tamano_documento.observar(response.content_length)
+            al_cerrar = partial(observar_envio, final, tiempos, archivo)
+            if 'archivo_enviado' in g:
+                g.archivo_enviado.al_cerrar.append(al_cerrar)
+            else:
+                response.call_on_close(al_cerrar)
+        # En el modo 'partes' el render sigue después de este punto: el encabezado solo
+        # lleva las fases terminadas antes de empezar a enviar
+        if SERVER_TIMING:
+            fases = [f"{fase};dur={ms:.2f}" for fase, ms in fases_terminadas.items()]
+            response.headers['Server-Timing'] = ', '.join(fases + [f"total;dur={duracion * 1000:.2f}"])
+        campos['fases_ms'] = {fase: round(ms, 2) for fase, ms in fases_terminadas.items()}
     
-    # Unidad Didáctica
-    'lectura_realidad': '1. Lectura de la realidad',
-    'identificacion_trama': '2. Identificación de la trama y complejidad',
-    'planificacion': '3. Planificación y organización del trabajo',
-    'exploracion': '4. Exploración y descubrimiento',
-    'participacion': '5. Participación activa y horizontal',
-    'conclusion': '6. Conclusión de la experiencia (Valoración)',
+    muestra = g.pop('muestra_memoria', None)
+    if muestra is not None:
+        observar = partial(observar_pico, muestra, campos.get('modalidad'), request.content_length or 0)
+        if 'archivo_por_partes' in g:
+            # El motor sigue generando mientras se envía: la muestra termina al cerrar
+            g.archivo_enviado.al_cerrar.append(observar)
+        else:
+            pico = observar()
+            if pico is not None:
+                campos['memoria_pico_kb'] = pico // 1024
     
-    # ✅ SITUACIÓN DIDÁCTICA - NUEVOS MOMENTOS
-    'inicio': '1. Inicio',
-    'desarrollo': '2. Desarrollo', 
-    'cierre': '3. Cierre'
-}
+    logger.info("solicitud", extra={'campos': campos})
+    return response
 
-# ✅ NUEVA FUNCIÓN: Detectar si es modalidad que requiere tabla simplificada
-def es_modalidad_simplificada(modalidad):
-    """Detecta si la modalidad necesita tabla simplificada (sin relación de contenidos ni eje articulador)"""
-    modalidades_simplificadas = [
-        'situacion didactica', 
-        'situación didáctica'
-    ]
-    return modalidad.lower() in modalidades_simplificadas
+@app.errorhandler(RequestEntityTooLarge)
+def cuerpo_demasiado_grande(error):
+    """Cuerpo mayor que MAX_CONTENT_LENGTH, rechazado antes de leerlo"""
+    return jsonify({"error": "La solicitud excede el tamaño máximo",
+                    "maximo_bytes": app.config['MAX_CONTENT_LENGTH']}), 413
 
 @app.route('/', methods=['GET'])
 def home():
     """Endpoint raíz para verificar que el servidor está funcionando"""
-    logger.info("HOME: Endpoint raíz accedido")
     return jsonify({'status': 'OK', 'message': 'Servidor Plantcher Word está funcionando', 'version': '2.1 - Con Situación Didáctica'})
 
 @app.route('/test', methods=['GET'])
 def test_connection():
     """Endpoint de prueba para verificar conectividad"""
-    logger.info("TEST: Endpoint de prueba accedido")
     return jsonify({'status': 'OK', 'message': 'Servidor funcionando correctamente', 'rutas_disponibles': ['/generar-word', '/test', '/modalidades']})
 
 @app.route('/test-post', methods=['POST'])
 def test_post():
     """Endpoint de prueba para verificar solicitudes POST"""
-    logger.info("TEST-POST: Endpoint de prueba POST accedido")
     data = request.json
-    logger.info(f"Datos recibidos en POST: {data}")
+    # El contenido de la solicitud solo se registra en el detalle de debug
+    logger.debug("Datos recibidos en POST: %s", data)
     return jsonify({'status': 'OK', 'message': 'POST funcionando correctamente', 'datos_recibidos': data})
 
+# La lista de modalidades no cambia mientras corre el servidor: se serializa una vez
+MODALIDADES_JSON = app.json.dumps({
+    'modalidades': NOMBRES_MODALIDADES,
+    'config': MODALIDADES_CONFIG
+}) + '\n'
+MODALIDADES_ETAG = hashlib.sha256(MODALIDADES_JSON.encode('utf-8')).hexdigest()[:32]
+MODALIDADES_MAX_AGE = int(os.environ.get('MODALIDADES_MAX_AGE', '3600'))
+
 @app.route('/modalidades', methods=['GET'])
 def get_modalidades():
     """Endpoint para obtener las modalidades disponibles y sus momentos"""
-    logger.info("MODALIDADES: Solicitando lista de modalidades")
-    return jsonify({
-        'modalidades': list(MODALIDADES_CONFIG.keys()),
-        'config': MODALIDADES_CONFIG
-    })
+    response = app.response_class(MODALIDADES_JSON, mimetype='application/json')
+    response.set_etag(MODALIDADES_ETAG)
+    response.cache_control.public = True
+    response.cache_control.max_age = MODALIDADES_MAX_AGE
+    return response.make_conditional(request)
 
-@app.route('/generar-word', methods=['POST'])
-def generar_word():
-    """Generar documento Word con soporte para todas las modalidades incluida Situación Didáctica"""
+@app.route('/metrics', methods=['GET'])
+def exponer_metricas():
+    """Métricas del proceso en el formato de texto de Prometheus"""
+    rss = memoria.rss()
+    if rss is not None:
+        memoria_rss.fijar(rss)
+    texto = metricas.exponer() + metricas_cache()
+    return app.response_class(texto, mimetype=RegistroMetricas.CONTENT_TYPE)
+
+def metricas_cache():
+    """Contadores de la cache y del almacén de documentos en el formato de /metrics"""
+    lineas = []
+    for nombre, valor in cache_documentos.estadisticas().items():
+        if nombre in ('aciertos', 'fallos', 'expulsiones'):
+            lineas += [f"# TYPE plantcher_cache_{nombre}_total counter", f"plantcher_cache_{nombre}_total {valor}"]
+        else:
+            lineas += [f"# TYPE plantcher_cache_{nombre} gauge", f"plantcher_cache_{nombre} {valor}"]
+    if almacen_documentos.habilitado:
+        for nombre, valor in almacen_documentos.estadisticas().items():
+            tipo, sufijo = ('counter', '_total') if nombre == 'expulsiones' else ('gauge', '')
+            lineas += [f"# TYPE plantcher_almacen_{nombre}{sufijo} {tipo}", f"plantcher_almacen_{nombre}{sufijo} {valor}"]
+    return '\n'.join(lineas) + '\n'
+
+@app.route('/cache/estadisticas', methods=['GET'])
+def estadisticas_cache():
+    """Contadores de aciertos y fallos de la cache de documentos"""
+    return jsonify(cache_documentos.estadisticas())
+
+class SolicitudInvalida(Exception):
+    """Planeación que no se puede generar; lleva el cuerpo JSON del error y el código HTTP"""
+    def __init__(self, cuerpo, codigo=400):
+        super().__init__(cuerpo['error'])
+        self.cuerpo = cuerpo
+        self.codigo = codigo
+
+def leer_planeacion():
+    """Cuerpo JSON de la solicitud, rechazado por tamaño antes de leerlo o decodificarlo"""
+    if not request.is_json:
+        raise SolicitudInvalida({"error": "Se esperaba un cuerpo JSON (Content-Type: application/json)"}, 415)
+    limite = {"error": f"La planeación excede el máximo de {PLANEACION_MAX_BYTES} bytes",
+              "maximo_bytes": PLANEACION_MAX_BYTES}
+    if (request.content_length or 0) > PLANEACION_MAX_BYTES:
+        raise SolicitudInvalida(limite, 413)
+    # Sin Content-Length (chunked) se lee por bloques y se corta al pasar el límite; un
+    # solo read(límite) reservaría de entrada un buffer del tamaño del límite
+    bloques = []
+    leidos = 0
+    while True:
+        bloque = request.stream.read(64 * 1024)
+        if not bloque:
+            break
+        leidos += len(bloque)
+        if leidos > PLANEACION_MAX_BYTES:
+            raise SolicitudInvalida(limite, 413)
+        bloques.append(bloque)
+    cuerpo = b''.join(bloques)
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({"error": "No se recibieron datos"}), 400
-        
-        modalidad = data.get('modalidad', '').lower()
-        
-        logger.info(f"Modalidad recibida: '{modalidad}'")
-        logger.info(f"Modalidades disponibles: {list(MODALIDADES_CONFIG.keys())}")
-        
-        if modalidad not in MODALIDADES_CONFIG:
-            logger.error(f"Modalidad '{modalidad}' no encontrada")
-            return jsonify({
-                "error": f"Modalidad '{modalidad}' no válida",
-                "modalidades_disponibles": list(MODALIDADES_CONFIG.keys())
-            }), 400
-        
-        # Crear documento
-        doc = Document()
-        
-        # Título principal
-        title = doc.add_heading(f"Planeación {modalidad.upper()}: {data.get('titulo', '')}", 0)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        doc.add_paragraph("")
+        return leer_json(cuerpo) if cuerpo else None
+    except ValueError as e:
+        raise SolicitudInvalida({"error": f"JSON no válido: {e}"})
 
-        # === TABLA 1: DATOS GENERALES ===
-        table1 = doc.add_table(rows=2, cols=3)
-        
-        # Headers
-        headers1 = ['Periodo de Aplicación', 'Propósito', 'Relevancia Social']
-        for i, header in enumerate(headers1):
-            table1.rows[0].cells[i].text = header
-        
-        # Datos
-        row1_data = [
-            data.get('periodoAplicacion', ''),
-            data.get('proposito', ''),
-            data.get('relevanciaSocial', '')
-        ]
-        for i, dato in enumerate(row1_data):
-            table1.rows[1].cells[i].text = dato
-        
-        set_table_borders(table1)
-        format_table_headers(table1)
-        format_table_content(table1)
-        doc.add_paragraph("")
-
-        # === TABLA 2: CONTENIDO CURRICULAR (Adaptable según modalidad) ===
-        campos = data.get('camposFormativos', [])
-        contenidos = data.get('contenidos', [])
-        procesos = data.get('procesosDesarrollo', [])
-        relaciones = data.get('relacionContenidos', {})
-        
-        max_rows = max(len(campos), len(contenidos), len(procesos))
-        
-        # ✅ LÓGICA ADAPTATIVA: Tabla simplificada para Situación Didáctica
-        if es_modalidad_simplificada(modalidad):
-            # Tabla de 3 columnas (sin relación de contenidos ni eje articulador)
-            table2 = doc.add_table(rows=max_rows + 1, cols=3)
-            headers2 = ['Campos Formativos', 'Contenidos', 'Procesos de Desarrollo y Aprendizaje']
+def validar_planeacion(data):
+    """Valida los datos de una planeación y regresa la modalidad normalizada"""
+    if not data:
+        raise SolicitudInvalida({"error": "No se recibieron datos"})
+    
+    if not isinstance(data, dict):
+        raise SolicitudInvalida({"error": "La planeación debe ser un objeto JSON"})
+    
+    try:
+        esquema_planeacion.validar(data)
+    except ErrorEsquema as e:
+        cuerpo = {"error": str(e), "campo": e.ruta}
+        if e.maximo is not None:
+            cuerpo["maximo"] = e.maximo
+        raise SolicitudInvalida(cuerpo, e.codigo)
+    
+    modalidad = nombre_modalidad(data.get('modalidad', ''))
+    
+    if buscar_modalidad(modalidad) is None:
+        logger.warning("Modalidad '%s' no encontrada", modalidad)
+        raise SolicitudInvalida({
+            "error": f"Modalidad '{modalidad}' no válida",
+            "modalidades_disponibles": NOMBRES_MODALIDADES
+        })
+    
+    return modalidad
+
+def generar_contenido(data, modalidad, clave, campos=None, tiempos=None, compresion=None):
+    """Bytes del .docx de la planeación, desde la cache o generados con el motor configurado.
+    
+    Si se da `campos` (dict), ahí se anotan el uso de la cache y el tiempo de render;
+    en `tiempos` (dict), los ms de cada fase del motor. `compresion` es el nivel del zip
+    (COMPRESION_WORD si no se da). Las llamadas con la misma clave mientras se genera el
+    documento esperan ese render y reciben los mismos bytes"""
+    campos = {} if campos is None else campos
+    compresion = COMPRESION_WORD if compresion is None else compresion
+    clave = clave_con_compresion(clave, compresion)
+    contenido = cache_documentos.obtener(clave)
+    campos['cache'] = contenido is not None
+    if contenido is not None:
+        return contenido
+    contenido = almacen_documentos.leer(clave)
+    if contenido is not None:
+        campos['almacen'] = True
+        cache_documentos.guardar(clave, contenido, resolver_momentos(data, modalidad)[1])
+        return contenido
+    
+    def generar():
+        if pool_render.habilitado:
+            contenido = pool_render.generar(data, modalidad, tiempos, compresion)
         else:
-            # Tabla completa de 5 columnas
-            table2 = doc.add_table(rows=max_rows + 1, cols=5)
-            headers2 = ['Campos Formativos', 'Contenidos', 'Procesos de Desarrollo', 'Relación de Contenidos', 'Eje Articulador']
-        
-        # Headers
-        for i, header in enumerate(headers2):
-            table2.rows[0].cells[i].text = header
-        
-        # Datos
-        for i in range(max_rows):
-            campo = campos[i] if i < len(campos) else ''
-            contenido = contenidos[i] if i < len(contenidos) else ''
-            
-            # Procesos
-            procesos_str = ''
-            if procesos and i < len(procesos):
-                campo_proc = procesos[i]
-                gradosPorContenido = campo_proc.get('gradosPorContenido', {})
-                for cont, grados in gradosPorContenido.items():
-                    procesos_str += f"{cont}\n"
-                    for grado, elementos in grados.items():
-                        procesos_str += f"  Grado {grado}:\n"
-                        for el in elementos:
-                            procesos_str += f"    • {el}\n"
-            
-            table2.rows[i + 1].cells[0].text = campo
-            table2.rows[i + 1].cells[1].text = contenido
-            table2.rows[i + 1].cells[2].text = procesos_str.strip()
-            
-            # ✅ Solo agregar columnas adicionales si NO es modalidad simplificada
-            if not es_modalidad_simplificada(modalidad):
-                relacion = relaciones.get(campo, '') if campo in relaciones else ''
-                eje = data.get('ejeArticulador', '') if i == 0 else ''
-                table2.rows[i + 1].cells[3].text = relacion
-                table2.rows[i + 1].cells[4].text = eje
-        
-        set_table_borders(table2)
-        format_table_headers(table2)
-        format_table_content(table2)
-        doc.add_paragraph("")
-
-        # === TABLA 3: MOMENTOS (Específicos por modalidad) ===
-        momentos = data.get('momentos', {})
-        momentos_modalidad = MODALIDADES_CONFIG.get(modalidad, ['Inicio', 'Desarrollo', 'Cierre'])
-        
-        logger.info(f"Momentos recibidos: {list(momentos.keys())}")
-        logger.info(f"Momentos esperados para {modalidad}: {momentos_modalidad}")
-        
-        table3 = doc.add_table(rows=len(momentos_modalidad) + 1, cols=2)
-        
-        # Headers
-        table3.rows[0].cells[0].text = 'Momentos'
-        table3.rows[0].cells[1].text = 'Descripción'
-        
-        # Datos específicos por modalidad
-        for idx, momento in enumerate(momentos_modalidad, start=1):
-            # Usar el nombre bonito del momento
-            nombre_bonito = NOMBRES_MOMENTOS.get(momento, momento.replace('_', ' ').title())
-            table3.rows[idx].cells[0].text = nombre_bonito
-            
-            # Buscar la descripción del momento con diferentes variaciones
-            descripcion = ''
-            # Buscar por nombre exacto
-            if momento in momentos:
-                descripcion = momentos[momento]
-            # Buscar por nombre sin espacios ni mayúsculas
-            elif momento.lower().replace(' ', '') in [k.lower().replace(' ', '') for k in momentos.keys()]:
-                for k, v in momentos.items():
-                    if k.lower().replace(' ', '') == momento.lower().replace(' ', ''):
-                        descripcion = v
-                        break
-            # Si no encuentra, buscar por palabras clave
-            elif not descripcion:
-                momento_lower = momento.lower()
-                for k, v in momentos.items():
-                    k_lower = k.lower()
-                    if (momento_lower in k_lower) or (k_lower in momento_lower):
-                        descripcion = v
-                        break
-            
-            table3.rows[idx].cells[1].text = descripcion
-            
-            # Log para debugging
-            logger.info(f"Momento: '{momento}' -> Nombre: '{nombre_bonito}' -> Descripción: '{descripcion[:50] if descripcion else 'VACÍA'}...' (encontrada: {bool(descripcion)})")
+            # Generar y guardar en memoria con el motor configurado
+            buffer = BytesIO()
+            with reservar_memoria(data):
+                MOTORES_WORD[MOTOR_WORD](data, modalidad, buffer, tiempos, compresion)
+            contenido = buffer.getvalue()
+        # Guardado antes de terminar el vuelo, para que la siguiente solicitud lo encuentre
+        guardar_documento(clave, contenido, data, modalidad)
+        return contenido
+    
+    inicio = time.perf_counter()
+    contenido, coalescida = vuelos.ejecutar(clave, generar, timeout=pool_render.timeout)
+    if coalescida:
+        marcar_coalescida(campos, 'en_curso')
+        return contenido
+    campos['render_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    
+    logger.debug("Documento generado para modalidad '%s' (simplificada: %s)",
+                 modalidad, es_modalidad_simplificada(modalidad))
+    return contenido
+
+def reservar_memoria(data):
+    """Reserva de la guardia de memoria para generar `data` en este proceso; el tamaño
+    es el del cuerpo de la solicitud o, en lotes y trabajos, el de su JSON"""
+    if gobernador_memoria.limite <= 0:
+        return gobernador_memoria.reservar(0)
+    if has_request_context() and request.content_length:
+        tamano = request.content_length
+    else:
+        tamano = len(json.dumps(data, ensure_ascii=False))
+    try:
+        return gobernador_memoria.reservar(tamano)
+    except MemoriaInsuficiente:
+        rechazos_memoria.inc()
+        raise
+
+def clave_con_compresion(clave, compresion):
+    """Con otro nivel de zip el mismo documento da otros bytes: va en otra entrada"""
+    return clave if compresion == COMPRESION_WORD else f"{clave}-z{compresion}"
+
+def guardar_documento(clave, contenido, data, modalidad):
+    """Guarda un documento recién generado en la cache, con el reporte de momentos de
+    la planeación, y en el almacén en disco"""
+    cache_documentos.guardar(clave, contenido, resolver_momentos(data, modalidad)[1])
+    almacen_documentos.guardar(clave, contenido)
+
+def reporte_momentos(data, modalidad, clave):
+    """Claves de `momentos` que no se pudieron usar. Si el documento está en la cache
+    se toma el reporte guardado con él, sin volver a resolver los momentos"""
+    reporte = cache_documentos.reporte(clave)
+    if reporte is None:
+        _, reporte = resolver_momentos(data, modalidad)
+    return reporte
+
+def respuesta_docx(archivo, modalidad, clave, tamano=None):
+    """Respuesta de descarga del .docx con el ETag de la solicitud.
+    
+    El archivo se envuelve para medir el envío en /metrics (ver registrar_solicitud).
+    Si el documento está en el almacén, Content-Location dice dónde volver a descargarlo"""
+    if isinstance(archivo, BytesIO):
+        tamano = archivo.getbuffer().nbytes
+    g.archivo_enviado = ArchivoObservado(archivo)
+    response = send_file(
+        g.archivo_enviado,
+        as_attachment=True,
+        download_name=nombre_archivo(modalidad),
+        mimetype=MIMETYPE_DOCX
+    )
+    if tamano is not None:
+        response.content_length = tamano
+    response.set_etag(clave)
+    if almacen_documentos.contiene(clave):
+        response.headers['Content-Location'] = f"/documentos/{clave}"
+    return response
+
+def respuesta_almacen(clave, modalidad, campos):
+    """Respuesta con el documento guardado en el almacén (sendfile), o None si no está"""
+    abierto = almacen_documentos.abrir(clave)
+    if abierto is None:
+        return None
+    campos['almacen'] = True
+    archivo, tamano = abierto
+    return respuesta_docx(archivo, modalidad, clave, tamano)
+
+def marcar_coalescida(campos, motivo):
+    """Anota en el registro y en /metrics una solicitud atendida con el resultado de otra"""
+    campos['coalescida'] = motivo
+    solicitudes_coalescidas.inc(motivo=motivo)
+
+def recordar_idempotencia(llave, clave, contenido=None):
+    """Recuerda la respuesta de la Idempotency-Key; sin `contenido` (documento grande)
+    solo la clave, y el reintento se sirve desde el almacén"""
+    if llave is not None:
+        idempotencia.guardar(llave, clave, contenido)
+
+def enviar_documento(data, modalidad, clave, campos, tiempos=None, llave=None):
+    """Respuesta con el documento según RESPUESTA_WORD.
+    
+    Desde la cache o con el pool de render el documento ya está en memoria; si no, el
+    motor escribe directo a un archivo temporal o a la respuesta, sin juntar antes
+    todo el paquete en un BytesIO. Si ya se está generando el mismo documento se
+    esperan sus bytes. Con `llave` (Idempotency-Key) el documento entregado se recuerda
+    en el registro de idempotencia."""
+    if RESPUESTA_WORD == 'memoria' or pool_render.habilitado:
+        contenido = generar_contenido(data, modalidad, clave, campos, tiempos)
+        recordar_idempotencia(llave, clave, contenido)
+        return respuesta_docx(BytesIO(contenido), modalidad, clave)
+    
+    contenido = cache_documentos.obtener(clave)
+    campos['cache'] = contenido is not None
+    if contenido is None:
+        response = respuesta_almacen(clave, modalidad, campos)
+        if response is not None:
+            recordar_idempotencia(llave, clave)
+            return response
+        # Un documento que el otro render no dejó en memoria (más de RESPUESTA_UMBRAL_KB)
+        # se busca en el almacén; si no está, se vuelve a intentar el vuelo y, si ya no
+        # hay, se genera aquí
+        vuelo, lider = vuelos.unirse(clave)
+        while not lider and contenido is None:
+            contenido = vuelo.esperar(pool_render.timeout)
+            if contenido is None:
+                response = respuesta_almacen(clave, modalidad, campos)
+                if response is not None:
+                    marcar_coalescida(campos, 'en_curso')
+                    recordar_idempotencia(llave, clave)
+                    return response
+                vuelo, lider = vuelos.unirse(clave)
+        if contenido is not None:
+            marcar_coalescida(campos, 'en_curso')
+    if contenido is not None:
+        recordar_idempotencia(llave, clave, contenido)
+        return respuesta_docx(BytesIO(contenido), modalidad, clave)
+    
+    if RESPUESTA_WORD == 'partes':
+        # Sin Content-Length: el zip sale conforme el motor lo escribe. El vuelo termina
+        # con el envío; si el cliente se desconecta antes, los que esperan generan el suyo.
+        # Un documento de más de RESPUESTA_UMBRAL_KB no se conserva (contenido None).
+        # El motor marca sus fases en otro hilo mientras se envía: van a su propio dict,
+        # que se une a los tiempos de la solicitud al cerrar la respuesta
+        tiempos_render = {}
+        render = partial(MOTORES_WORD[MOTOR_WORD], data, modalidad, tiempos=tiempos_render)
         
-        set_table_borders(table3)
-        format_table_headers(table3)
-        format_table_content(table3)
-        doc.add_paragraph("")
-
-        # === TABLA 4: VARIANTES ===
-        table4 = doc.add_table(rows=2, cols=1)
-        table4.rows[0].cells[0].text = 'Posibles Variantes'
-        table4.rows[1].cells[0].text = data.get('posiblesVariantes', '')
+        def al_terminar(contenido):
+            if contenido is not None:
+                guardar_documento(clave, contenido, data, modalidad)
+            recordar_idempotencia(llave, clave, contenido)
+            vuelo.terminar(contenido)
         
-        set_table_borders(table4)
-        format_table_headers(table4)
-        format_table_content(table4)
-        doc.add_paragraph("")
-
-        # === TABLA 5: RECURSOS ===
-        materiales = data.get('materiales', [])
-        espacios = data.get('espacios', [])
-        produccion = data.get('produccionSugerida', [])
+        campos['envio'] = 'partes'
+        reserva = None
+        try:
+            # La memoria del render queda reservada hasta que se cierra la respuesta
+            reserva = reservar_memoria(data)
+            archivo = enviar_por_partes(
+                render,
+                timeout=pool_render.timeout,
+                conservar_hasta=RESPUESTA_UMBRAL,
+                al_terminar=al_terminar
+            )
+        except BaseException as e:
+            if reserva is not None:
+                reserva.liberar()
+            vuelo.fallar(e)
+            raise
+        g.archivo_por_partes = archivo
+        response = respuesta_docx(archivo, modalidad, clave)
+        g.archivo_enviado.al_cerrar += [partial(vuelo.terminar, None), reserva.liberar,
+                                        partial(tiempos.update, tiempos_render)]
+        return response
+    
+    render = partial(MOTORES_WORD[MOTOR_WORD], data, modalidad, tiempos=tiempos)
+    inicio = time.perf_counter()
+    try:
+        with reservar_memoria(data):
+            archivo, tamano, en_disco = generar_en_spool(render, RESPUESTA_UMBRAL)
+    except BaseException as e:
+        vuelo.fallar(e)
+        raise
+    campos['render_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    if not en_disco:
+        contenido = archivo.read()
+        archivo.close()
+        guardar_documento(clave, contenido, data, modalidad)
+        vuelo.terminar(contenido)
+        recordar_idempotencia(llave, clave, contenido)
+        return respuesta_docx(BytesIO(contenido), modalidad, clave)
+    
+    # Documento grande: se sirve desde el archivo temporal (sendfile) y no entra a la
+    # cache en memoria, solo al almacén
+    almacen_documentos.guardar_archivo(clave, archivo, tamano)
+    vuelo.terminar(None)
+    recordar_idempotencia(llave, clave)
+    campos['envio'] = 'disco'
+    return respuesta_docx(archivo, modalidad, clave, tamano)
+
+def formato_solicitado():
+    """Formato de la respuesta de /generar-word: 'docx' o una de VISTAS_PREVIAS.
+    
+    `?format=` tiene prioridad. El encabezado Accept solo elige una vista previa si no
+    acepta el .docx, ni siquiera con comodín, para no cambiarle la respuesta a los
+    clientes que mandan `application/json, */*` por omisión."""
+    formato = request.args.get('format')
+    if formato is None:
+        aceptados = request.accept_mimetypes
+        if not aceptados or aceptados.quality(MIMETYPE_DOCX) > 0:
+            return 'docx'
+        mimetype = aceptados.best_match([mimetype for mimetype, _ in VISTAS_PREVIAS.values()])
+        formato = next((nombre for nombre, (tipo, _) in VISTAS_PREVIAS.items() if tipo == mimetype), 'docx')
+    if formato != 'docx' and formato not in VISTAS_PREVIAS:
+        raise SolicitudInvalida({"error": f"Formato '{formato}' no válido",
+                                 "formatos_disponibles": ['docx', *VISTAS_PREVIAS]})
+    return formato
+
+def respuesta_vista(data, modalidad, clave, formato, tiempos):
+    """Vista previa: se compila el modelo de la planeación y se pasa al motor del formato"""
+    etag = f"{clave}-{formato}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        fases = Fases(tiempos)
+        modelo = compilar_planeacion(data, modalidad)
+        fases.marcar('compilar')
+        mimetype, motor = VISTAS_PREVIAS[formato]
+        response = app.response_class(motor(modelo), mimetype=mimetype)
+        fases.marcar('vista')
+        if modelo.reporte_momentos:
+            response.headers['X-Momentos-Reporte'] = json.dumps(modelo.reporte_momentos)
+    response.set_etag(etag)
+    response.vary.add('Accept')
+    return response
+
+def es_administrador():
+    """La solicitud trae `Authorization: Bearer <ADMIN_TOKEN>`"""
+    if not ADMIN_TOKEN:
+        return False
+    autorizacion = request.headers.get('Authorization', '').encode('utf-8')
+    return hmac.compare_digest(autorizacion, f"Bearer {ADMIN_TOKEN}".encode('utf-8'))
+
+def perfil_solicitado():
+    """Formato de perfil que pide la solicitud (encabezado X-Perfil o ?perfil=), o None"""
+    if not ADMIN_TOKEN:
+        return None
+    formato = request.headers.get('X-Perfil') or request.args.get('perfil')
+    if formato is None:
+        return None
+    if not es_administrador():
+        raise SolicitudInvalida({"error": "Perfilado no autorizado"}, 403)
+    if formato not in FORMATOS_PERFIL:
+        raise SolicitudInvalida({"error": f"Formato de perfil '{formato}' no válido",
+                                 "formatos_disponibles": list(FORMATOS_PERFIL)})
+    return formato
+
+def render_perfilado(data, modalidad, tiempos, formato):
+    """Genera el documento en el hilo de la solicitud bajo el perfilador, sin cache ni
+    pool de render; regresa los bytes y el Perfil"""
+    buffer = BytesIO()
+    _, perfil = perfilado.perfilar(
+        partial(MOTORES_WORD[MOTOR_WORD], data, modalidad, buffer, tiempos),
+        formato, modalidad=modalidad, motor=MOTOR_WORD
+    )
+    return buffer.getvalue(), perfil
+
+def respuesta_perfil(perfil, formato):
+    mimetype, extension = FORMATOS_PERFIL[formato]
+    response = app.response_class(perfil.exportar(formato), mimetype=mimetype)
+    disposicion = 'inline' if formato == 'html' else 'attachment'
+    response.headers['Content-Disposition'] = f"{disposicion}; filename=perfil_{perfil.id}.{extension}"
+    response.headers['X-Perfil-Id'] = perfil.id
+    response.cache_control.no_store = True
+    return response
+
+def respuesta_saturado():
+    response = jsonify({"error": "Servidor ocupado, reintentar más tarde"})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(RENDER_RETRY_AFTER)
+    return response
+
+def llave_idempotencia():
+    """Encabezado Idempotency-Key de la solicitud; None si no viene o si el registro
+    está deshabilitado (IDEMPOTENCIA_TTL=0)"""
+    llave = request.headers.get('Idempotency-Key')
+    if llave is None or not idempotencia.habilitado:
+        return None
+    if not llave or len(llave) > IDEMPOTENCIA_MAX_LLAVE:
+        raise SolicitudInvalida({"error": f"Idempotency-Key debe tener de 1 a {IDEMPOTENCIA_MAX_LLAVE} caracteres"})
+    return llave
+
+def respuesta_repetida(registrada, modalidad, clave, campos):
+    """Documento ya entregado con la misma Idempotency-Key; la llave no se puede reusar
+    con otra planeación. De un documento grande solo se recordó la clave: se sirve desde
+    el almacén y, si ya no está ahí, regresa None para volver a generarlo (la misma
+    clave da los mismos bytes)"""
+    clave_registrada, contenido = registrada
+    if clave_registrada != clave:
+        raise SolicitudInvalida({"error": "La Idempotency-Key ya se usó con otra planeación"}, 422)
+    if contenido is not None:
+        response = respuesta_docx(BytesIO(contenido), modalidad, clave)
+    else:
+        response = respuesta_almacen(clave, modalidad, campos)
+        if response is None:
+            return None
+    marcar_coalescida(campos, 'idempotencia')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def nombre_archivo(modalidad):
+    return f"planeacion_{modalidad.replace(' ', '_')}.docx"
+
+@app.route('/generar-word', methods=['POST'])
+def generar_word():
+    """Generar documento Word con soporte para todas las modalidades incluida Situación Didáctica"""
+    try:
+        tiempos = tiempos_solicitud()
+        inicio = time.perf_counter()
+        data = leer_planeacion()
+        tiempos['json'] = (time.perf_counter() - inicio) * 1000
+        tamano_solicitud.observar(request.content_length or 0)
+        modalidad = validar_planeacion(data)
+        campos = campos_registro()
+        campos['modalidad'] = modalidad
         
-        table5 = doc.add_table(rows=2, cols=3)
-        table5.rows[0].cells[0].text = 'Materiales'
-        table5.rows[0].cells[1].text = 'Espacios'
-        table5.rows[0].cells[2].text = 'Producción Sugerida'
+        # La clave es el hash de la solicitud canónica: sirve como ETag y para la cache
+        formato = formato_solicitado()
+        clave = clave_documento(data, modalidad, VERSION_MOTOR)
         
-        table5.rows[1].cells[0].text = '\n'.join(f'• {m}' for m in materiales)
-        table5.rows[1].cells[1].text = '\n'.join(f'• {e}' for e in espacios)
-        table5.rows[1].cells[2].text = '\n'.join(f'• {p}' for p in produccion)
+        # Con X-Perfil la respuesta es el perfil del render en lugar del documento
+        formato_perfil = perfil_solicitado()
+        if formato_perfil is not None:
+            _, perfil = render_perfilado(data, modalidad, tiempos, formato_perfil)
+            campos['perfil'] = perfil.id
+            return respuesta_perfil(perfil, formato_perfil)
         
-        set_table_borders(table5)
-        format_table_headers(table5)
-        format_table_content(table5)
-
-        # Guardar en memoria
-        buffer = BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
+        if formato != 'docx':
+            campos['formato'] = formato
+            return respuesta_vista(data, modalidad, clave, formato, tiempos)
         
-        filename = f"planeacion_{modalidad.replace(' ', '_')}.docx"
+        if request.if_none_match.contains(clave):
+            response = app.response_class(status=304)
+            response.set_etag(clave)
+            return response
         
-        logger.info(f"Generando archivo para modalidad: {modalidad}")
-        logger.info(f"Modalidad simplificada: {es_modalidad_simplificada(modalidad)}")
+        # Con Idempotency-Key, un reintento de una solicitud ya atendida recibe lo mismo
+        llave = llave_idempotencia()
+        registrada = idempotencia.obtener(llave) if llave is not None else None
+        response = respuesta_repetida(registrada, modalidad, clave, campos) if registrada is not None else None
+        if response is None and perfiles_lentos.toca_muestra():
+            contenido, perfil = render_perfilado(data, modalidad, tiempos, PERFIL_MUESTREO_FORMATO)
+            perfiles_lentos.agregar(perfil)
+            campos['perfil'] = perfil.id
+            guardar_documento(clave, contenido, data, modalidad)
+            recordar_idempotencia(llave, clave, contenido)
+            response = respuesta_docx(BytesIO(contenido), modalidad, clave)
+        elif response is None:
+            response = enviar_documento(data, modalidad, clave, campos, tiempos, llave)
         
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        )
+        # Claves de momentos que no se pudieron usar, para detectar clientes desactualizados
+        reporte = reporte_momentos(data, modalidad, clave)
+        if reporte:
+            response.headers['X-Momentos-Reporte'] = json.dumps(reporte)
+        return response
         
+    except SolicitudInvalida as e:
+        return jsonify(e.cuerpo), e.codigo
+    except PoolSaturado:
+        logger.warning("Pool de render saturado, se pide reintentar")
+        return respuesta_saturado()
+    except MemoriaInsuficiente as e:
+        logger.warning("%s, se pide reintentar", e)
+        return respuesta_saturado()
     except Exception as e:
-        logger.error(f"ERROR: {str(e)}")
+        logger.exception("Error al generar el documento")
         return jsonify({"error": f"Error interno del servidor: {str(e)}"}), 500
 
+@app.route('/documentos/<clave>', methods=['GET'])
+def descargar_documento(clave):
+    """Documento guardado en el almacén en disco; la clave es el ETag de /generar-word.
+    
+    Responde rangos (Range, If-Range) para reanudar una descarga interrumpida, con el
+    mismo ETag fuerte, y el archivo sale con wsgi.file_wrapper (sendfile en gunicorn)"""
+    abierto = almacen_documentos.abrir(clave)
+    if abierto is None:
+        return jsonify({"error": "Documento no encontrado o expirado"}), 404
+    archivo, tamano = abierto
+    response = send_file(archivo, as_attachment=True, download_name='planeacion.docx',
+                         mimetype=MIMETYPE_DOCX, conditional=False, etag=False)
+    response.content_length = tamano
+    response.set_etag(clave)
+    try:
+        return response.make_conditional(request, accept_ranges=True, complete_length=tamano)
+    except RequestedRangeNotSatisfiable:
+        response.close()  # el 416 no lleva el archivo: se cierra aquí
+        raise
+
+@app.route('/admin/perfiles', methods=['GET'])
+def listar_perfiles():
+    """Perfiles más lentos del muestreo (PERFIL_MUESTREO), del más lento al más rápido"""
+    if not es_administrador():
+        return jsonify({"error": "No autorizado"}), 403
+    return jsonify({'muestreo': perfiles_lentos.cada, 'perfiles': perfiles_lentos.lista()})
+
+@app.route('/admin/perfiles/<id_perfil>', methods=['GET'])
+def descargar_perfil(id_perfil):
+    """Descarga un perfil guardado; ?formato= elige entre los formatos del perfil"""
+    if not es_administrador():
+        return jsonify({"error": "No autorizado"}), 403
+    perfil = perfiles_lentos.obtener(id_perfil)
+    if perfil is None:
+        return jsonify({"error": "Perfil no encontrado"}), 404
+    formato = request.args.get('formato', perfil.formatos[0])
+    try:
+        return respuesta_perfil(perfil, formato)
+    except FormatoNoDisponible as e:
+        return jsonify({"error": str(e)}), 400
+
+def generar_elemento_lote(data):
+    """Genera una planeación del lote; los errores se regresan para el manifiesto"""
+    try:
+        if isinstance(data, Exception):
+            raise SolicitudInvalida({"error": str(data)})
+        modalidad = validar_planeacion(data)
+        clave = clave_documento(data, modalidad, VERSION_MOTOR)
+        contenido = generar_contenido(data, modalidad, clave, compresion=LOTE_COMPRESION)
+        reporte = reporte_momentos(data, modalidad, clave_con_compresion(clave, LOTE_COMPRESION))
+        return {'archivo': nombre_archivo(modalidad), 'contenido': contenido, 'reporte_momentos': reporte}
+    except SolicitudInvalida as e:
+        return {'error': e.cuerpo['error'], 'codigo': e.codigo}
+    except (PoolSaturado, MemoriaInsuficiente):
+        return {'error': "Servidor ocupado, reintentar más tarde", 'codigo': 503}
+    except Exception as e:
+        logger.exception("Error al generar un documento del lote")
+        return {'error': f"Error interno del servidor: {str(e)}", 'codigo': 500}
+
+def limitar_lote(planeaciones):
+    """Corta un lote NDJSON al máximo permitido, avisando en el manifiesto"""
+    for indice, data in enumerate(planeaciones):
+        if indice == LOTE_MAX_DOCUMENTOS:
+            yield ValueError(f"El lote excede el máximo de {LOTE_MAX_DOCUMENTOS} planeaciones; se omitió el resto")
+            return
+        yield data
+
+@app.route('/generar-word/batch', methods=['POST'])
+def generar_word_lote():
+    """Generar varias planeaciones en un ZIP que se envía conforme se termina cada documento.
+    
+    Acepta un arreglo JSON o NDJSON (application/x-ndjson, una planeación por línea)."""
+    if request.mimetype == 'application/x-ndjson':
+        planeaciones = limitar_lote(leer_ndjson(request.stream))
+    else:
+        try:
+            planeaciones = leer_json(request.get_data(cache=False)) if request.is_json else None
+        except ValueError:
+            planeaciones = None
+        if not isinstance(planeaciones, list):
+            return jsonify({"error": "Se esperaba un arreglo JSON de planeaciones o NDJSON"}), 400
+        if len(planeaciones) > LOTE_MAX_DOCUMENTOS:
+            return jsonify({"error": f"El lote excede el máximo de {LOTE_MAX_DOCUMENTOS} planeaciones"}), 413
+    
+    futuros = resultados_en_orden(pool_lotes, planeaciones, generar_elemento_lote, ventana=LOTE_HILOS * 2)
+    return Response(
+        stream_with_context(zip_por_partes(futuros)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename=planeaciones.zip'}
+    )
+
+def generar_trabajo(data, modalidad):
+    """Genera el documento de un trabajo asíncrono"""
+    clave = clave_documento(data, modalidad, VERSION_MOTOR)
+    return {'clave': clave, 'contenido': generar_contenido(data, modalidad, clave)}
+
+def trabajo_terminado(trabajo):
+    logger.info("Trabajo %s terminado con estado '%s'", trabajo.id, trabajo.estado)
+
+gestor_trabajos = GestorTrabajos(
+    ejecutar=generar_trabajo,
+    hilos=int(os.environ.get('TRABAJOS_HILOS', '1')),
+    ttl=int(os.environ.get('TRABAJOS_TTL', '900')),
+    max_pendientes=int(os.environ.get('TRABAJOS_MAX_PENDIENTES', '50')),
+    al_terminar=trabajo_terminado,
+    # Sin cupo en el pool de render o en la memoria el trabajo espera su turno
+    reintentar=(PoolSaturado, MemoriaInsuficiente),
+    espera_reintento=RENDER_RETRY_AFTER,
+    plazo=int(os.environ.get('TRABAJOS_PLAZO', '300')),
+    max_terminados=int(os.environ.get('TRABAJOS_MAX_TERMINADOS', '100')),
+    max_bytes=int(os.environ.get('TRABAJOS_MAX_MB', '64')) * 1024 * 1024,
+    tamano=lambda resultado: len(resultado['contenido'])
+)
+
+def estado_trabajo(trabajo):
+    estado = {
+        'id': trabajo.id,
+        'estado': trabajo.estado,
+        'posicion': gestor_trabajos.posicion(trabajo),
+        'resultado': f"/jobs/{trabajo.id}/result" if trabajo.estado == TERMINADO else None
+    }
+    if trabajo.estado == FALLIDO:
+        estado['error'] = trabajo.error
+    return estado
+
+@app.route('/jobs', methods=['POST'])
+def crear_trabajo():
+    """Encolar la generación de un documento; responde de inmediato con el id del trabajo"""
+    try:
+        data = leer_planeacion()
+        modalidad = validar_planeacion(data)
+        trabajo = gestor_trabajos.encolar(data, modalidad)
+    except SolicitudInvalida as e:
+        return jsonify(e.cuerpo), e.codigo
+    except ColaTrabajosLlena:
+        logger.warning("Cola de trabajos llena, se pide reintentar")
+        return respuesta_saturado()
+    
+    campos_registro().update(modalidad=modalidad, trabajo=trabajo.id)
+    response = jsonify(estado_trabajo(trabajo))
+    response.status_code = 202
+    response.headers['Location'] = f"/jobs/{trabajo.id}"
+    return response
+
+@app.route('/jobs/<id_trabajo>', methods=['GET'])
+def consultar_trabajo(id_trabajo):
+    """Estado y posición en la cola de un trabajo.
+    
+    Con ?esperar=<segundos> la respuesta espera a que el trabajo termine (hasta
+    TRABAJOS_ESPERA_MAXIMA), así el cliente se entera al momento sin consultar en ciclo."""
+    trabajo = gestor_trabajos.obtener(id_trabajo)
+    if trabajo is None:
+        return jsonify({"error": "Trabajo no encontrado o expirado"}), 404
+    
+    esperar = min(request.args.get('esperar', 0, type=float), TRABAJOS_ESPERA_MAXIMA)
+    if esperar > 0:
+        trabajo.listo.wait(esperar)
+    return jsonify(estado_trabajo(trabajo))
+
+@app.route('/jobs/<id_trabajo>/result', methods=['GET'])
+def resultado_trabajo(id_trabajo):
+    """Documento generado por un trabajo terminado"""
+    trabajo = gestor_trabajos.obtener(id_trabajo)
+    if trabajo is None:
+        return jsonify({"error": "Trabajo no encontrado o expirado"}), 404
+    
+    if trabajo.estado == FALLIDO:
+        return jsonify({"error": trabajo.error, "estado": trabajo.estado}), trabajo.codigo
+    
+    if trabajo.estado != TERMINADO:
+        response = jsonify({"error": "El documento aún no está listo", "estado": trabajo.estado})
+        response.status_code = 409
+        response.headers['Retry-After'] = str(RENDER_RETRY_AFTER)
+        return response
+    
+    return respuesta_docx(BytesIO(trabajo.resultado['contenido']), trabajo.modalidad, trabajo.resultado['clave'])
+
+# True después de calentar(); el modo ASGI (asgi.py) no vuelve a calentar si ya lo hizo gunicorn.conf.py
+CALENTADO = False
+
+def calentar(iniciar_pool=True):
+    """Importa el motor configurado y genera una planeación de cada modalidad (y su vista
+    previa) para que la primera solicitud real no pague imports ni primeras llamadas.
+
+    gunicorn.conf.py lo llama en el proceso maestro antes de abrir el puerto; con
+    `iniciar_pool` también arranca el pool de render (que no se puede heredar por fork).
+    Regresa los milisegundos que tardó"""
+    global CALENTADO
+    inicio = time.perf_counter()
+    for modalidad in MODALIDADES:
+        MOTORES_WORD[MOTOR_WORD](PLANEACION_CALENTAMIENTO, modalidad.clave, BytesIO())
+        motor_vista.generar_html(compilar_planeacion(PLANEACION_CALENTAMIENTO, modalidad.clave))
+    if iniciar_pool and pool_render.habilitado:
+        pool_render.iniciar([modalidad.clave for modalidad in MODALIDADES])
+    duracion = time.perf_counter() - inicio
+    CALENTADO = True
+    duracion_arranque.fijar(duracion, etapa='calentamiento')
+    logger.info("Servidor calentado", extra={'campos': {
+        'motor': MOTOR_WORD, 'carga_ms': round(DURACION_CARGA * 1000, 2), 'calentamiento_ms': round(duracion * 1000, 2)
+    }})
+    return duracion * 1000
+
+# Tiempo de carga de la app (imports y configuración), sin los motores
+DURACION_CARGA = time.perf_counter() - _inicio_carga
+duracion_arranque.fijar(DURACION_CARGA, etapa='carga')
+
 if __name__ == '__main__':
-    import os
     port = int(os.environ.get('PORT', 5000))
+    calentar()
     logger.info("INICIANDO SERVIDOR PLANTCHER WORD - BACKEND SEPARADO")
     logger.info(f"Servidor ejecutándose en puerto: {port}")
     logger.info("Rutas disponibles:")
-    logger.info("   POST /generar-word - Generar documento Word")
+    logger.info("   POST /generar-word - Generar documento Word (?format=html|json para vista previa)")
+    logger.info("   POST /generar-word/batch - Generar varias planeaciones en un ZIP")
+    logger.info("   POST /jobs        - Encolar un documento (GET /jobs/<id>, GET /jobs/<id>/result)")
     logger.info("   GET  /test        - Prueba de conectividad")
     logger.info("   POST /test-post   - Prueba de solicitudes POST")
     logger.info("   GET  /modalidades - Lista de modalidades")
+    logger.info("   GET  /admin/perfiles - Perfiles de render más lentos (requiere ADMIN_TOKEN)")
+    logger.info("   GET  /metrics     - Métricas en formato Prometheus")
+    logger.info("   GET  /cache/estadisticas - Aciertos y fallos de la cache de documentos")
     logger.info("✅ NUEVA MODALIDAD SOPORTADA: Situación Didáctica")
     app.run(debug=False, host='0.0.0.0', port=port)
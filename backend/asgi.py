@@ -0,0 +1,300 @@
+"""Modo de servicio ASGI: la misma app Flask de app.py detrás de un bucle de eventos.
+
+Con workers síncronos de gunicorn, el healthcheck de `/` y `GET /modalidades` esperan
+un hilo libre detrás de los documentos que se están generando. Aquí cada solicitud
+se clasifica por ruta (CLASES_RUTAS):
+
+- `ligera`: rutas que responden datos ya calculados (`/`, `/test`, `/modalidades`,
+  `/metrics`...). Se atienden en el bucle mismo, sin esperar a nadie.
+- `documentos`: las que generan o envían documentos. Corren en su propio pool de
+  hilos, de ASGI_DOCUMENTOS_CONCURRENCIA hilos.
+- `general`: lo demás (trabajos, perfiles, consultas que pueden esperar). Corre en
+  otro pool, de ASGI_GENERAL_CONCURRENCIA hilos, para que una consulta larga no le
+  quite lugar a un documento ni al revés.
+
+Cada clase de ejecutor tiene su límite de solicitudes simultáneas; las que no caben
+esperan su turno hasta ASGI_ESPERA_MAXIMA segundos y después se responde 503 con
+Retry-After. El cuerpo de la solicitud se recibe en el bucle antes de ocupar un hilo,
+así que un cliente lento al subir no retiene a nadie. Las rutas y los formatos de
+respuesta son los de app.py; este módulo solo traduce entre ASGI y WSGI.
+
+Se levanta con el worker de uvicorn (ver README.md):
+
+    gunicorn asgi:app --config gunicorn.conf.py -k uvicorn.workers.UvicornWorker ...
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.wsgi import FileWrapper
+
+import app as servidor
+
+logger = logging.getLogger(__name__)
+
+# (método, patrón de la ruta) -> clase; la primera que coincide gana y el resto es 'general'
+CLASES_RUTAS = [
+    (('GET', 'HEAD'), re.compile(r'/(test|modalidades|metrics|cache/estadisticas)?'), 'ligera'),
+    (('POST',), re.compile(r'/generar-word(/batch)?'), 'documentos'),
+    (('GET', 'HEAD'), re.compile(r'/documentos/[^/]+|/jobs/[^/]+/result'), 'documentos'),
+]
+
+LIMITES = {
+    'documentos': int(os.environ.get('ASGI_DOCUMENTOS_CONCURRENCIA', '2')),
+    'general': int(os.environ.get('ASGI_GENERAL_CONCURRENCIA', '4')),
+}
+ASGI_ESPERA_MAXIMA = float(os.environ.get('ASGI_ESPERA_MAXIMA', '30'))
+
+# Bloques del cuerpo de la solicitud que se quedan en memoria antes de pasar a disco
+CUERPO_EN_MEMORIA = 1024 * 1024
+# Los archivos de send_file se leen en bloques de este tamaño (en lugar de 8 KB) para
+# no saltar al pool de hilos por cada bloque pequeño
+BLOQUE_ARCHIVO = 64 * 1024
+
+solicitudes_asgi = servidor.metricas.medidor(
+    'plantcher_asgi_solicitudes', 'Solicitudes del modo ASGI por clase de ruta y estado (en_curso, en_espera)',
+    ('clase', 'estado'))
+rechazadas_asgi = servidor.metricas.contador(
+    'plantcher_asgi_rechazadas_total', 'Solicitudes que esperaron más de ASGI_ESPERA_MAXIMA y recibieron 503',
+    ('clase',))
+
+
+def clase_ruta(metodo, ruta):
+    for metodos, patron, clase in CLASES_RUTAS:
+        if metodo in metodos and patron.fullmatch(ruta):
+            return clase
+    return 'general'
+
+
+def envoltura_archivo(archivo, tam_bloque=8192):
+    return FileWrapper(archivo, max(tam_bloque, BLOQUE_ARCHIVO))
+
+
+class Ejecutor:
+    """Pool de hilos de una clase de rutas con su límite de solicitudes simultáneas.
+
+    El semáforo es del bucle de eventos; se crea con el primer uso para quedar en el
+    bucle que está corriendo"""
+
+    def __init__(self, clase, limite):
+        self.clase = clase
+        self.limite = limite
+        self.pool = ThreadPoolExecutor(max_workers=limite, thread_name_prefix=f'asgi-{clase}')
+        self._semaforo = None
+
+    async def ocupar(self, espera_maxima):
+        """True si consiguió lugar antes de `espera_maxima` segundos"""
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.limite)
+        solicitudes_asgi.inc(clase=self.clase, estado='en_espera')
+        try:
+            await asyncio.wait_for(self._semaforo.acquire(), espera_maxima)
+        except asyncio.TimeoutError:
+            rechazadas_asgi.inc(clase=self.clase)
+            return False
+        finally:
+            solicitudes_asgi.dec(clase=self.clase, estado='en_espera')
+        solicitudes_asgi.inc(clase=self.clase, estado='en_curso')
+        return True
+
+    def liberar(self):
+        solicitudes_asgi.dec(clase=self.clase, estado='en_curso')
+        self._semaforo.release()
+
+    async def ejecutar(self, contexto, funcion, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, contexto.run, funcion, *args)
+
+
+class AppASGI:
+    """Adaptador ASGI de una app WSGI con las rutas repartidas por clase"""
+
+    def __init__(self, wsgi, limites, espera_maxima):
+        self.wsgi = wsgi
+        self.ejecutores = {clase: Ejecutor(clase, limite) for clase, limite in limites.items()}
+        self.espera_maxima = espera_maxima
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                # Con gunicorn.conf.py el proceso maestro ya calentó el motor antes del fork
+                if not servidor.CALENTADO:
+                    await asyncio.get_running_loop().run_in_executor(None, servidor.calentar)
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                for ejecutor in self.ejecutores.values():
+                    ejecutor.pool.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        cuerpo, tamano, desconectado = await self.leer_cuerpo(scope, receive)
+        environ = self.environ(scope, cuerpo, tamano)
+        # Si el cliente se va, se deja de pedir el cuerpo de la respuesta (y al cerrarla
+        # se cancela el motor que escribe por partes)
+        vigilante = None
+        if not desconectado.is_set():
+            vigilante = asyncio.ensure_future(self.vigilar(receive, desconectado))
+        try:
+            await self.atender(scope, environ, send, desconectado)
+        finally:
+            if vigilante is not None:
+                vigilante.cancel()
+
+    @staticmethod
+    async def vigilar(receive, desconectado):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        desconectado.set()
+
+    async def atender(self, scope, environ, send, desconectado):
+        # Todas las llamadas de la solicitud (también las de un cuerpo por partes) corren
+        # en el mismo contexto, aunque cada una caiga en otro hilo del pool
+        contexto = contextvars.copy_context()
+        ejecutor = self.ejecutores.get(clase_ruta(scope['method'], scope['path']))
+        if ejecutor is None:
+            await self.responder(environ, contexto, send, self.en_bucle, desconectado)
+            return
+        if not await ejecutor.ocupar(self.espera_maxima):
+            environ['wsgi.input'].close()
+            await self.saturado(send)
+            return
+        try:
+            await self.responder(environ, contexto, send, ejecutor.ejecutar, desconectado)
+        finally:
+            ejecutor.liberar()
+
+    @staticmethod
+    async def en_bucle(contexto, funcion, *args):
+        return contexto.run(funcion, *args)
+
+    async def leer_cuerpo(self, scope, receive):
+        """Recibe el cuerpo completo (a disco arriba de CUERPO_EN_MEMORIA). Si pasa de
+        MAX_CONTENT_LENGTH se deja de leer: Flask ve el tamaño y responde 413.
+        Regresa (archivo, tamaño, evento de desconexión)"""
+        maximo = self.wsgi.config.get('MAX_CONTENT_LENGTH')
+        declarado = dict(scope['headers']).get(b'content-length')
+        cuerpo = tempfile.SpooledTemporaryFile(max_size=CUERPO_EN_MEMORIA)
+        desconectado = asyncio.Event()
+        if declarado is not None and declarado.isdigit() and maximo is not None and int(declarado) > maximo:
+            return cuerpo, int(declarado), desconectado
+        tamano = 0
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'http.disconnect':
+                desconectado.set()
+                break
+            datos = mensaje.get('body', b'')
+            tamano += len(datos)
+            if maximo is not None and tamano > maximo:
+                break
+            cuerpo.write(datos)
+            if not mensaje.get('more_body', False):
+                break
+        cuerpo.seek(0)
+        return cuerpo, tamano, desconectado
+
+    @staticmethod
+    def environ(scope, cuerpo, tamano):
+        servidor_http = scope.get('server') or ('localhost', 80)
+        cliente = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': servidor_http[0],
+            'SERVER_PORT': str(servidor_http[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': cliente[0],
+            'REMOTE_PORT': str(cliente[1]),
+            'CONTENT_LENGTH': str(tamano),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': cuerpo,
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'wsgi.file_wrapper': envoltura_archivo,
+        }
+        for nombre, valor in scope['headers']:
+            nombre = nombre.decode('latin-1').upper().replace('-', '_')
+            valor = valor.decode('latin-1')
+            if nombre in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+                continue  # el cuerpo ya se recibió completo: su tamaño es el real
+            if nombre == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = valor
+                continue
+            clave = f'HTTP_{nombre}'
+            environ[clave] = f'{environ[clave]},{valor}' if clave in environ else valor
+        return environ
+
+    async def responder(self, environ, contexto, send, ejecutar, desconectado):
+        """Corre la app WSGI con `ejecutar` y manda su respuesta; cada bloque del cuerpo
+        también se pide con `ejecutar`, así que una respuesta por partes no bloquea el bucle.
+        Un cuerpo vacío (304, HEAD) también termina con un `http.response.body` final"""
+        inicio = {}
+
+        def start_response(estado, encabezados, exc_info=None):
+            if exc_info is not None and inicio.get('enviado'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            inicio['estado'] = int(estado.split(' ', 1)[0])
+            inicio['encabezados'] = [(nombre.lower().encode('latin-1'), valor.encode('latin-1'))
+                                     for nombre, valor in encabezados]
+
+        respuesta = None
+        try:
+            respuesta = await ejecutar(contexto, self.wsgi, environ, start_response)
+            bloques = iter(respuesta)
+            bloque = await ejecutar(contexto, next, bloques, None)
+            await send({'type': 'http.response.start', 'status': inicio['estado'], 'headers': inicio['encabezados']})
+            inicio['enviado'] = True
+            terminado = False
+            while bloque is not None and not desconectado.is_set():
+                siguiente = await ejecutar(contexto, next, bloques, None)
+                if bloque or siguiente is None:
+                    await send({'type': 'http.response.body', 'body': bytes(bloque), 'more_body': siguiente is not None})
+                    terminado = siguiente is None
+                bloque = siguiente
+            if not terminado and not desconectado.is_set():
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        except Exception:
+            logger.exception("Error al enviar la respuesta ASGI")
+            if not inicio.get('enviado'):
+                await self.error_interno(send)
+        finally:
+            if respuesta is not None and hasattr(respuesta, 'close'):
+                await ejecutar(contexto, respuesta.close)
+            environ['wsgi.input'].close()
+
+    @staticmethod
+    async def responder_json(send, estado, cuerpo, encabezados=()):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': estado, 'headers': [
+            (b'content-type', b'application/json'), (b'content-length', str(len(datos)).encode()), *encabezados
+        ]})
+        await send({'type': 'http.response.body', 'body': datos})
+
+    async def saturado(self, send):
+        await self.responder_json(send, 503, {"error": "Servidor ocupado, reintentar más tarde"},
+                                  [(b'retry-after', str(servidor.RENDER_RETRY_AFTER).encode())])
+
+    async def error_interno(self, send):
+        await self.responder_json(send, 500, {"error": "Error interno del servidor"})
+
+
+app = AppASGI(servidor.app, LIMITES, ASGI_ESPERA_MAXIMA)
@@ -0,0 +1,51 @@
+"""Planeaciones sintéticas para medir la generación de documentos.
+
+Cada escala multiplica los campos formativos, los procesos de desarrollo (contenidos,
+grados y elementos) y los recursos, que son las partes del documento que crecen con
+la solicitud.
+"""
+from planeacion import MODALIDADES_CONFIG
+
+ESCALAS = {
+    'chica': 1,
+    'mediana': 8,
+    'grande': 30,
+    'muy_grande': 100,
+}
+
+_TEXTO = ('Los niños exploran, comparan y registran lo que observan en su entorno '
+          'para comunicar sus hallazgos al grupo. ')
+
+
+def planeacion_sintetica(modalidad, escala):
+    """Cuerpo de /generar-word para la modalidad (clave de MODALIDADES_CONFIG) y la escala"""
+    n = ESCALAS[escala]
+    contenidos_por_campo = min(n, 4)
+    elementos_por_grado = 2 + n // 10
+    campos = [f'Campo formativo {i}' for i in range(n)]
+    return {
+        'modalidad': modalidad,
+        'titulo': f'Planeación sintética {escala}',
+        'periodoAplicacion': 'Del 1 al 15 de marzo',
+        'proposito': _TEXTO * 2,
+        'relevanciaSocial': _TEXTO,
+        'camposFormativos': campos,
+        'contenidos': [f'Contenido {i}: {_TEXTO}' for i in range(n)],
+        'procesosDesarrollo': [
+            {'gradosPorContenido': {
+                f'Contenido {i}.{j}': {
+                    str(grado): [f'Proceso {i}.{j}.{grado}.{k} {_TEXTO}' for k in range(elementos_por_grado)]
+                    for grado in (1, 2, 3)
+                }
+                for j in range(contenidos_por_campo)
+            }}
+            for i in range(n)
+        ],
+        'relacionContenidos': {campo: _TEXTO for campo in campos},
+        'ejeArticulador': 'Pensamiento crítico',
+        'momentos': {momento: _TEXTO * 3 for momento in MODALIDADES_CONFIG[modalidad]},
+        'posiblesVariantes': _TEXTO * 2,
+        'materiales': [f'Material {i}' for i in range(3 * n)],
+        'espacios': [f'Espacio {i}' for i in range(n)],
+        'produccionSugerida': [f'Producción {i}' for i in range(n)],
+    }
@@ -0,0 +1,186 @@
+"""Benchmark de POST /generar-word en el mismo proceso, con el cliente de pruebas de Flask.
+
+Para cada modalidad de MODALIDADES_CONFIG y cada escala de planeación sintética mide:
+latencia de la solicitud completa (mediana y p95), documentos por segundo, memoria
+pico asignada durante una solicitud (tracemalloc) y la mediana de cada fase del
+render (lectura del JSON, compilación del modelo, esqueleto, cada una de las cinco
+tablas y guardado).
+
+Los resultados se comparan con una línea base guardada y el proceso termina con
+código 1 si alguna combinación se volvió más lenta o usa más memoria que la
+tolerancia. Desde backend/:
+
+    python -m benchmarks.generar_word                      # medir y comparar
+    python -m benchmarks.generar_word --guardar            # actualizar la línea base
+    python -m benchmarks.generar_word --escalas chica mediana --repeticiones 3
+
+La cache de documentos se deshabilita y el render corre en el hilo de la solicitud.
+La línea base depende de la máquina, así que no se versiona: la primera corrida con
+--guardar la crea en benchmarks/linea_base.json y las siguientes comparan contra ella.
+"""
+import argparse
+from io import BytesIO
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.cargas import ESCALAS, planeacion_sintetica
+
+LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linea_base.json')
+
+# Orden de las columnas de fases; las de otros motores van antes de 'guardar'
+_ORDEN_FASES = ['json', 'compilar', 'esqueleto', 'tabla1', 'tabla2', 'tabla3', 'tabla4', 'tabla5']
+
+# Debajo de esta diferencia (ms) no se considera regresión aunque pase la tolerancia
+_MINIMO_MS = 1.0
+
+
+def percentil(valores, fraccion):
+    """Percentil por el método del rango más cercano (fraccion 0.95 = p95)"""
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(fraccion * (len(ordenados) - 1))))]
+
+
+def medir(servidor, modalidad, escala, repeticiones):
+    """Mide una combinación modalidad/escala y regresa su resultado"""
+    cliente = servidor.app.test_client()
+    cuerpo = json.dumps(planeacion_sintetica(modalidad, escala)).encode('utf-8')
+
+    def solicitud():
+        respuesta = cliente.post('/generar-word', data=cuerpo, content_type='application/json')
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"{modalidad}/{escala}: respuesta {respuesta.status_code} {respuesta.data[:200]!r}")
+        return respuesta.data
+
+    tamano = len(solicitud())  # calentamiento
+
+    latencias = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        solicitud()
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    # Fases del render, llamando al motor configurado con el mismo cuerpo
+    motor = servidor.MOTORES_WORD[servidor.MOTOR_WORD]
+    fases = {}
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        data = json.loads(cuerpo)
+        tiempos = {'json': (time.perf_counter() - inicio) * 1000}
+        motor(data, servidor.validar_planeacion(data), BytesIO(), tiempos)
+        for fase, ms in tiempos.items():
+            fases.setdefault(fase, []).append(ms)
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        solicitud()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'mediana_ms': round(statistics.median(latencias), 3),
+        'p95_ms': round(percentil(latencias, 0.95), 3),
+        'documentos_por_segundo': round(len(latencias) / (sum(latencias) / 1000), 2),
+        'pico_kb': round(pico / 1024, 1),
+        'bytes_documento': tamano,
+        'fases_ms': {fase: round(statistics.median(valores), 3) for fase, valores in fases.items()},
+    }
+
+
+def comparar(resultados, linea_base, tolerancia, tolerancia_memoria):
+    """Lista de regresiones contra la línea base (solo combinaciones presentes en ambas)"""
+    regresiones = []
+    for combinacion, actual in resultados.items():
+        base = linea_base.get(combinacion)
+        if base is None:
+            continue
+        limite_ms = max(base['mediana_ms'] * (1 + tolerancia), base['mediana_ms'] + _MINIMO_MS)
+        if actual['mediana_ms'] > limite_ms:
+            regresiones.append(f"{combinacion}: mediana {actual['mediana_ms']} ms > {limite_ms:.3f} ms "
+                               f"(base {base['mediana_ms']} ms)")
+        limite_kb = base['pico_kb'] * (1 + tolerancia_memoria)
+        if actual['pico_kb'] > limite_kb:
+            regresiones.append(f"{combinacion}: pico {actual['pico_kb']} KB > {limite_kb:.1f} KB "
+                               f"(base {base['pico_kb']} KB)")
+    return regresiones
+
+
+def imprimir(resultados):
+    fases = sorted({fase for resultado in resultados.values() for fase in resultado['fases_ms']},
+                   key=lambda fase: (fase == 'guardar', _ORDEN_FASES.index(fase) if fase in _ORDEN_FASES else len(_ORDEN_FASES)))
+    encabezado = f"{'combinación':<42}{'mediana':>9}{'p95':>9}{'doc/s':>8}{'pico KB':>10}" + ''.join(f"{fase:>10}" for fase in fases)
+    print(encabezado)
+    print('-' * len(encabezado))
+    for combinacion, r in resultados.items():
+        print(f"{combinacion:<42}{r['mediana_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['documentos_por_segundo']:>8.1f}"
+              f"{r['pico_kb']:>10.1f}" + ''.join(f"{r['fases_ms'].get(fase, 0):>10.3f}" for fase in fases))
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Benchmark de POST /generar-word')
+    parser.add_argument('--motor', choices=['docx', 'ooxml', 'plantilla'], default=os.environ.get('MOTOR_WORD', 'docx'))
+    parser.add_argument('--modalidades', nargs='+', help='claves de MODALIDADES_CONFIG (todas por omisión)')
+    parser.add_argument('--escalas', nargs='+', choices=list(ESCALAS), default=list(ESCALAS))
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--linea-base', default=LINEA_BASE)
+    parser.add_argument('--guardar', action='store_true', help='guardar los resultados como línea base')
+    parser.add_argument('--tolerancia', type=float, default=0.5, help='aumento de latencia permitido (0.5 = 50%%)')
+    parser.add_argument('--tolerancia-memoria', type=float, default=0.2, help='aumento de memoria pico permitido')
+    parser.add_argument('--salida', help='archivo donde escribir los resultados en JSON')
+    opciones = parser.parse_args(argumentos)
+
+    # Configuración del servidor antes de importarlo: sin cache, sin pool y sin logs de solicitudes
+    os.environ['MOTOR_WORD'] = opciones.motor
+    os.environ['CACHE_DOCUMENTOS_MAX_MB'] = '0'
+    os.environ['RENDER_PROCESOS'] = '0'
+    os.environ['RESPUESTA_WORD'] = 'memoria'
+    # La escala muy_grande (unos 2 MB de JSON) pasa del límite de producción
+    os.environ.setdefault('PLANEACION_MAX_KB', '4096')
+    os.environ.setdefault('LOG_NIVEL', 'WARNING')
+    import app as servidor
+
+    modalidades = opciones.modalidades or list(servidor.MODALIDADES_CONFIG)
+    resultados = {}
+    for modalidad in modalidades:
+        for escala in opciones.escalas:
+            resultados[f"{modalidad}/{escala}"] = medir(servidor, modalidad, escala, opciones.repeticiones)
+    imprimir(resultados)
+
+    if opciones.salida:
+        with open(opciones.salida, 'w', encoding='utf-8') as archivo:
+            json.dump({'motor': opciones.motor, 'resultados': resultados}, archivo, ensure_ascii=False, indent=2)
+
+    lineas_base = {}
+    if os.path.exists(opciones.linea_base):
+        with open(opciones.linea_base, encoding='utf-8') as archivo:
+            lineas_base = json.load(archivo)
+
+    if opciones.guardar:
+        lineas_base.setdefault(opciones.motor, {}).update(resultados)
+        with open(opciones.linea_base, 'w', encoding='utf-8') as archivo:
+            json.dump(lineas_base, archivo, ensure_ascii=False, indent=2, sort_keys=True)
+            archivo.write('\n')
+        print(f"\nLínea base del motor '{opciones.motor}' guardada en {opciones.linea_base}")
+        return 0
+
+    linea_base = lineas_base.get(opciones.motor, {})
+    if not linea_base:
+        print(f"\nSin línea base para el motor '{opciones.motor}'; usar --guardar para crearla")
+        return 0
+    regresiones = comparar(resultados, linea_base, opciones.tolerancia, opciones.tolerancia_memoria)
+    if regresiones:
+        print('\nRegresiones contra la línea base:')
+        for regresion in regresiones:
+            print(f"  {regresion}")
+        return 1
+    print(f"\nSin regresiones contra la línea base ({len(resultados)} combinaciones)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
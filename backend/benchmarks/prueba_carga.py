@@ -0,0 +1,379 @@
+"""Prueba de carga local contra el servidor corriendo con la configuración de despliegue.
+
+Levanta el backend con el mismo comando de gunicorn del Procfile (o con variantes de
+workers x hilos), le envía una mezcla de tráfico a /, /modalidades y /generar-word
+durante un tiempo, a concurrencia fija o a una tasa objetivo, y reporta por cada
+configuración: latencia p50/p95/p99 (total y por ruta), tasa de errores, solicitudes
+por segundo y la memoria RSS del servidor (master más workers) a lo largo de la
+prueba. Al final imprime un resumen de capacidad de todas las configuraciones.
+
+Solo usa la biblioteca estándar y corre sin red en una sola máquina Linux. Desde backend/:
+
+    python -m benchmarks.prueba_carga                              # Procfile tal cual
+    python -m benchmarks.prueba_carga --configuraciones 1x4 1x8 2x4 --duracion 30
+    python -m benchmarks.prueba_carga --tasa 20 --mezcla /=1 /modalidades=1 /generar-word=8
+    python -m benchmarks.prueba_carga --url http://localhost:5000   # servidor ya levantado
+
+Con --tasa la latencia se mide desde el momento en que la solicitud debía salir, así
+que incluye la espera cuando el cliente o el servidor se atrasan.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import os
+import random
+import re
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.cargas import planeacion_sintetica
+from benchmarks.generar_word import percentil
+from planeacion import MODALIDADES_CONFIG
+
+DIRECTORIO_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROCFILE = os.path.join(DIRECTORIO_BACKEND, 'Procfile')
+
+MEZCLA_PREDETERMINADA = ['/=1', '/modalidades=2', '/generar-word=7']
+ESCALAS_PREDETERMINADAS = ['chica=6', 'mediana=3', 'grande=1']
+
+
+def comando_procfile(ruta=PROCFILE):
+    """Argumentos del proceso `web:` del Procfile"""
+    with open(ruta, encoding='utf-8') as archivo:
+        for linea in archivo:
+            if linea.startswith('web:'):
+                return shlex.split(linea[len('web:'):])
+    raise ValueError(f"No hay proceso 'web' en {ruta}")
+
+
+def variante(comando, workers, hilos):
+    """Copia del comando de gunicorn con otros valores de --workers y --threads"""
+    comando = list(comando)
+    for opcion, valor in (('--workers', workers), ('--threads', hilos)):
+        if opcion in comando:
+            comando[comando.index(opcion) + 1] = str(valor)
+        else:
+            comando += [opcion, str(valor)]
+    return comando
+
+
+def leer_pesos(pares):
+    """['ruta=peso', ...] -> [(ruta, peso), ...]"""
+    pesos = []
+    for par in pares:
+        nombre, _, peso = par.rpartition('=')
+        if not nombre or float(peso) < 0:
+            raise ValueError(f"Peso no válido: '{par}' (se espera nombre=peso)")
+        pesos.append((nombre, float(peso)))
+    return pesos
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def rss_arbol(pid):
+    """RSS en bytes del proceso y todos sus descendientes (lee /proc)"""
+    hijos = {}
+    for entrada in os.listdir('/proc'):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat', encoding='utf-8') as archivo:
+                # El nombre del proceso va entre paréntesis y puede tener espacios
+                ppid = int(archivo.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        hijos.setdefault(ppid, []).append(int(entrada))
+
+    total = 0
+    pendientes = [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        try:
+            with open(f'/proc/{actual}/status', encoding='utf-8') as archivo:
+                for linea in archivo:
+                    if linea.startswith('VmRSS:'):
+                        total += int(linea.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+        pendientes.extend(hijos.get(actual, []))
+    return total
+
+
+class Servidor:
+    """Proceso del backend levantado para la prueba; se detiene al salir del `with`"""
+
+    def __init__(self, comando, puerto, entorno=None, espera=60):
+        self.comando = [parte.replace('$PORT', str(puerto)) for parte in comando]
+        self.url = f'http://127.0.0.1:{puerto}'
+        self.entorno = dict(os.environ, PORT=str(puerto), **(entorno or {}))
+        self.espera = espera
+        self.proceso = None
+        # Los logs van a un archivo: un pipe sin leer se llenaría y bloquearía al servidor
+        self.logs = tempfile.TemporaryFile()
+
+    def __enter__(self):
+        self.proceso = subprocess.Popen(
+            self.comando, cwd=DIRECTORIO_BACKEND, env=self.entorno,
+            stdout=self.logs, stderr=subprocess.STDOUT
+        )
+        limite = time.monotonic() + self.espera
+        while time.monotonic() < limite:
+            if self.proceso.poll() is not None:
+                self.logs.seek(0)
+                raise RuntimeError(f"El servidor terminó al arrancar: {self.logs.read().decode(errors='replace')[-2000:]}")
+            try:
+                estado, _ = solicitar(self.url, 'GET', '/', None, timeout=2)
+                if estado == 200:
+                    return self
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"El servidor no respondió en {self.espera} s")
+
+    def rss(self):
+        return rss_arbol(self.proceso.pid)
+
+    def __exit__(self, *exc):
+        if self.proceso is not None and self.proceso.poll() is None:
+            self.proceso.send_signal(signal.SIGTERM)
+            try:
+                self.proceso.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.proceso.kill()
+                self.proceso.wait()
+        self.logs.close()
+
+
+_conexiones = threading.local()
+
+
+def solicitar(url, metodo, ruta, cuerpo, timeout=130):
+    """Hace una solicitud reutilizando la conexión del hilo; regresa (estado, bytes leídos)"""
+    partes = urlsplit(url)
+    conexion = getattr(_conexiones, 'conexion', None)
+    if conexion is None or getattr(_conexiones, 'url', None) != url:
+        conexion = http.client.HTTPConnection(partes.hostname, partes.port, timeout=timeout)
+        _conexiones.conexion, _conexiones.url = conexion, url
+    encabezados = {'Content-Type': 'application/json'} if cuerpo is not None else {}
+    try:
+        conexion.request(metodo, ruta, body=cuerpo, headers=encabezados)
+        respuesta = conexion.getresponse()
+        return respuesta.status, len(respuesta.read())
+    except (OSError, http.client.HTTPException):
+        conexion.close()
+        _conexiones.conexion = None
+        raise
+
+
+class Trafico:
+    """Genera las solicitudes de la mezcla; los cuerpos de /generar-word son planeaciones
+    sintéticas de modalidades al azar, únicas si `unicas` (para no medir la cache)"""
+
+    def __init__(self, mezcla, escalas, unicas=True, semilla=None):
+        self.rutas, self.pesos_rutas = zip(*mezcla)
+        self.escalas, self.pesos_escalas = zip(*escalas)
+        self.unicas = unicas
+        self._aleatorio = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._contador = 0
+        self._plantillas = {
+            (modalidad, escala): planeacion_sintetica(modalidad, escala)
+            for modalidad in MODALIDADES_CONFIG for escala in self.escalas
+        }
+
+    def siguiente(self):
+        with self._lock:
+            ruta = self._aleatorio.choices(self.rutas, self.pesos_rutas)[0]
+            if ruta != '/generar-word':
+                return 'GET', ruta, None
+            modalidad = self._aleatorio.choice(list(MODALIDADES_CONFIG))
+            escala = self._aleatorio.choices(self.escalas, self.pesos_escalas)[0]
+            self._contador += 1
+            contador = self._contador
+        data = self._plantillas[(modalidad, escala)]
+        if self.unicas:
+            data = dict(data, titulo=f"{data['titulo']} #{contador}")
+        return 'POST', ruta, json.dumps(data).encode('utf-8')
+
+
+def ejecutar_carga(url, trafico, duracion, concurrencia=None, tasa=None, medir_rss=None, intervalo_rss=1.0):
+    """Envía tráfico durante `duracion` segundos y regresa las muestras
+    [(ruta, estado o None si falló la conexión, latencia ms)] y la serie de RSS [(t, bytes)]"""
+    muestras = []
+    lock = threading.Lock()
+    inicio = time.monotonic()
+    fin = inicio + duracion
+
+    def una(programada):
+        metodo, ruta, cuerpo = trafico.siguiente()
+        try:
+            estado, _ = solicitar(url, metodo, ruta, cuerpo)
+        except (OSError, http.client.HTTPException):
+            estado = None
+        latencia = (time.monotonic() - programada) * 1000
+        with lock:
+            muestras.append((ruta, estado, latencia))
+
+    def cliente_cerrado():
+        while time.monotonic() < fin:
+            una(time.monotonic())
+
+    serie_rss = []
+    detener = threading.Event()
+
+    def muestrear_rss():
+        while not detener.is_set():
+            serie_rss.append((round(time.monotonic() - inicio, 1), medir_rss()))
+            detener.wait(intervalo_rss)
+
+    hilo_rss = threading.Thread(target=muestrear_rss, daemon=True) if medir_rss else None
+    if hilo_rss:
+        hilo_rss.start()
+
+    if tasa:
+        # Lazo abierto: una solicitud cada 1/tasa segundos, haya o no respuestas pendientes
+        with ThreadPoolExecutor(max_workers=concurrencia or 64) as pool:
+            programada = inicio
+            while programada < fin:
+                time.sleep(max(0.0, programada - time.monotonic()))
+                pool.submit(una, programada)
+                programada += 1 / tasa
+    else:
+        hilos = [threading.Thread(target=cliente_cerrado) for _ in range(concurrencia or 1)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+    detener.set()
+    if hilo_rss:
+        hilo_rss.join()
+    return muestras, serie_rss, time.monotonic() - inicio
+
+
+def resumir(muestras, serie_rss, segundos):
+    """Percentiles, errores y rendimiento de una corrida"""
+    def estadisticas(grupo):
+        latencias = [latencia for _, _, latencia in grupo]
+        errores = sum(1 for _, estado, _ in grupo if estado is None or estado >= 500)
+        return {
+            'solicitudes': len(grupo),
+            'p50_ms': round(percentil(latencias, 0.50), 1) if latencias else None,
+            'p95_ms': round(percentil(latencias, 0.95), 1) if latencias else None,
+            'p99_ms': round(percentil(latencias, 0.99), 1) if latencias else None,
+            'errores': errores,
+            'tasa_errores': round(errores / len(grupo), 4) if grupo else 0.0,
+        }
+
+    resumen = estadisticas(muestras)
+    resumen['solicitudes_por_segundo'] = round(len(muestras) / segundos, 2)
+    resumen['estados'] = {}
+    for _, estado, _ in muestras:
+        clave = str(estado) if estado is not None else 'conexion'
+        resumen['estados'][clave] = resumen['estados'].get(clave, 0) + 1
+    resumen['por_ruta'] = {
+        ruta: estadisticas([m for m in muestras if m[0] == ruta])
+        for ruta in sorted({ruta for ruta, _, _ in muestras})
+    }
+    if serie_rss:
+        resumen['rss_max_mb'] = round(max(rss for _, rss in serie_rss) / 2 ** 20, 1)
+        resumen['rss_final_mb'] = round(serie_rss[-1][1] / 2 ** 20, 1)
+        resumen['rss_mb'] = [(t, round(rss / 2 ** 20, 1)) for t, rss in serie_rss]
+    return resumen
+
+
+def imprimir_corrida(nombre, resumen):
+    print(f"\n=== {nombre} ===")
+    print(f"{resumen['solicitudes']} solicitudes, {resumen['solicitudes_por_segundo']} por segundo, "
+          f"errores {resumen['tasa_errores']:.2%} {resumen['estados']}")
+    print(f"{'ruta':<16}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>9}")
+    for ruta, r in [('(todas)', resumen)] + list(resumen['por_ruta'].items()):
+        print(f"{ruta:<16}{r['solicitudes']:>7}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['errores']:>9}")
+    if 'rss_mb' in resumen:
+        paso = max(1, len(resumen['rss_mb']) // 10)
+        serie = ', '.join(f"{t:g}s {mb}" for t, mb in resumen['rss_mb'][::paso])
+        print(f"RSS (MB): {serie}; máximo {resumen['rss_max_mb']}")
+
+
+def imprimir_capacidad(corridas, slo_p95, max_errores):
+    print(f"\n=== Capacidad (SLO: p95 <= {slo_p95:g} ms y errores <= {max_errores:.1%}) ===")
+    print(f"{'configuración':<24}{'sol/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'errores':>9}{'RSS máx':>9}  SLO")
+    for nombre, r in corridas.items():
+        cumple = r['p95_ms'] is not None and r['p95_ms'] <= slo_p95 and r['tasa_errores'] <= max_errores
+        print(f"{nombre:<24}{r['solicitudes_por_segundo']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+              f"{r['tasa_errores']:>9.2%}{r.get('rss_max_mb', '-'):>9}  {'cumple' if cumple else 'no cumple'}")
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Prueba de carga del backend con gunicorn')
+    parser.add_argument('--configuraciones', nargs='+', metavar='WORKERSxHILOS',
+                        help='variantes del comando del Procfile, p. ej. 1x4 2x4 (por omisión el Procfile tal cual)')
+    parser.add_argument('--comando', help='comando del servidor en lugar del Procfile ($PORT se reemplaza)')
+    parser.add_argument('--url', help='probar un servidor ya levantado en lugar de arrancar uno')
+    parser.add_argument('--duracion', type=float, default=20, help='segundos por configuración')
+    parser.add_argument('--concurrencia', type=int, default=8, help='clientes simultáneos (máximo pendientes con --tasa)')
+    parser.add_argument('--tasa', type=float, help='solicitudes por segundo objetivo (lazo abierto)')
+    parser.add_argument('--mezcla', nargs='+', default=MEZCLA_PREDETERMINADA, metavar='RUTA=PESO')
+    parser.add_argument('--escalas', nargs='+', default=ESCALAS_PREDETERMINADAS, metavar='ESCALA=PESO',
+                        help='escalas de las planeaciones de /generar-word')
+    parser.add_argument('--repetir-cuerpos', action='store_true',
+                        help='repetir planeaciones idénticas (mide la cache en lugar del render)')
+    parser.add_argument('--entorno', nargs='+', default=[], metavar='VAR=VALOR', help='variables extra del servidor')
+    parser.add_argument('--slo-p95', type=float, default=2000, help='p95 máximo en ms para el resumen de capacidad')
+    parser.add_argument('--max-errores', type=float, default=0.01, help='tasa de errores máxima para el resumen')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', help='archivo donde escribir los resultados en JSON')
+    opciones = parser.parse_args(argumentos)
+
+    trafico = Trafico(leer_pesos(opciones.mezcla), leer_pesos(opciones.escalas),
+                      unicas=not opciones.repetir_cuerpos, semilla=opciones.semilla)
+
+    def correr(url, medir_rss=None):
+        muestras, serie_rss, segundos = ejecutar_carga(
+            url, trafico, opciones.duracion, opciones.concurrencia, opciones.tasa, medir_rss
+        )
+        return resumir(muestras, serie_rss, segundos)
+
+    corridas = {}
+    if opciones.url:
+        corridas[opciones.url] = correr(opciones.url)
+        imprimir_corrida(opciones.url, corridas[opciones.url])
+    else:
+        base = shlex.split(opciones.comando) if opciones.comando else comando_procfile()
+        variantes = {}
+        for configuracion in opciones.configuraciones or []:
+            if not re.fullmatch(r'\d+x\d+', configuracion):
+                parser.error(f"Configuración no válida: '{configuracion}' (se espera WORKERSxHILOS)")
+            workers, hilos = configuracion.split('x')
+            variantes[f"{workers} workers x {hilos} hilos"] = variante(base, workers, hilos)
+        if not variantes:
+            variantes['comando' if opciones.comando else 'Procfile'] = base
+        entorno = dict(par.split('=', 1) for par in opciones.entorno)
+        for nombre, comando in variantes.items():
+            with Servidor(comando, puerto_libre(), entorno) as servidor:
+                corridas[nombre] = correr(servidor.url, servidor.rss)
+            imprimir_corrida(f"{nombre}: {' '.join(comando)}", corridas[nombre])
+
+    imprimir_capacidad(corridas, opciones.slo_p95, opciones.max_errores)
+    if opciones.salida:
+        with open(opciones.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(corridas, archivo, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
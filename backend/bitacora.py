@@ -0,0 +1,120 @@
+"""Bitácora (logging) estructurada y de bajo costo para el servidor.
+
+Los registros se entregan a una cola (QueueHandler) y un hilo aparte (QueueListener)
+los formatea y los escribe, así que el hilo de la solicitud no espera la E/S de
+stdout. Cada solicitud deja un solo registro con sus tiempos; el detalle de debug se
+registra solo en una fracción de las solicitudes (muestreo).
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+# Decisión de muestreo de la solicitud en curso (None fuera de una solicitud)
+_muestrear_debug = contextvars.ContextVar('muestrear_debug', default=None)
+
+# Hilo que escribe los registros; un proceso hijo (gunicorn con preload_app) hereda la
+# cola pero no el hilo, así que se vuelve a arrancar después del fork
+_listener = None
+
+
+def _reanudar_tras_fork():
+    if _listener is not None and _listener._thread is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+os.register_at_fork(after_in_child=_reanudar_tras_fork)
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro; los campos de `extra={'campos': {...}}` van al nivel superior"""
+
+    def format(self, record):
+        registro = {
+            'ts': round(record.created, 3),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+        }
+        campos = getattr(record, 'campos', None)
+        if campos:
+            registro.update(campos)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class FormatoTexto(logging.Formatter):
+    """Formato legible para desarrollo local; los campos extra van como clave=valor"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        texto = super().format(record)
+        campos = getattr(record, 'campos', None)
+        if campos:
+            texto += ' ' + ' '.join(f"{clave}={valor}" for clave, valor in campos.items())
+        return texto
+
+
+class MuestreoDebug(logging.Filter):
+    """Deja pasar todos los registros de INFO en adelante y solo una fracción de los de DEBUG.
+
+    Dentro de una solicitud se usa la decisión de `muestrear_solicitud`, para que el
+    detalle de una solicitud muestreada salga completo; fuera de ellas se decide por registro."""
+
+    def __init__(self, tasa):
+        super().__init__()
+        self.tasa = tasa
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        muestrear = _muestrear_debug.get()
+        if muestrear is None:
+            muestrear = random.random() < self.tasa
+        return muestrear
+
+
+def muestrear_solicitud(tasa):
+    """Decide una vez por solicitud si se registra su detalle de debug"""
+    muestrear = tasa >= 1 or (tasa > 0 and random.random() < tasa)
+    _muestrear_debug.set(muestrear)
+    return muestrear
+
+
+def configurar(nivel='INFO', tasa_debug=0.0, formato='json'):
+    """Reemplaza los handlers del logger raíz por una cola atendida en segundo plano.
+
+    Con `nivel` DEBUG se registra todo el detalle; con INFO y `tasa_debug` > 0 se
+    registra el detalle de esa fracción de solicitudes. Regresa la tasa efectiva."""
+    nivel = logging.getLevelName(nivel.upper()) if isinstance(nivel, str) else nivel
+    if not isinstance(nivel, int):
+        raise ValueError(f"Nivel de log no válido: {nivel}")
+    if nivel <= logging.DEBUG:
+        tasa_debug = 1.0
+
+    salida = logging.StreamHandler()
+    salida.setFormatter(FormatoJSON() if formato == 'json' else FormatoTexto())
+
+    cola = queue.SimpleQueue()
+    entrada = logging.handlers.QueueHandler(cola)
+    entrada.addFilter(MuestreoDebug(tasa_debug))
+    listener = logging.handlers.QueueListener(cola, salida)
+
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(entrada)
+    raiz.setLevel(logging.DEBUG if tasa_debug > 0 else nivel)
+
+    global _listener
+    _listener = listener
+    listener.start()
+    # Vaciar la cola al salir para no perder los últimos registros
+    atexit.register(listener.stop)
+    return tasa_debug
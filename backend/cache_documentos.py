@@ -0,0 +1,98 @@
+"""Cache de documentos generados, direccionada por contenido.
+
+La clave es el hash SHA-256 de la forma canónica de la solicitud y de la versión del
+motor que la genera, así que sirve también como ETag: la misma solicitud con el mismo
+motor siempre produce los mismos bytes.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+
+from planeacion import VERSION_DOCUMENTO
+
+
+def forma_canonica(data, modalidad):
+    """Serialización estable de la solicitud: llaves ordenadas y la modalidad ya
+    normalizada como la usa el generador (minúsculas)"""
+    canonica = dict(data, modalidad=modalidad)
+    return json.dumps(canonica, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def clave_documento(data, modalidad, version_motor=''):
+    """Hash de la forma canónica más la versión del formato del documento y la del
+    motor (ver app.version_motor)"""
+    contenido = f"{VERSION_DOCUMENTO}\n{version_motor}\n{forma_canonica(data, modalidad)}"
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+class CacheDocumentos:
+    """Cache LRU con expiración (TTL), acotada por número de entradas y por bytes totales"""
+
+    def __init__(self, max_bytes, max_entradas, ttl):
+        self.max_bytes = max_bytes
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # clave -> (expira, contenido, reporte de momentos)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    @property
+    def habilitada(self):
+        return self.max_bytes > 0 and self.max_entradas > 0
+
+    def obtener(self, clave):
+        """Regresa el contenido guardado o None; cuenta aciertos y fallos"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] < time.monotonic():
+                self._quitar(clave)
+                entrada = None
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def reporte(self, clave):
+        """Reporte de momentos guardado con el documento, o None si no está o no se
+        guardó con uno; no cuenta como acierto ni como fallo"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            return None if entrada is None else entrada[2]
+
+    def guardar(self, clave, contenido, reporte=None):
+        """Guarda el contenido (y el reporte de momentos de la solicitud, si se da) y
+        expulsa las entradas menos usadas hasta caber en los límites"""
+        if not self.habilitada or len(contenido) > self.max_bytes:
+            return
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            self._entradas[clave] = (time.monotonic() + self.ttl, contenido, reporte)
+            self._bytes += len(contenido)
+            while self._bytes > self.max_bytes or len(self._entradas) > self.max_entradas:
+                self._quitar(next(iter(self._entradas)))
+                self.expulsiones += 1
+
+    def _quitar(self, clave):
+        _, contenido, _ = self._entradas.pop(clave)
+        self._bytes -= len(contenido)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsiones': self.expulsiones,
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_entradas': self.max_entradas,
+                'ttl_segundos': self.ttl,
+            }
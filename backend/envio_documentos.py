@@ -0,0 +1,184 @@
+"""Envío de documentos sin armar el paquete completo en memoria.
+
+Dos formas de entregar lo que escribe un motor (`render(destino)`):
+
+- `generar_en_spool`: el motor escribe en un SpooledTemporaryFile que pasa a disco al
+  superar el umbral, y el archivo se sirve con wsgi.file_wrapper (sendfile en gunicorn).
+- `enviar_por_partes`: el motor escribe en un hilo aparte y las entradas del zip salen
+  por la respuesta (transferencia por partes) conforme se escriben. La cola entre los
+  dos hilos es acotada, así que un cliente lento frena al motor en lugar de acumular
+  el documento en memoria.
+"""
+import queue
+import tempfile
+import threading
+
+
+class EnvioCancelado(Exception):
+    """El cliente dejó de leer la respuesta; el motor debe dejar de escribir"""
+
+
+class SalidaEnCola:
+    """Destino no posicionable para el motor: junta lo escrito en bloques de
+    `tam_bloque` bytes y los pasa al hilo que responde por una cola de `max_bloques`"""
+
+    _FIN = object()
+
+    def __init__(self, tam_bloque, max_bloques):
+        self.tam_bloque = tam_bloque
+        self.cancelada = False
+        self._cola = queue.Queue(maxsize=max_bloques)
+        self._bloque = bytearray()
+
+    def write(self, datos):
+        if self.cancelada:
+            raise EnvioCancelado()
+        self._bloque += datos
+        if len(self._bloque) >= self.tam_bloque:
+            self._entregar()
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def _entregar(self):
+        bloque = bytes(self._bloque)
+        self._bloque.clear()
+        self._poner(bloque)
+
+    def _poner(self, elemento):
+        # Se espera por intervalos para notar si el envío se canceló mientras la cola está llena
+        while True:
+            if self.cancelada:
+                raise EnvioCancelado()
+            try:
+                self._cola.put(elemento, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def producir(self, render):
+        """Corre el motor (en el hilo productor) y marca el fin o el error en la cola"""
+        try:
+            render(self)
+            if self._bloque:
+                self._entregar()
+            self._poner(self._FIN)
+        except EnvioCancelado:
+            pass
+        except Exception as e:
+            try:
+                self._poner(e)
+            except EnvioCancelado:
+                pass
+
+    def siguiente(self, timeout=None):
+        """Siguiente bloque escrito por el motor, None al terminar; relanza su error"""
+        try:
+            elemento = self._cola.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("El motor no escribió el documento a tiempo")
+        if elemento is self._FIN:
+            return None
+        if isinstance(elemento, Exception):
+            raise elemento
+        return elemento
+
+    def cancelar(self):
+        self.cancelada = True
+
+
+class ArchivoPorPartes:
+    """Archivo de solo lectura sobre los bloques que escribe el motor, para servirlo con
+    send_file: cada `read` entrega el siguiente bloque y `close` cancela el envío.
+    `enviados` cuenta los bytes entregados"""
+
+    def __init__(self, partes):
+        self._partes = partes
+        self.enviados = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            datos = b''.join(self._partes)
+        else:
+            datos = next(self._partes, b'')
+        self.enviados += len(datos)
+        return datos
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self._partes.close()
+
+
+class ArchivoObservado:
+    """Envuelve el archivo que se pasa a send_file para saber cuándo terminó el envío.
+
+    El servidor cierra el archivo al terminar de mandarlo (también con sendfile), y las
+    respuestas de send_file no ejecutan `call_on_close`; `close` llama las funciones de
+    `al_cerrar`. Lo demás (read, fileno, seek) pasa al archivo original."""
+
+    def __init__(self, archivo):
+        self._archivo = archivo
+        self.al_cerrar = []
+
+    def __getattr__(self, nombre):
+        return getattr(self._archivo, nombre)
+
+    def close(self):
+        try:
+            self._archivo.close()
+        finally:
+            funciones, self.al_cerrar = self.al_cerrar, []
+            for funcion in funciones:
+                funcion()
+
+
+def enviar_por_partes(render, tam_bloque=64 * 1024, max_bloques=4, timeout=None,
+                      conservar_hasta=0, al_terminar=None):
+    """Arranca el motor en otro hilo y regresa un ArchivoPorPartes con el documento.
+
+    Se espera el primer bloque antes de regresar, así que un error del motor al inicio
+    (por ejemplo, texto inválido) se lanza aquí y todavía puede responderse con un
+    código de error. Al terminar el envío se llama `al_terminar(contenido)` (por ejemplo,
+    para la cache), con None en lugar de los bytes si pasan de `conservar_hasta`."""
+    salida = SalidaEnCola(tam_bloque, max_bloques)
+    threading.Thread(target=salida.producir, args=(render,), name='envio-documento', daemon=True).start()
+    try:
+        primero = salida.siguiente(timeout)
+    except BaseException:
+        salida.cancelar()
+        raise
+    return ArchivoPorPartes(_partes(salida, primero, timeout, conservar_hasta, al_terminar))
+
+
+def _partes(salida, bloque, timeout, conservar_hasta, al_terminar):
+    conservados = []
+    tamano = 0
+    try:
+        while bloque is not None:
+            tamano += len(bloque)
+            if tamano <= conservar_hasta:
+                conservados.append(bloque)
+            yield bloque
+            bloque = salida.siguiente(timeout)
+        if al_terminar is not None:
+            al_terminar(b''.join(conservados) if tamano <= conservar_hasta else None)
+    finally:
+        # También al cerrar el generador antes de tiempo (cliente desconectado)
+        salida.cancelar()
+
+
+def generar_en_spool(render, umbral):
+    """Escribe el documento en un SpooledTemporaryFile y lo regresa al inicio, junto con
+    su tamaño y si pasó a disco (mide más de `umbral` bytes)"""
+    archivo = tempfile.SpooledTemporaryFile(max_size=umbral)
+    try:
+        render(archivo)
+    except BaseException:
+        archivo.close()
+        raise
+    tamano = archivo.tell()
+    archivo.seek(0)
+    return archivo, tamano, tamano > umbral
@@ -0,0 +1,169 @@
+"""Validación del cuerpo de una planeación antes de generar nada.
+
+El esquema se compila una vez al arrancar (compilar_esquema) en un árbol de
+validadores: cada uno revisa el tipo y el límite de su valor y recorre sus hijos sin
+armar rutas ni mensajes. La ruta del campo (`procesosDesarrollo[2].gradosPorContenido`)
+solo se construye cuando algo falla, al propagarse el error, así que una planeación
+válida cuesta un recorrido de sus valores y una inválida se rechaza en cuanto aparece
+el primer problema.
+
+Los campos que no están en el esquema se ignoran, como en planeacion.py. Un tipo
+equivocado es un error 400; un texto o una lista más grande que su límite, 413.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # sin orjson se usa el decodificador de la biblioteca estándar
+    orjson = None
+
+
+class ErrorEsquema(ValueError):
+    """Valor que no cumple el esquema; `ruta` dice en qué campo y `codigo` el estado HTTP"""
+
+    def __init__(self, mensaje, codigo=400, maximo=None):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.codigo = codigo
+        self.maximo = maximo
+        self._partes = []
+
+    def dentro_de(self, parte):
+        """Antepone un campo (str) o un índice (int) a la ruta mientras el error sube"""
+        self._partes.append(parte)
+        return self
+
+    @property
+    def ruta(self):
+        ruta = ''
+        for parte in reversed(self._partes):
+            if isinstance(parte, int):
+                ruta += f'[{parte}]'
+            elif isinstance(parte, tuple):
+                ruta += f'[{json.dumps(parte[0], ensure_ascii=False)}]'
+            else:
+                ruta += f'.{parte}' if ruta else parte
+        return ruta
+
+    def __str__(self):
+        return f'{self.ruta}: {self.mensaje}' if self._partes else self.mensaje
+
+
+_NOMBRES_TIPOS = {str: 'un texto', list: 'una lista', dict: 'un objeto'}
+
+
+def _tipo_recibido(valor):
+    return 'null' if valor is None else type(valor).__name__
+
+
+def _revisar_tipo(valor, tipo):
+    if type(valor) is not tipo:
+        raise ErrorEsquema(f'se esperaba {_NOMBRES_TIPOS[tipo]}, se recibió {_tipo_recibido(valor)}')
+
+
+def _revisar_maximo(cantidad, maximo, unidad):
+    if cantidad > maximo:
+        raise ErrorEsquema(f'excede el máximo de {maximo} {unidad}', codigo=413, maximo=maximo)
+
+
+class Texto:
+    __slots__ = ('maximo',)
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+
+    def validar(self, valor):
+        _revisar_tipo(valor, str)
+        _revisar_maximo(len(valor), self.maximo, 'caracteres')
+
+
+class Lista:
+    __slots__ = ('elemento', 'maximo')
+
+    def __init__(self, elemento, maximo):
+        self.elemento = elemento
+        self.maximo = maximo
+
+    def validar(self, valor):
+        _revisar_tipo(valor, list)
+        _revisar_maximo(len(valor), self.maximo, 'elementos')
+        validar = self.elemento.validar
+        for indice, elemento in enumerate(valor):
+            try:
+                validar(elemento)
+            except ErrorEsquema as e:
+                raise e.dentro_de(indice)
+
+
+class Mapa:
+    """Objeto con claves libres (textos) y valores del mismo esquema"""
+    __slots__ = ('clave', 'valor', 'maximo')
+
+    def __init__(self, clave, valor, maximo):
+        self.clave = clave
+        self.valor = valor
+        self.maximo = maximo
+
+    def validar(self, valor):
+        _revisar_tipo(valor, dict)
+        _revisar_maximo(len(valor), self.maximo, 'entradas')
+        validar_clave, validar_valor = self.clave.validar, self.valor.validar
+        for clave, elemento in valor.items():
+            try:
+                validar_clave(clave)
+                validar_valor(elemento)
+            except ErrorEsquema as e:
+                raise e.dentro_de((clave[:40],))
+
+
+class Objeto:
+    """Objeto con campos conocidos, todos opcionales; los demás se ignoran"""
+    __slots__ = ('campos',)
+
+    def __init__(self, campos):
+        self.campos = campos
+
+    def validar(self, valor):
+        _revisar_tipo(valor, dict)
+        for nombre, campo in self.campos.items():
+            if nombre in valor:
+                try:
+                    campo.validar(valor[nombre])
+                except ErrorEsquema as e:
+                    raise e.dentro_de(nombre)
+
+
+def compilar_esquema(max_texto, max_elementos):
+    """Validador del cuerpo de POST /generar-word con los límites dados: caracteres de
+    cada texto (también las claves) y elementos de cada lista u objeto de claves libres"""
+    texto = Texto(max_texto)
+    lista_textos = Lista(texto, max_elementos)
+    return Objeto({
+        'modalidad': texto,
+        'titulo': texto,
+        'periodoAplicacion': texto,
+        'proposito': texto,
+        'relevanciaSocial': texto,
+        'ejeArticulador': texto,
+        'posiblesVariantes': texto,
+        'camposFormativos': lista_textos,
+        'contenidos': lista_textos,
+        # Por campo formativo: contenido -> grado -> elementos
+        'procesosDesarrollo': Lista(Objeto({
+            'gradosPorContenido': Mapa(texto, Mapa(texto, lista_textos, max_elementos), max_elementos),
+        }), max_elementos),
+        'relacionContenidos': Mapa(texto, texto, max_elementos),
+        'momentos': Mapa(texto, texto, max_elementos),
+        'materiales': lista_textos,
+        'espacios': lista_textos,
+        'produccionSugerida': lista_textos,
+    })
+
+
+def leer_json(cuerpo):
+    """Decodifica un cuerpo JSON (bytes) con orjson si está instalado.
+
+    Los errores son ValueError con cualquiera de los dos decodificadores"""
+    if orjson is not None:
+        return orjson.loads(cuerpo)
+    return json.loads(cuerpo)
@@ -0,0 +1,42 @@
+"""Estilos de Word que comparten los motores de generación.
+
+Las tablas de la planeación no llevan formato por celda: todas usan el estilo de
+tabla `TablaPlaneacion`, que define los bordes, la alineación de la tabla, la fila
+de encabezados en negrita y centrada a 12 pt, el contenido a 10 pt y los párrafos
+de las celdas sin espacio entre ellos. El estilo no depende del número de columnas,
+así que sirve igual para las tablas de 5 columnas y para la de 3 columnas de
+Situación Didáctica. Se registra una sola vez en el styles.xml del documento base de
+cada motor.
+"""
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+ESTILO_TABLA = 'TablaPlaneacion'
+NOMBRE_ESTILO_TABLA = 'Tabla Planeacion'
+
+_BORDES = ''.join(
+    f'<w:{borde} w:val="single" w:sz="4" w:space="0" w:color="000000"/>'
+    for borde in ['top', 'left', 'bottom', 'right', 'insideH', 'insideV']
+)
+
+# Tamaños en medios puntos: 24 = 12 pt para encabezados, 20 = 10 pt para el contenido
+XML_ESTILO_TABLA = (
+    f'<w:style {nsdecls("w")} w:type="table" w:customStyle="1" w:styleId="{ESTILO_TABLA}">'
+    f'<w:name w:val="{NOMBRE_ESTILO_TABLA}"/>'
+    '<w:basedOn w:val="TableNormal"/>'
+    '<w:uiPriority w:val="59"/>'
+    # Sin espacio entre párrafos: cada línea con viñeta de una celda es un párrafo
+    '<w:pPr><w:spacing w:after="0" w:line="240" w:lineRule="auto"/></w:pPr>'
+    '<w:rPr><w:sz w:val="20"/><w:szCs w:val="20"/></w:rPr>'
+    f'<w:tblPr><w:jc w:val="center"/><w:tblBorders>{_BORDES}</w:tblBorders></w:tblPr>'
+    '<w:tblStylePr w:type="firstRow">'
+    '<w:pPr><w:jc w:val="center"/></w:pPr>'
+    '<w:rPr><w:b/><w:bCs/><w:sz w:val="24"/><w:szCs w:val="24"/></w:rPr>'
+    '</w:tblStylePr>'
+    '</w:style>'
+)
+
+
+def registrar_estilos(documento):
+    """Agrega el estilo de tabla al styles.xml de un Document de python-docx"""
+    documento.styles.element.append(parse_xml(XML_ESTILO_TABLA))
@@ -0,0 +1,49 @@
+"""Configuración de gunicorn para el despliegue (la carga el comando del Procfile).
+
+El bind, los workers y el timeout van en el Procfile; aquí los hilos y el arranque:
+
+- `threads`: con el pool de render (RENDER_PROCESOS > 0) los documentos se generan
+  en otros procesos y los hilos del worker solo esperan los bytes, así que atiende 4
+  solicitudes a la vez (GUNICORN_HILOS). Sin pool cada hilo más sería otro render de
+  python-docx compitiendo por el GIL del mismo proceso: se queda en 1, como antes.
+
+- `preload_app`: la app se importa una vez en el proceso maestro y los workers se
+  crean con fork, así que comparten (copy-on-write) los módulos ya cargados y los
+  esqueletos o la plantilla del motor.
+- `on_starting`: con la app ya cargada, el maestro calienta el motor (app.calentar)
+  antes de abrir el puerto; el health check de Railway no responde hasta entonces.
+- `post_fork`: cada worker arranca su propio pool de render, si está habilitado
+  (los procesos del pool no se pueden heredar por fork), y conecta el reciclaje por
+  memoria (MEMORIA_RECICLAR_MB): el worker que pasa el límite se manda SIGTERM a sí
+  mismo, deja de aceptar conexiones, termina las suyas hasta el graceful_timeout y
+  sale; el maestro crea otro en su lugar, ya con la app precargada. Es el worker que
+  creció el que sale, no el más viejo.
+
+- `max_requests`: el reciclaje por número de solicitudes (MEMORIA_MAX_SOLICITUDES) es
+  el de gunicorn, con `max_requests_jitter` (MEMORIA_MAX_SOLICITUDES_VARIACION, 10%
+  por omisión) para que los workers no se reciclen todos a la vez.
+"""
+import os
+import signal
+
+preload_app = True
+threads = int(os.environ.get('GUNICORN_HILOS', '4' if int(os.environ.get('RENDER_PROCESOS', '0')) > 0 else '1'))
+max_requests = int(os.environ.get('MEMORIA_MAX_SOLICITUDES', '0'))
+max_requests_jitter = int(os.environ.get('MEMORIA_MAX_SOLICITUDES_VARIACION', str(max_requests // 10)))
+
+
+def on_starting(server):
+    import app as servidor
+    servidor.calentar(iniciar_pool=False)
+
+
+def retirar_worker(motivo):
+    """Salida ordenada de este worker, como la de max_requests: el maestro lo reemplaza"""
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def post_fork(server, worker):
+    import app as servidor
+    if servidor.pool_render.habilitado:
+        servidor.pool_render.iniciar([modalidad.clave for modalidad in servidor.MODALIDADES])
+    servidor.gobernador_memoria.al_reciclar = retirar_worker
@@ -0,0 +1,94 @@
+"""Generación de lotes de planeaciones en un ZIP que se envía por partes.
+
+Las planeaciones se generan en un pool y cada documento terminado se escribe como
+entrada del ZIP y se entrega de inmediato, así que los primeros bytes salen antes de
+que se genere el último documento. Al final va `manifest.json` con el resultado de
+cada planeación, de modo que un error en una no hace fallar el lote completo.
+"""
+from collections import deque
+import json
+import zipfile
+
+from esquema import leer_json
+
+NOMBRE_MANIFIESTO = 'manifest.json'
+
+
+class _SalidaPorPartes:
+    """Destino no posicionable para zipfile que acumula lo escrito hasta que se toma"""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def tomar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def leer_ndjson(stream):
+    """Itera las planeaciones de un cuerpo NDJSON (una por línea, líneas vacías se ignoran).
+    Una línea que no es JSON válido se entrega como ValueError para reportarla en el manifiesto"""
+    for linea in stream:
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            yield leer_json(linea)
+        except ValueError as e:
+            yield ValueError(f"Línea NDJSON inválida: {e}")
+
+
+def resultados_en_orden(pool, elementos, funcion, ventana):
+    """Envía cada elemento al pool y entrega los futuros en el orden de entrada,
+    con a lo más `ventana` pendientes para no leer ni generar todo el lote de golpe"""
+    pendientes = deque()
+    for elemento in elementos:
+        pendientes.append(pool.submit(funcion, elemento))
+        if len(pendientes) >= ventana:
+            yield pendientes.popleft()
+    while pendientes:
+        yield pendientes.popleft()
+
+
+def zip_por_partes(futuros):
+    """Genera los bytes del ZIP conforme terminan los documentos.
+
+    Cada futuro debe resolver a un dict con 'archivo', 'contenido' y opcionalmente
+    'reporte_momentos' si salió bien, o con 'error' (y opcionalmente 'codigo') si no;
+    con eso se arma la entrada del manifiesto."""
+    salida = _SalidaPorPartes()
+    manifiesto = []
+    # Los .docx ya vienen comprimidos, así que se guardan sin volver a comprimir
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_STORED) as paquete:
+        for indice, futuro in enumerate(futuros, start=1):
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                resultado = {'error': f"Error interno del servidor: {str(e)}", 'codigo': 500}
+            entrada = {'indice': indice}
+            if 'contenido' in resultado:
+                archivo = f"{indice:03d}_{resultado['archivo']}"
+                paquete.writestr(archivo, resultado['contenido'])
+                entrada.update(estado='ok', archivo=archivo)
+                if resultado.get('reporte_momentos'):
+                    entrada['reporte_momentos'] = resultado['reporte_momentos']
+            else:
+                entrada.update(estado='error', error=resultado['error'], codigo=resultado.get('codigo', 400))
+            manifiesto.append(entrada)
+            datos = salida.tomar()
+            if datos:
+                yield datos
+        paquete.writestr(NOMBRE_MANIFIESTO, json.dumps({
+            'total': len(manifiesto),
+            'correctos': sum(1 for entrada in manifiesto if entrada['estado'] == 'ok'),
+            'documentos': manifiesto,
+        }, ensure_ascii=False, indent=2))
+    yield salida.tomar()
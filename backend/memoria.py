@@ -0,0 +1,252 @@
+"""Memoria del proceso: medición por solicitud, guardia de renders y reciclaje del worker.
+
+Los árboles de lxml de python-docx en planeaciones grandes (muchos procesos de
+desarrollo) fragmentan el heap, y la RSS del worker sube hasta que el límite de
+memoria del contenedor lo mata a mitad de una solicitud. GobernadorMemoria tiene tres
+partes, todas basadas en la RSS que reporta el kernel (lxml reserva con malloc, fuera
+de lo que ve tracemalloc):
+
+- Muestreo: una de cada `muestreo` solicitudes de documentos mide su pico de RSS
+  sobre la del inicio (VmHWM, que se reinicia con /proc/self/clear_refs; sin eso, la
+  diferencia de RSS al terminar). VmHWM es de todo el proceso, así que la muestra
+  solo cuenta si su render corrió solo: si al empezar ya había renders en curso o
+  durante ella empezó más de uno, se descarta. Aun así es una cota superior (incluye
+  lo que hayan reservado otras solicitudes sin render en ese lapso).
+- Guardia: antes de generar, el render reserva su memoria estimada (`base` más
+  `factor` por byte del cuerpo). Si la RSS más lo reservado por los renders en curso
+  pasaría `limite`, espera a que terminen hasta `espera` segundos y después lanza
+  MemoriaInsuficiente (503). Sin renders en curso el worker mismo ya es demasiado
+  grande: se rechaza de inmediato y se pide reciclarlo.
+- Reciclaje: al terminar cada solicitud, si la RSS pasa `reciclar_en` (después de
+  intentar devolverle al sistema la memoria libre con malloc_trim), se llama
+  `al_reciclar(motivo)` una sola vez. gunicorn.conf.py lo conecta para que el worker
+  termine sus solicitudes en curso y salga, y el maestro cree otro en su lugar. El
+  reciclaje por número de solicitudes es el `max_requests` de gunicorn.
+
+Fuera de Linux (sin /proc) no hay RSS: no se mide, la guardia deja pasar todo y no
+recicla.
+"""
+import ctypes
+import ctypes.util
+import itertools
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# Rangos del tamaño del cuerpo para la etiqueta `tamano` de las métricas
+RANGOS_TAMANO = ((16 * 1024, '<16KB'), (64 * 1024, '<64KB'), (256 * 1024, '<256KB'), (1024 * 1024, '<1MB'))
+
+
+class MemoriaInsuficiente(Exception):
+    """Generar el documento pasaría el límite de memoria; el cliente debe reintentar más tarde"""
+    codigo = 503
+
+
+def rss():
+    """RSS actual del proceso en bytes; None si no se puede leer"""
+    try:
+        with open('/proc/self/statm', 'rb') as statm:
+            return int(statm.read().split()[1]) * _PAGINA
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _pico_rss():
+    try:
+        with open('/proc/self/status', 'rb') as status:
+            for linea in status:
+                if linea.startswith(b'VmHWM:'):
+                    return int(linea.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def _reiniciar_pico():
+    """Reinicia VmHWM a la RSS actual (Linux 4.0+); False si no se pudo"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _cargar_malloc_trim():
+    nombre = ctypes.util.find_library('c')
+    try:
+        return ctypes.CDLL(nombre).malloc_trim if nombre else None
+    except (OSError, AttributeError):
+        return None  # sin glibc (musl, macOS)
+
+
+_malloc_trim = _cargar_malloc_trim()
+
+
+def devolver_memoria_libre():
+    """Pide a malloc que devuelva al sistema las páginas libres del heap; True si pudo"""
+    if _malloc_trim is None:
+        return False
+    _malloc_trim(0)
+    return True
+
+
+def rango_tamano(tamano):
+    for maximo, etiqueta in RANGOS_TAMANO:
+        if tamano < maximo:
+            return etiqueta
+    return '>=1MB'
+
+
+class Muestra:
+    """Medición de memoria de una solicitud, desde que se crea hasta `pico()`.
+    `renders` son los renders en curso e iniciados en el proceso al crearla"""
+
+    def __init__(self, renders=(0, 0)):
+        self.renders = renders
+        self.inicio = rss()
+        self.con_pico = self.inicio is not None and _reiniciar_pico()
+
+    def pico(self):
+        """Bytes que la RSS subió por encima de la inicial (el máximo si hay VmHWM)"""
+        final = _pico_rss() if self.con_pico else rss()
+        if final is None or self.inicio is None:
+            return None
+        return max(final - self.inicio, 0)
+
+
+class Reserva:
+    """Memoria apartada para un render en curso; `liberar` se puede llamar más de una vez"""
+
+    def __init__(self, gobernador, bytes_reservados):
+        self._gobernador = gobernador
+        self.bytes = bytes_reservados
+        self._en_curso = True
+
+    def liberar(self):
+        if not self._en_curso:
+            return
+        self._en_curso = False
+        bytes_reservados, self.bytes = self.bytes, 0
+        self._gobernador._liberar(bytes_reservados)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar()
+
+
+class GobernadorMemoria:
+    """Muestreo, guardia y reciclaje por memoria (ver el docstring del módulo). Los
+    límites en bytes y los conteos en 0 deshabilitan su parte"""
+
+    def __init__(self, limite=0, reciclar_en=0, base=0, factor=0, espera=0, muestreo=0):
+        self.limite = limite
+        self.reciclar_en = reciclar_en
+        self.base = base
+        self.factor = factor
+        self.espera = espera
+        self.muestreo = muestreo
+        self.al_reciclar = None
+        self.reciclando = None
+        self._reservado = 0
+        self._renders = 0
+        self._renders_iniciados = 0
+        self._condicion = threading.Condition()
+        self._muestras = itertools.count()
+        self._midiendo = threading.Lock()
+
+    # Muestreo
+
+    def muestrear(self):
+        """Muestra para la solicitud que empieza, o None si no le toca o ya se mide otra"""
+        if self.muestreo <= 0 or next(self._muestras) % self.muestreo:
+            return None
+        if not self._midiendo.acquire(blocking=False):
+            return None
+        with self._condicion:
+            return Muestra((self._renders, self._renders_iniciados))
+
+    def terminar_muestra(self, muestra):
+        """Pico de la muestra en bytes; None sin RSS o si su render no corrió solo en el
+        proceso. Libera el lugar para la siguiente"""
+        try:
+            with self._condicion:
+                en_curso, iniciados = muestra.renders
+                sola = en_curso == 0 and self._renders_iniciados - iniciados <= 1
+            return muestra.pico() if sola else None
+        finally:
+            self._midiendo.release()
+
+    # Guardia
+
+    def estimar(self, tamano):
+        """Memoria estimada para generar un documento con un cuerpo de `tamano` bytes"""
+        return self.base + self.factor * tamano
+
+    def reservar(self, tamano):
+        """Reserva la memoria estimada de un render o lanza MemoriaInsuficiente. Sin
+        `limite` no reserva bytes, pero el render cuenta para el muestreo"""
+        if self.limite <= 0:
+            with self._condicion:
+                return self._apartar(0)
+        estimado = self.estimar(tamano)
+        limite_espera = time.monotonic() + self.espera
+        with self._condicion:
+            while True:
+                actual = rss()
+                if actual is None or actual + self._reservado + estimado <= self.limite:
+                    return self._apartar(estimado)
+                sin_renders = not self._reservado
+                restante = limite_espera - time.monotonic()
+                if sin_renders or restante <= 0:
+                    break
+                self._condicion.wait(restante)
+        if sin_renders:
+            # No hay renders a quién esperar: el worker mismo ya es demasiado grande
+            self._reciclar('limite', actual)
+        raise MemoriaInsuficiente(
+            f"Generar el documento pasaría el límite de memoria ({estimado // 1024} KB estimados)")
+
+    def _apartar(self, estimado):
+        self._reservado += estimado
+        self._renders += 1
+        self._renders_iniciados += 1
+        return Reserva(self, estimado)
+
+    def _liberar(self, bytes_reservados):
+        with self._condicion:
+            self._reservado -= bytes_reservados
+            self._renders -= 1
+            self._condicion.notify_all()
+
+    # Reciclaje
+
+    def solicitud_terminada(self):
+        """Revisa el límite de reciclaje al terminar una solicitud"""
+        if self.reciclando is not None:
+            return
+        if self.reciclar_en > 0:
+            actual = rss()
+            if actual is not None and actual > self.reciclar_en and devolver_memoria_libre():
+                actual = rss()
+            if actual is not None and actual > self.reciclar_en:
+                self._reciclar('rss', actual)
+
+    def _reciclar(self, motivo, actual):
+        with self._condicion:
+            if self.reciclando is not None:
+                return
+            self.reciclando = motivo
+        logger.warning("Se recicla el worker por memoria", extra={'campos': {
+            'motivo': motivo, 'rss_mb': None if actual is None else round(actual / 2 ** 20, 1),
+            'pid': os.getpid(), 'con_reemplazo': self.al_reciclar is not None
+        }})
+        if self.al_reciclar is not None:
+            self.al_reciclar(motivo)
@@ -0,0 +1,150 @@
+"""Métricas del servidor en el formato de texto de Prometheus.
+
+Contadores, medidores e histogramas con etiquetas, sin depender de prometheus_client.
+Cada métrica guarda sus series en un dict protegido por un lock; `exponer()` arma el
+texto que sirve GET /metrics. Viven en la memoria del proceso, así que con varios
+workers cada uno reporta las suyas.
+"""
+import threading
+
+# Límites superiores de los histogramas
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS_FASES = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BUCKETS_BYTES = tuple(1024 * 4 ** potencia for potencia in range(8))  # 1 KB a 16 MB
+BUCKETS_MEMORIA = tuple(256 * 1024 * 4 ** potencia for potencia in range(7))  # 256 KB a 1 GB
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, valores, extra=''):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas):
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}, recibió {tuple(etiquetas)}")
+        return tuple(etiquetas[nombre] for nombre in self.etiquetas)
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        with self._lock:
+            series = sorted(self._series.items())
+            lineas += self._lineas(series)
+        return lineas
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, valor=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._series[clave] = self._series.get(clave, 0) + valor
+
+    def valor(self, **etiquetas):
+        return self._series.get(self._clave(etiquetas), 0)
+
+    def _lineas(self, series):
+        return [f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}' for clave, valor in series]
+
+
+class Medidor(Contador):
+    """Valor que sube y baja (por ejemplo, solicitudes en curso)"""
+    tipo = 'gauge'
+
+    def dec(self, valor=1, **etiquetas):
+        self.inc(-valor, **etiquetas)
+
+    def fijar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._series[clave] = valor
+
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                # Conteo por bucket (no acumulado), suma y total
+                serie = self._series[clave] = [[0] * len(self.buckets), 0.0, 0]
+            for indice, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][indice] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def conteo(self, **etiquetas):
+        serie = self._series.get(self._clave(etiquetas))
+        return serie[2] if serie else 0
+
+    def _lineas(self, series):
+        lineas = []
+        for clave, (conteos, suma, total) in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                le = 'le="%s"' % _numero(limite)
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {acumulado}')
+            le = 'le="+Inf"'
+            lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {total}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(suma)}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {total}')
+        return lineas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas del proceso, en el orden en que se registran"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metricas = []
+
+    def _registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def medidor(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Medidor(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def exponer(self):
+        lineas = []
+        for metrica in self._metricas:
+            lineas += metrica.exponer()
+        return '\n'.join(lineas) + '\n'
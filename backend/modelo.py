@@ -0,0 +1,90 @@
+"""Modelo intermedio de una planeación, compartido por todos los motores.
+
+`compilar_planeacion` recorre una sola vez la solicitud y deja todo lo que el documento
+muestra ya resuelto: título, las filas de las cinco tablas (con los momentos resueltos
+y los procesos en líneas) y los bloques de procesos con su estructura. Los motores
+(motor_docx, motor_ooxml, motor_vista) solo recorren el modelo; la lógica de qué va en
+cada celda vive en planeacion.py y aquí.
+"""
+import logging
+
+from planeacion import (
+    ENCABEZADOS_DATOS_GENERALES, ENCABEZADOS_MOMENTOS, ENCABEZADOS_VARIANTES,
+    ENCABEZADOS_RECURSOS, obtener_modalidad, titulo_documento, fila_datos_generales,
+    filas_contenido_curricular, resolver_momentos, fila_recursos
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Tabla:
+    """Encabezados y filas de datos de una tabla. Cada valor de celda es un texto (un
+    párrafo) o una lista de líneas (un párrafo por línea)"""
+    __slots__ = ('encabezados', 'filas')
+
+    def __init__(self, encabezados, filas):
+        self.encabezados = tuple(encabezados)
+        self.filas = [list(valores) for valores in filas]
+
+
+class BloqueProcesos:
+    """Procesos de desarrollo de un renglón de la Tabla 2: contenido -> grado -> elementos"""
+    __slots__ = ('campo', 'grados_por_contenido')
+
+    def __init__(self, campo, grados_por_contenido):
+        self.campo = campo
+        self.grados_por_contenido = grados_por_contenido
+
+
+class ModeloPlaneacion:
+    """Planeación compilada: lo que se muestra en el documento, sin depender del formato"""
+    __slots__ = ('nombre_modalidad', 'modalidad', 'titulo', 'titulo_planeacion', 'datos_generales', 'contenido_curricular',
+                 'momentos', 'variantes', 'recursos', 'procesos', 'reporte_momentos')
+
+    # Nombre de cada tabla en el orden del documento
+    NOMBRES_TABLAS = ('datos_generales', 'contenido_curricular', 'momentos', 'variantes', 'recursos')
+
+    def __init__(self, nombre_modalidad, modalidad, titulo, titulo_planeacion, datos_generales,
+                 contenido_curricular, momentos, variantes, recursos, procesos, reporte_momentos):
+        self.nombre_modalidad = nombre_modalidad
+        self.modalidad = modalidad
+        self.titulo = titulo                        # título completo del documento
+        self.titulo_planeacion = titulo_planeacion  # solo el título que escribió el docente
+        self.datos_generales = datos_generales
+        self.contenido_curricular = contenido_curricular
+        self.momentos = momentos
+        self.variantes = variantes
+        self.recursos = recursos
+        self.procesos = procesos
+        self.reporte_momentos = reporte_momentos
+
+    @property
+    def tablas(self):
+        return tuple(getattr(self, nombre) for nombre in self.NOMBRES_TABLAS)
+
+
+def compilar_planeacion(data, modalidad):
+    """Modelo de la planeación `data` de una modalidad ya validada"""
+    registro = obtener_modalidad(modalidad)
+    descripciones, reporte = resolver_momentos(data, modalidad)
+    if reporte:
+        logger.debug("Momentos de '%s' con problemas: %s", modalidad, reporte)
+
+    campos = data.get('camposFormativos', [])
+    procesos = [
+        BloqueProcesos(campos[i] if i < len(campos) else '', proceso.get('gradosPorContenido', {}))
+        for i, proceso in enumerate(data.get('procesosDesarrollo', []))
+    ]
+    return ModeloPlaneacion(
+        nombre_modalidad=modalidad,
+        modalidad=registro,
+        titulo=titulo_documento(data, modalidad),
+        titulo_planeacion=data.get('titulo', ''),
+        datos_generales=Tabla(ENCABEZADOS_DATOS_GENERALES, [fila_datos_generales(data)]),
+        contenido_curricular=Tabla(registro.encabezados_contenido, filas_contenido_curricular(data, modalidad)),
+        momentos=Tabla(ENCABEZADOS_MOMENTOS, zip(registro.nombres_momentos, descripciones)),
+        variantes=Tabla(ENCABEZADOS_VARIANTES, [[data.get('posiblesVariantes', '')]]),
+        recursos=Tabla(ENCABEZADOS_RECURSOS, [fila_recursos(data)]),
+        procesos=procesos,
+        reporte_momentos=reporte
+    )
@@ -0,0 +1,184 @@
+"""Motor de generación de Word basado en python-docx.
+
+Construye al iniciar un esqueleto ya estilizado por modalidad y por solicitud solo
+lo clona y llena las celdas. Al guardar solo se serializa word/document.xml; las demás
+partes son las del esqueleto, comprimidas una vez al iniciar (paquete_docx.py).
+"""
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from io import BytesIO
+import copy
+import zipfile
+
+from estilos import NOMBRE_ESTILO_TABLA, registrar_estilos
+from modelo import compilar_planeacion
+from paquete_docx import COMPRESION_PREDETERMINADA, PARTE_DOCUMENTO, PaqueteDocx
+from planeacion import (
+    MODALIDADES, Fases, ENCABEZADOS_DATOS_GENERALES, ENCABEZADOS_MOMENTOS,
+    ENCABEZADOS_VARIANTES, ENCABEZADOS_RECURSOS
+)
+
+def preparar_fila(row):
+    """Deja cada celda de una fila de contenido con un párrafo y un run vacíos listos para llenarse"""
+    for cell in row.cells:
+        cell.text = ''
+
+def llenar_celda(tc, valor):
+    """Escribe un valor en el párrafo preparado de una celda (elemento w:tc) del esqueleto.
+    
+    Un texto va en el run del párrafo; una lista de líneas se escribe como un párrafo
+    por línea, clonando el párrafo preparado."""
+    p = tc.p_lst[0]
+    if isinstance(valor, str):
+        p.r_lst[0].text = valor
+        return
+    lineas = list(valor) or ['']
+    anterior = p
+    for linea in lineas[1:]:
+        nuevo = copy.deepcopy(p)
+        nuevo.r_lst[0].text = linea
+        anterior.addnext(nuevo)
+        anterior = nuevo
+    p.r_lst[0].text = lineas[0]
+
+def llenar_tabla(tbl, filas):
+    """Llena en una sola pasada las filas de datos de una tabla (elemento w:tbl) del esqueleto.
+    
+    `filas` es una lista 2D de valores de celda (ver llenar_celda). Si hay más filas que
+    en el esqueleto, la última fila de datos (todavía vacía) se clona; las filas del
+    esqueleto que sobran se quitan. Se trabaja sobre w:tr/w:tc directamente porque
+    cada acceso a `row.cells` de python-docx vuelve a construir la lista de celdas."""
+    filas = list(filas)
+    existentes = tbl.tr_lst[1:]
+    modelo = existentes[-1]
+    for _ in range(len(filas) - len(existentes)):
+        modelo.addnext(copy.deepcopy(modelo))
+    if len(filas) != len(existentes):
+        existentes = tbl.tr_lst[1:]
+    for tr in existentes[len(filas):]:
+        tbl.remove(tr)
+    for tr, valores in zip(existentes, filas):
+        for tc, valor in zip(tr.tc_lst, valores):
+            llenar_celda(tc, valor)
+
+def crear_esqueleto(modalidad):
+    """Construye una vez el documento base de una Modalidad: tablas y encabezados.
+    
+    El formato de las tablas (bordes, encabezados y tamaños de letra) viene del estilo
+    de tabla registrado en el documento, no de cada celda. Por solicitud solo se clona
+    y se llenan las celdas; la Tabla 2 trae una fila modelo que se clona por cada
+    renglón de datos."""
+    doc = Document()
+    registrar_estilos(doc)
+    
+    # Título principal (el texto se agrega por solicitud)
+    title = doc.add_heading('', 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    doc.add_paragraph("")
+
+    # === TABLA 1: DATOS GENERALES ===
+    table1 = doc.add_table(rows=2, cols=3)
+    for i, header in enumerate(ENCABEZADOS_DATOS_GENERALES):
+        table1.rows[0].cells[i].text = header
+    preparar_fila(table1.rows[1])
+    doc.add_paragraph("")
+
+    # === TABLA 2: CONTENIDO CURRICULAR (Adaptable según modalidad) ===
+    headers2 = modalidad.encabezados_contenido
+    table2 = doc.add_table(rows=2, cols=len(headers2))
+    for i, header in enumerate(headers2):
+        table2.rows[0].cells[i].text = header
+    preparar_fila(table2.rows[1])
+    doc.add_paragraph("")
+
+    # === TABLA 3: MOMENTOS (Específicos por modalidad) ===
+    table3 = doc.add_table(rows=len(modalidad.momentos) + 1, cols=2)
+    for i, header in enumerate(ENCABEZADOS_MOMENTOS):
+        table3.rows[0].cells[i].text = header
+    for row in table3.rows[1:]:
+        preparar_fila(row)
+    llenar_tabla(table3._tbl, [[nombre_bonito, ''] for nombre_bonito in modalidad.nombres_momentos])
+    doc.add_paragraph("")
+
+    # === TABLA 4: VARIANTES ===
+    table4 = doc.add_table(rows=2, cols=1)
+    table4.rows[0].cells[0].text = ENCABEZADOS_VARIANTES[0]
+    preparar_fila(table4.rows[1])
+    doc.add_paragraph("")
+
+    # === TABLA 5: RECURSOS ===
+    table5 = doc.add_table(rows=2, cols=3)
+    for i, header in enumerate(ENCABEZADOS_RECURSOS):
+        table5.rows[0].cells[i].text = header
+    preparar_fila(table5.rows[1])
+
+    for table in doc.tables:
+        table.style = NOMBRE_ESTILO_TABLA
+    
+    return doc
+
+def clonar_esqueleto(modalidad):
+    """Copia profunda del esqueleto de una Modalidad.
+    
+    Se toma el documento desde la parte copiada porque deepcopy duplica por separado
+    los árboles lxml a los que apuntan el proxy Document y su DocumentPart."""
+    return copy.deepcopy(ESQUELETOS_DOCUMENTO[modalidad.clave]).part.document
+
+def paquete_esqueleto(doc):
+    """Partes del esqueleto guardado con python-docx, en el orden en que las escribe"""
+    buffer = BytesIO()
+    doc.save(buffer)
+    with zipfile.ZipFile(buffer) as paquete:
+        return PaqueteDocx([(nombre, paquete.read(nombre)) for nombre in paquete.namelist()])
+
+# Esqueletos pre-construidos al iniciar, uno por modalidad canónica (los alias comparten esqueleto)
+ESQUELETOS_DOCUMENTO = {modalidad.clave: crear_esqueleto(modalidad) for modalidad in MODALIDADES}
+PAQUETES_ESQUELETO = {clave: paquete_esqueleto(doc) for clave, doc in ESQUELETOS_DOCUMENTO.items()}
+
+def renderizar(modelo, destino, fases=None, compresion=COMPRESION_PREDETERMINADA):
+    """Guarda el .docx de una planeación compilada (modelo.ModeloPlaneacion) en destino"""
+    fases = fases or Fases()
+    # Clonar el esqueleto ya estilizado de la modalidad
+    doc = clonar_esqueleto(modelo.modalidad)
+    table1, table2, table3, table4, table5 = doc.tables
+    
+    # Título principal
+    doc.paragraphs[0].add_run(modelo.titulo)
+    fases.marcar('esqueleto')
+
+    # === TABLA 1: DATOS GENERALES ===
+    llenar_tabla(table1._tbl, modelo.datos_generales.filas)
+    fases.marcar('tabla1')
+
+    # === TABLA 2: CONTENIDO CURRICULAR (Adaptable según modalidad) ===
+    # La tabla crece clonando la fila modelo del esqueleto
+    llenar_tabla(table2._tbl, modelo.contenido_curricular.filas)
+    fases.marcar('tabla2')
+
+    # === TABLA 3: MOMENTOS (Específicos por modalidad) ===
+    # Los nombres bonitos ya vienen en el esqueleto; se escriben junto con la descripción
+    llenar_tabla(table3._tbl, modelo.momentos.filas)
+    fases.marcar('tabla3')
+
+    # === TABLA 4: VARIANTES ===
+    llenar_tabla(table4._tbl, modelo.variantes.filas)
+    fases.marcar('tabla4')
+
+    # === TABLA 5: RECURSOS ===
+    llenar_tabla(table5._tbl, modelo.recursos.filas)
+    fases.marcar('tabla5')
+
+    # Solo document.xml cambia; equivale a doc.save con las partes fijas ya comprimidas
+    PAQUETES_ESQUELETO[modelo.modalidad.clave].escribir(destino, {PARTE_DOCUMENTO: doc.part.blob}, compresion)
+    fases.marcar('guardar')
+
+def generar_documento(data, modalidad, destino, tiempos=None, compresion=COMPRESION_PREDETERMINADA):
+    """Genera el .docx de la planeación y lo guarda en el archivo o stream destino.
+    
+    Si se da `tiempos` (dict), ahí se anotan los milisegundos de cada fase; `compresion`
+    es el nivel de zlib del zip (0 sin comprimir)"""
+    fases = Fases(tiempos)
+    modelo = compilar_planeacion(data, modalidad)
+    fases.marcar('compilar')
+    renderizar(modelo, destino, fases, compresion)
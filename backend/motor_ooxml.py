@@ -0,0 +1,154 @@
+"""Motor de generación de Word que escribe word/document.xml directamente al zip.
+
+No construye ningún árbol en memoria: recorre el modelo de la planeación (modelo.py)
+y va escribiendo el XML ya escapado en la entrada del zip. Las demás partes del paquete
+no cambian entre solicitudes: se toman una sola vez, al iniciar, de un documento en
+blanco guardado con python-docx y se copian ya comprimidas (paquete_docx.py). El
+resultado es equivalente al del motor python-docx (ver tests/test_motores.py).
+"""
+from io import BytesIO
+from xml.sax.saxutils import escape
+import re
+import zipfile
+
+from estilos import ESTILO_TABLA, registrar_estilos
+from modelo import compilar_planeacion
+from paquete_docx import COMPRESION_PREDETERMINADA, PARTE_DOCUMENTO, PaqueteDocx
+from planeacion import Fases
+
+# Ancho útil de la página en twips (12240 de ancho menos márgenes de 1800), igual que python-docx
+ANCHO_BLOQUE = 8640
+
+# Caracteres que lxml rechaza al asignar texto; se rechazan igual para no generar XML inválido
+_CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+_SEPARADORES_RUN = re.compile('([\t\r\n])')
+
+# El formato de las tablas viene del estilo registrado en styles.xml (ver estilos.py)
+_TBL_PR = (
+    f'<w:tblPr><w:tblStyle w:val="{ESTILO_TABLA}"/><w:tblW w:type="auto" w:w="0"/>'
+    '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+    'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+)
+_CELDA = (
+    '<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{ancho}"/></w:tcPr>'
+    '{parrafos}</w:tc>'
+)
+_PARRAFO_VACIO = '<w:p/>'
+
+
+def contenido_run(texto):
+    """Traduce un texto al contenido de un w:r igual que python-docx:
+    tabuladores a w:tab, saltos de línea a w:br y el resto en w:t escapados"""
+    if _CARACTERES_INVALIDOS.search(texto):
+        raise ValueError('All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters')
+    partes = []
+    for trozo in _SEPARADORES_RUN.split(texto):
+        if trozo == '\t':
+            partes.append('<w:tab/>')
+        elif trozo in ('\r', '\n'):
+            partes.append('<w:br/>')
+        elif trozo:
+            if len(trozo.strip()) < len(trozo):
+                partes.append(f'<w:t xml:space="preserve">{escape(trozo)}</w:t>')
+            else:
+                partes.append(f'<w:t>{escape(trozo)}</w:t>')
+    return ''.join(partes)
+
+
+def _run(texto):
+    """w:r con el texto; vacío se cierra en la misma etiqueta como lo serializa lxml"""
+    contenido = contenido_run(texto)
+    return f'<w:r>{contenido}</w:r>' if contenido else '<w:r/>'
+
+
+def _parrafos(valor):
+    """Párrafos de una celda: un texto es un párrafo, una lista de líneas es un párrafo por línea"""
+    if isinstance(valor, str):
+        return f'<w:p>{_run(valor)}</w:p>'
+    return ''.join(f'<w:p>{_run(linea)}</w:p>' for linea in valor) or '<w:p><w:r/></w:p>'
+
+
+def _fila(valores, ancho):
+    return '<w:tr>' + ''.join(_CELDA.format(ancho=ancho, parrafos=_parrafos(valor)) for valor in valores) + '</w:tr>'
+
+
+def _inicio_tabla(encabezados):
+    """Propiedades, rejilla y fila de encabezados de una tabla"""
+    ancho = ANCHO_BLOQUE // len(encabezados)
+    rejilla = f'<w:gridCol w:w="{ancho}"/>' * len(encabezados)
+    return (
+        f'<w:tbl>{_TBL_PR}<w:tblGrid>{rejilla}</w:tblGrid>'
+        + _fila(encabezados, ancho)
+    )
+
+
+def _cargar_paquete_base():
+    """Partes fijas del paquete, en el orden en que python-docx las escribe, y el XML
+    de word/document.xml partido en lo que va antes y después del contenido del body"""
+    from docx import Document
+
+    base = Document()
+    registrar_estilos(base)
+    buffer = BytesIO()
+    base.save(buffer)
+    with zipfile.ZipFile(buffer) as paquete:
+        partes = [(nombre, paquete.read(nombre)) for nombre in paquete.namelist()]
+    documento = dict(partes)[PARTE_DOCUMENTO].decode('utf-8')
+    inicio_body = documento.index('<w:body>') + len('<w:body>')
+    inicio_sect = documento.index('<w:sectPr')
+    return partes, documento[:inicio_body], documento[inicio_sect:]
+
+
+PARTES_BASE, INICIO_DOCUMENTO, FIN_DOCUMENTO = _cargar_paquete_base()
+PAQUETE_BASE = PaqueteDocx(PARTES_BASE)
+
+
+def escribir_documento_xml(modelo, salida, fases=None):
+    """Escribe word/document.xml de una planeación compilada en el stream salida.
+    
+    El tiempo de cada tabla incluye la compresión de lo que se va escribiendo"""
+    fases = fases or Fases()
+    def escribir(texto):
+        salida.write(texto.encode('utf-8'))
+
+    escribir(INICIO_DOCUMENTO)
+
+    # Título principal
+    escribir(
+        '<w:p><w:pPr><w:pStyle w:val="Title"/><w:jc w:val="center"/></w:pPr>'
+        f'<w:r>{contenido_run(modelo.titulo)}</w:r></w:p>'
+    )
+    escribir(_PARRAFO_VACIO)
+    fases.marcar('esqueleto')
+
+    # Las cinco tablas, separadas por un párrafo vacío: datos generales, contenido
+    # curricular, momentos, variantes y recursos
+    for numero, tabla in enumerate(modelo.tablas, 1):
+        ancho = ANCHO_BLOQUE // len(tabla.encabezados)
+        escribir(_inicio_tabla(tabla.encabezados))
+        for valores in tabla.filas:
+            escribir(_fila(valores, ancho))
+        escribir('</w:tbl>' + (_PARRAFO_VACIO if numero < len(modelo.tablas) else ''))
+        fases.marcar(f'tabla{numero}')
+
+    escribir(FIN_DOCUMENTO)
+
+
+def renderizar(modelo, destino, fases=None, compresion=COMPRESION_PREDETERMINADA):
+    """Escribe el .docx de una planeación compilada (modelo.ModeloPlaneacion) en destino"""
+    fases = fases or Fases()
+    PAQUETE_BASE.escribir(destino, {
+        PARTE_DOCUMENTO: lambda salida: escribir_documento_xml(modelo, salida, fases)
+    }, compresion)
+    fases.marcar('guardar')
+
+
+def generar_documento(data, modalidad, destino, tiempos=None, compresion=COMPRESION_PREDETERMINADA):
+    """Genera el .docx de la planeación y lo escribe en el archivo o stream destino.
+    
+    Si se da `tiempos` (dict), ahí se anotan los milisegundos de cada fase; `compresion`
+    es el nivel de zlib del zip (0 sin comprimir)"""
+    fases = Fases(tiempos)
+    modelo = compilar_planeacion(data, modalidad)
+    fases.marcar('compilar')
+    renderizar(modelo, destino, fases, compresion)
@@ -0,0 +1,415 @@
+"""Motor de generación de Word a partir de una plantilla .docx (assets/plantilla.docx).
+
+La plantilla se compila una sola vez, al importar el módulo:
+
+1. En cada párrafo se juntan los textos de sus runs y se buscan los marcadores
+   `{{nombre}}`. Word suele partirlos en varios runs (revisión ortográfica, cambios
+   de formato); cada marcador se deja solo en un run con el formato del run donde
+   empieza, y el texto alrededor queda en runs aparte.
+2. Los párrafos con marcadores y las filas de tabla que los contienen se delimitan
+   con comentarios, el XML se serializa una vez y se parte en segmentos de bytes
+   fijos, párrafos con marcadores y filas que se repiten.
+
+Por solicitud solo se recorren esos segmentos: los bytes fijos se copian, cada
+marcador se escribe escapado en su run y cada fila se repite por cada fila de la
+tabla del modelo a la que pertenecen sus marcadores (Tabla 2 por renglón, Tabla 3 por
+momento). Un valor con varias líneas repite su párrafo, una línea por párrafo. Las
+demás partes del paquete se toman de la plantilla y se copian ya comprimidas
+(paquete_docx.py).
+
+Las partes que no todas las modalidades llevan van en un control de contenido de
+Word con la etiqueta `si:<marcador>` (las celdas de Relación y Eje llevan `si:relacion`
+y `si:eje`): se escriben solo si la tabla del modelo tiene la columna del marcador.
+Si el control envuelve celdas, también se quita su columna de la cuadrícula. Los
+controles de contenido de las regiones que se repiten reciben un w:id nuevo en cada
+copia.
+
+Quien edite la plantilla puede mover, copiar o cambiar de formato los marcadores de
+MARCADORES; uno desconocido o dos tablas en la misma fila fallan al arrancar.
+"""
+from copy import deepcopy
+import itertools
+import re
+import zipfile
+
+from lxml import etree
+
+from modelo import compilar_planeacion
+from motor_ooxml import contenido_run
+from paquete_docx import COMPRESION_PREDETERMINADA, PARTE_DOCUMENTO, RUTA_PLANTILLA, PaqueteDocx
+from planeacion import Fases
+
+# Marcadores de la plantilla: nombre -> (tabla del modelo, columna). Los de tabla None
+# son valores de todo el documento
+MARCADORES = {
+    'titulo': (None, 'titulo_planeacion'),
+    'modalidad': (None, 'nombre_modalidad'),
+    'periodo': ('datos_generales', 0),
+    'proposito': ('datos_generales', 1),
+    'relevancia': ('datos_generales', 2),
+    'campo': ('contenido_curricular', 0),
+    'contenido': ('contenido_curricular', 1),
+    'procesos': ('contenido_curricular', 2),
+    'relacion': ('contenido_curricular', 3),
+    'eje': ('contenido_curricular', 4),
+    'momento': ('momentos', 0),
+    'descripcion': ('momentos', 1),
+    'variantes': ('variantes', 0),
+    'materiales': ('recursos', 0),
+    'espacios': ('recursos', 1),
+    'produccionSugerida': ('recursos', 2),
+}
+
+_W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+_W14 = 'http://schemas.microsoft.com/office/word/2010/wordml'
+_W15 = 'http://schemas.microsoft.com/office/word/2012/wordml'
+_XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+_MARCADOR = re.compile(r'\{\{\s*([A-Za-z_]\w*)\s*\}\}')
+# Texto provisional del run de un marcador mientras se compila (caracteres de uso privado)
+_PROVISIONAL = '\ue000{}\ue001'
+# w:val provisional del w:id de los controles de contenido que se repiten
+_ID_PROVISIONAL = '\ue002'
+_ETIQUETA_CONDICIONAL = 'si:'
+_SEGMENTOS = re.compile('<!--(/?)([PFC])(\\d+)-->|<w:t(?: [^>]*)?>\ue000(\\w+)\ue001</w:t>|w:val="(\ue002)"')
+# Segmento del valor de un w:id nuevo
+_NUEVO_ID = object()
+
+
+def _w(etiqueta):
+    return f'{{{_W}}}{etiqueta}'
+
+
+class _Marcador:
+    __slots__ = ('nombre', 'tabla', 'columna')
+
+    def __init__(self, nombre):
+        if nombre not in MARCADORES:
+            raise ValueError(f"Marcador '{{{{{nombre}}}}}' desconocido en la plantilla, opciones: {sorted(MARCADORES)}")
+        self.nombre = nombre
+        self.tabla, self.columna = MARCADORES[nombre]
+
+
+class _Parrafo:
+    """Párrafo con marcadores: se repite si alguno de sus valores es una lista de líneas"""
+    __slots__ = ('segmentos', 'marcadores')
+
+    def __init__(self, segmentos):
+        self.segmentos = segmentos
+        self.marcadores = [segmento for segmento in segmentos if isinstance(segmento, _Marcador)]
+
+
+class _Filas:
+    """Fila de tabla que se repite por cada fila de `tabla` en el modelo"""
+    __slots__ = ('segmentos', 'tabla')
+
+    def __init__(self, segmentos):
+        self.segmentos = segmentos
+        tablas = {marcador.tabla for marcador in _marcadores(segmentos)}
+        if len(tablas) != 1 or None in tablas:
+            nombres = sorted(marcador.nombre for marcador in _marcadores(segmentos))
+            raise ValueError(f"Una fila de la plantilla mezcla marcadores de distintas tablas: {nombres}")
+        self.tabla = tablas.pop()
+
+
+class _Condicional:
+    """Segmentos que solo se escriben si la tabla del modelo tiene la columna del marcador"""
+    __slots__ = ('marcador', 'segmentos')
+
+    def __init__(self, nombre, segmentos):
+        self.marcador = _Marcador(nombre)
+        self.segmentos = segmentos
+
+    def presente(self, modelo):
+        if self.marcador.tabla is None:
+            return True
+        return self.marcador.columna < len(getattr(modelo, self.marcador.tabla).encabezados)
+
+
+def _marcadores(segmentos):
+    for segmento in segmentos:
+        if isinstance(segmento, _Marcador):
+            yield segmento
+        elif isinstance(segmento, (_Parrafo, _Filas, _Condicional)):
+            yield from _marcadores(segmento.segmentos)
+
+
+def _run_con_texto(modelo, texto):
+    """Copia de un run (con su formato) que solo tiene el texto dado"""
+    run = deepcopy(modelo)
+    for hijo in list(run):
+        if hijo.tag != _w('rPr'):
+            run.remove(hijo)
+    t = etree.SubElement(run, _w('t'))
+    t.text = texto
+    if texto.strip() != texto:
+        t.set(_XML_SPACE, 'preserve')
+    return run
+
+
+def _separar_marcadores(parrafo):
+    """Deja cada marcador del párrafo solo en un run; regresa los runs de los marcadores"""
+    runs = [run for run in parrafo.iter(_w('r')) if run.find(_w('t')) is not None]
+    textos = [''.join(t.text or '' for t in run.iter(_w('t'))) for run in runs]
+    completo = ''.join(textos)
+    coincidencias = list(_MARCADOR.finditer(completo))
+    if not coincidencias:
+        return []
+
+    # Run dueño de cada carácter del texto del párrafo
+    duenos = [indice for indice, texto in enumerate(textos) for _ in texto]
+    piezas = [[] for _ in runs]  # por run: textos y marcadores (nombre, None) en orden
+    posicion = 0
+    for coincidencia in coincidencias:
+        for caracter in range(posicion, coincidencia.start()):
+            piezas[duenos[caracter]].append(completo[caracter])
+        piezas[duenos[coincidencia.start()]].append((coincidencia.group(1), None))
+        posicion = coincidencia.end()
+    for caracter in range(posicion, len(completo)):
+        piezas[duenos[caracter]].append(completo[caracter])
+
+    afectados = {duenos[caracter] for coincidencia in coincidencias
+                 for caracter in range(coincidencia.start(), coincidencia.end())}
+    runs_marcadores = []
+    for indice in sorted(afectados):
+        run = runs[indice]
+        if any(hijo.tag not in (_w('rPr'), _w('t')) for hijo in run):
+            raise ValueError(f"El marcador '{completo[coincidencias[0].start():coincidencias[0].end()]}' "
+                             "comparte un run con tabuladores, saltos u otros elementos")
+        # Textos consecutivos se juntan en un solo run
+        nuevos = []
+        for pieza in piezas[indice]:
+            if isinstance(pieza, tuple):
+                nuevos.append(pieza)
+            elif nuevos and isinstance(nuevos[-1], str):
+                nuevos[-1] += pieza
+            else:
+                nuevos.append(pieza)
+        for pieza in nuevos:
+            if isinstance(pieza, tuple):
+                nuevo = _run_con_texto(run, _PROVISIONAL.format(pieza[0]))
+                runs_marcadores.append(nuevo)
+            else:
+                nuevo = _run_con_texto(run, pieza)
+            run.addprevious(nuevo)
+        run.getparent().remove(run)
+
+    # Las marcas de revisión ortográfica ya no delimitan nada
+    for marca in list(parrafo.iter(_w('proofErr'))):
+        marca.getparent().remove(marca)
+    return runs_marcadores
+
+
+def _region_repetida(fila):
+    """La fila o, si está en un elemento de sección repetible de Word
+    (w15:repeatingSectionItem), ese elemento completo"""
+    contenedor = fila.getparent()
+    if contenedor is not None and contenedor.tag == _w('sdtContent'):
+        sdt = contenedor.getparent()
+        if sdt.find(f"{_w('sdtPr')}/{{{_W15}}}repeatingSectionItem") is not None:
+            return sdt
+    return fila
+
+
+def _delimitar(elemento, tipo, numero, ultimo=None):
+    elemento.addprevious(etree.Comment(f'{tipo}{numero}'))
+    (elemento if ultimo is None else ultimo).addnext(etree.Comment(f'/{tipo}{numero}'))
+
+
+def _columna(celda):
+    """Índice en la cuadrícula de la tabla de la primera columna de una celda"""
+    fila = next(celda.iterancestors(_w('tr')))
+    columna = 0
+    for otra in fila.iter(_w('tc')):
+        if otra is celda:
+            return columna
+        if next(otra.iterancestors(_w('tr'))) is fila:
+            extension = otra.find(f"{_w('tcPr')}/{_w('gridSpan')}")
+            columna += 1 if extension is None else int(extension.get(_w('val')))
+    raise ValueError("Celda fuera de su fila")
+
+
+def _separar_condicionales(raiz):
+    """Quita los controles de contenido `si:<marcador>` dejando su contenido delimitado
+    como condicional, junto con las columnas de la cuadrícula de las celdas que
+    envuelven; regresa el marcador de cada número de condicional"""
+    condiciones = []
+    columnas = set()
+    for sdt in list(raiz.iter(_w('sdt'))):
+        etiqueta = sdt.find(f"{_w('sdtPr')}/{_w('tag')}")
+        valor = etiqueta.get(_w('val'), '') if etiqueta is not None else ''
+        if not valor.startswith(_ETIQUETA_CONDICIONAL):
+            continue
+        nombre = valor[len(_ETIQUETA_CONDICIONAL):]
+        if next(sdt.iterancestors(_w('p')), None) is not None:
+            raise ValueError(f"El control '{valor}' de la plantilla está dentro de un párrafo; "
+                             "debe envolver párrafos, celdas o filas")
+        hijos = list(sdt.find(_w('sdtContent')))
+        if not hijos:
+            sdt.getparent().remove(sdt)
+            continue
+        for hijo in hijos:
+            sdt.addprevious(hijo)
+        sdt.getparent().remove(sdt)
+        _delimitar(hijos[0], 'C', len(condiciones), hijos[-1])
+        condiciones.append(nombre)
+        for celda in hijos:
+            if celda.tag != _w('tc'):
+                continue
+            tabla = next(celda.iterancestors(_w('tbl')))
+            cuadricula = tabla.findall(f"{_w('tblGrid')}/{_w('gridCol')}")
+            indice = _columna(celda)
+            if indice < len(cuadricula) and cuadricula[indice] not in columnas:
+                columnas.add(cuadricula[indice])
+                _delimitar(cuadricula[indice], 'C', len(condiciones))
+                condiciones.append(nombre)
+    return condiciones
+
+
+def _ids_por_copia(region):
+    """En una región que se repite: el w:id de cada control de contenido se vuelve
+    provisional (cada copia recibe uno nuevo) y se quitan los w14:paraId/textId, que
+    Word vuelve a asignar"""
+    for identificador in region.iter(_w('id')):
+        if identificador.getparent().tag == _w('sdtPr'):
+            identificador.set(_w('val'), _ID_PROVISIONAL)
+    for elemento in region.iter(_w('p'), _w('tr')):
+        for atributo in (f'{{{_W14}}}paraId', f'{{{_W14}}}textId'):
+            elemento.attrib.pop(atributo, None)
+
+
+def compilar_documento(xml):
+    """Segmentos de word/document.xml: bytes fijos, _Parrafo, _Filas, _Condicional,
+    _Marcador y _NUEVO_ID"""
+    raiz = etree.fromstring(xml)
+    condiciones = _separar_condicionales(raiz)
+    delimitados = set()
+    for parrafo in list(raiz.iter(_w('p'))):
+        runs = _separar_marcadores(parrafo)
+        if not runs:
+            continue
+        _delimitar(parrafo, 'P', len(delimitados))
+        delimitados.add(parrafo)
+        fila = next(parrafo.iterancestors(_w('tr')), None)
+        if fila is not None:
+            region = _region_repetida(fila)
+            if region not in delimitados:
+                _delimitar(region, 'F', len(delimitados))
+                delimitados.add(region)
+    for region in delimitados:
+        _ids_por_copia(region)
+
+    texto = etree.tostring(raiz, xml_declaration=True, encoding='UTF-8', standalone=True).decode('utf-8')
+    pila = [[]]
+    posicion = 0
+    for coincidencia in _SEGMENTOS.finditer(texto):
+        if coincidencia.start() > posicion:
+            pila[-1].append(texto[posicion:coincidencia.start()].encode('utf-8'))
+        posicion = coincidencia.end()
+        cierre, tipo, numero, nombre, nuevo_id = coincidencia.groups()
+        if nombre is not None:
+            pila[-1].append(_Marcador(nombre))
+        elif nuevo_id is not None:
+            pila[-1].append(_NUEVO_ID)
+        elif not cierre:
+            pila.append([])
+        else:
+            segmentos = pila.pop()
+            if tipo == 'P':
+                pila[-1].append(_Parrafo(segmentos))
+            elif tipo == 'F':
+                pila[-1].append(_Filas(segmentos))
+            else:
+                pila[-1].append(_Condicional(condiciones[int(numero)], segmentos))
+    pila[-1].append(texto[posicion:].encode('utf-8'))
+    return pila[0]
+
+
+def _ids_fijos(segmentos):
+    """w:id de los controles de contenido que no se repiten, para no reutilizarlos"""
+    ids = set()
+    for segmento in segmentos:
+        if isinstance(segmento, bytes):
+            ids.update(int(valor) for valor in re.findall(rb'<w:id w:val="(-?\d+)"', segmento))
+        elif isinstance(segmento, (_Parrafo, _Filas, _Condicional)):
+            ids |= _ids_fijos(segmento.segmentos)
+    return ids
+
+
+def cargar_plantilla(ruta):
+    """Partes fijas del paquete, en el orden de la plantilla, y word/document.xml compilado"""
+    with zipfile.ZipFile(ruta) as paquete:
+        partes = [(nombre, paquete.read(nombre)) for nombre in paquete.namelist()]
+    return partes, compilar_documento(dict(partes)[PARTE_DOCUMENTO])
+
+
+PARTES_PLANTILLA, DOCUMENTO_PLANTILLA = cargar_plantilla(RUTA_PLANTILLA)
+PAQUETE_PLANTILLA = PaqueteDocx(PARTES_PLANTILLA)
+IDS_PLANTILLA = _ids_fijos(DOCUMENTO_PLANTILLA)
+
+
+def nuevos_ids(fijos=IDS_PLANTILLA):
+    """w:id para los controles de contenido de las copias, sin repetir los fijos"""
+    return (identificador for identificador in itertools.count(1) if identificador not in fijos)
+
+
+def _valor(marcador, modelo, fila):
+    if marcador.tabla is None:
+        valor = getattr(modelo, marcador.columna)
+        return valor.upper() if marcador.nombre == 'modalidad' else valor
+    if fila is None:
+        fila = getattr(modelo, marcador.tabla).filas[0]
+    return fila[marcador.columna] if marcador.columna < len(fila) else ''
+
+
+def _escribir(segmentos, modelo, fila, partes, ids=None):
+    ids = nuevos_ids() if ids is None else ids
+    for segmento in segmentos:
+        if isinstance(segmento, bytes):
+            partes.append(segmento)
+        elif segmento is _NUEVO_ID:
+            partes.append(f'w:val="{next(ids)}"'.encode('utf-8'))
+        elif isinstance(segmento, _Filas):
+            for valores in getattr(modelo, segmento.tabla).filas:
+                _escribir(segmento.segmentos, modelo, valores, partes, ids)
+        elif isinstance(segmento, _Condicional):
+            if segmento.presente(modelo):
+                _escribir(segmento.segmentos, modelo, fila, partes, ids)
+        elif isinstance(segmento, _Parrafo):
+            valores = {marcador.nombre: _valor(marcador, modelo, fila) for marcador in segmento.marcadores}
+            repeticiones = max([len(valor) for valor in valores.values() if not isinstance(valor, str)] + [1])
+            for linea in range(repeticiones):
+                for parte in segmento.segmentos:
+                    if isinstance(parte, bytes):
+                        partes.append(parte)
+                        continue
+                    if parte is _NUEVO_ID:
+                        partes.append(f'w:val="{next(ids)}"'.encode('utf-8'))
+                        continue
+                    valor = valores[parte.nombre]
+                    if not isinstance(valor, str):
+                        valor = valor[linea] if linea < len(valor) else ''
+                    partes.append(contenido_run(valor).encode('utf-8'))
+        else:
+            partes.append(contenido_run(_valor(segmento, modelo, fila)).encode('utf-8'))
+
+
+def renderizar(modelo, destino, fases=None, compresion=COMPRESION_PREDETERMINADA):
+    """Escribe el .docx de una planeación compilada (modelo.ModeloPlaneacion) en destino"""
+    fases = fases or Fases()
+    partes = []
+    _escribir(DOCUMENTO_PLANTILLA, modelo, None, partes)
+    documento = b''.join(partes)
+    fases.marcar('plantilla')
+    PAQUETE_PLANTILLA.escribir(destino, {PARTE_DOCUMENTO: documento}, compresion)
+    fases.marcar('guardar')
+
+
+def generar_documento(data, modalidad, destino, tiempos=None, compresion=COMPRESION_PREDETERMINADA):
+    """Genera el .docx de la planeación con la plantilla y lo escribe en destino.
+
+    Si se da `tiempos` (dict), ahí se anotan los milisegundos de cada fase; `compresion`
+    es el nivel de zlib del zip (0 sin comprimir)"""
+    fases = Fases(tiempos)
+    modelo = compilar_planeacion(data, modalidad)
+    fases.marcar('compilar')
+    renderizar(modelo, destino, fases, compresion)
@@ -0,0 +1,68 @@
+"""Motor de vistas previas: la planeación compilada (modelo.py) en HTML o JSON.
+
+Para las vistas previas de la app: el mismo contenido y orden de tablas que el Word,
+sin armar ningún paquete .docx. El HTML imita el estilo TablaPlaneacion (ver
+estilos.py): bordes negros, encabezados centrados en negritas y un párrafo por línea.
+"""
+from html import escape
+import json
+
+from planeacion import VERSION_DOCUMENTO
+
+_CSS = (
+    'body{font-family:Calibri,Arial,sans-serif;margin:24px}'
+    'h1{text-align:center;font-weight:normal}'
+    'table{border-collapse:collapse;width:100%;margin:0 auto 16px}'
+    'th,td{border:1px solid #000;padding:2px 6px;vertical-align:top;font-size:10pt}'
+    'th{font-size:12pt;text-align:center}'
+    'p{margin:0;white-space:pre-wrap}'
+)
+
+
+def _celda(etiqueta, valor):
+    """Celda con un párrafo por texto o por cada línea de una lista"""
+    lineas = [valor] if isinstance(valor, str) else list(valor) or ['']
+    return f'<{etiqueta}>' + ''.join(f'<p>{escape(linea)}</p>' for linea in lineas) + f'</{etiqueta}>'
+
+
+def generar_html(modelo):
+    """Página HTML completa de la planeación"""
+    titulo = escape(modelo.titulo)
+    partes = [
+        '<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">'
+        f'<title>{titulo}</title><style>{_CSS}</style></head><body>',
+        f'<h1>{titulo}</h1>',
+    ]
+    for nombre, tabla in zip(modelo.NOMBRES_TABLAS, modelo.tablas):
+        partes.append(f'<table class="{nombre}"><thead><tr>')
+        partes.extend(_celda('th', encabezado) for encabezado in tabla.encabezados)
+        partes.append('</tr></thead><tbody>')
+        for valores in tabla.filas:
+            partes.append('<tr>' + ''.join(_celda('td', valor) for valor in valores) + '</tr>')
+        partes.append('</tbody></table>')
+    partes.append('</body></html>\n')
+    return ''.join(partes)
+
+
+def datos_vista(modelo):
+    """Diccionario con el modelo: tablas en el orden del documento, los bloques de
+    procesos con su estructura y el reporte de momentos"""
+    return {
+        'version': VERSION_DOCUMENTO,
+        'modalidad': modelo.nombre_modalidad,
+        'titulo': modelo.titulo,
+        'tablas': [
+            {'nombre': nombre, 'encabezados': list(tabla.encabezados), 'filas': tabla.filas}
+            for nombre, tabla in zip(modelo.NOMBRES_TABLAS, modelo.tablas)
+        ],
+        'procesos': [
+            {'campo': bloque.campo, 'grados_por_contenido': bloque.grados_por_contenido}
+            for bloque in modelo.procesos
+        ],
+        'reporte_momentos': modelo.reporte_momentos,
+    }
+
+
+def generar_json(modelo):
+    return json.dumps(datos_vista(modelo), ensure_ascii=False) + '\n'
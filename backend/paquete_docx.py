@@ -0,0 +1,232 @@
+"""Escritura del paquete .docx (zip) con las partes fijas comprimidas una sola vez.
+
+De las partes de un .docx generado solo cambia word/document.xml: estilos, tema,
+settings, fuentes, [Content_Types].xml y las relaciones son los mismos bytes en cada
+solicitud. PaqueteDocx comprime esas partes una vez por nivel de compresión y en cada
+documento copia los bytes ya comprimidos al zip; solo las partes dinámicas se
+comprimen por solicitud.
+
+El zip se escribe aquí mismo (cabeceras locales y directorio central) porque zipfile
+no permite agregar datos ya comprimidos. Con un destino posicionable (BytesIO, archivo)
+la cabecera de una parte dinámica se completa al terminarla, igual que zipfile; con
+uno que no lo es (envío por partes) la parte comprimida lleva data descriptor y la que
+va sin comprimir se junta en memoria para escribir su cabecera completa.
+"""
+import os
+import struct
+import zlib
+
+PARTE_DOCUMENTO = 'word/document.xml'
+
+# Plantilla del motor `plantilla`; aquí y no en motor_plantilla para que app.py la
+# tome en cuenta en la clave de los documentos sin importar el motor
+RUTA_PLANTILLA = os.environ.get(
+    'PLANTILLA_WORD',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets', 'plantilla.docx')
+)
+
+# Niveles de zlib: 0 guarda las partes sin comprimir (ZIP_STORED), 1-9 usan deflate
+NIVEL_GUARDADO = 0
+COMPRESION_PREDETERMINADA = 6
+NIVELES_COMPRESION = range(0, 10)
+
+_GUARDADO, _DEFLATE = 0, 8
+_CON_DESCRIPTOR = 0x08
+_VERSION = 20
+# Fecha fija (1980-01-01 00:00) para que el mismo documento dé los mismos bytes
+_HORA, _FECHA = 0, (1 << 5) | 1
+
+_CABECERA_LOCAL = struct.Struct('<4s2B4HL2L2H')
+_DESCRIPTOR = struct.Struct('<4sLLL')
+_DIRECTORIO = struct.Struct('<4s4B4HL2L5H2L')
+_FIN_DIRECTORIO = struct.Struct('<4s4H2LH')
+# Desplazamiento del CRC dentro de la cabecera local (para completarla al final)
+_POSICION_CRC = 14
+
+
+def validar_nivel(nivel):
+    if nivel not in NIVELES_COMPRESION:
+        raise ValueError(f"Nivel de compresión no válido: {nivel} (0 sin compresión, 1-9 deflate)")
+    return nivel
+
+
+def _metodo(nivel):
+    return _GUARDADO if nivel == NIVEL_GUARDADO else _DEFLATE
+
+
+def _compresor(nivel):
+    # Deflate crudo (sin encabezado zlib), el que usa zip
+    return zlib.compressobj(nivel, zlib.DEFLATED, -15)
+
+
+def _cabecera_local(nombre, metodo, banderas=0, crc=0, comprimido=0, tamano=0):
+    nombre = nombre.encode('utf-8')
+    return _CABECERA_LOCAL.pack(
+        b'PK\x03\x04', _VERSION, 0, banderas, metodo, _HORA, _FECHA,
+        crc, comprimido, tamano, len(nombre), 0
+    ) + nombre
+
+
+class _Entrada:
+    """Parte ya comprimida: cabecera local completa y datos, lista para copiarse"""
+    __slots__ = ('nombre', 'metodo', 'banderas', 'crc', 'comprimido', 'tamano', 'bytes_locales')
+
+    def __init__(self, nombre, metodo, crc, datos, tamano, banderas=0):
+        self.nombre = nombre
+        self.metodo = metodo
+        self.banderas = banderas
+        self.crc = crc
+        self.comprimido = len(datos)
+        self.tamano = tamano
+        self.bytes_locales = _cabecera_local(nombre, metodo, banderas, crc, len(datos), tamano) + datos
+
+    @classmethod
+    def comprimir(cls, nombre, contenido, nivel):
+        if nivel == NIVEL_GUARDADO:
+            datos = contenido
+        else:
+            compresor = _compresor(nivel)
+            datos = compresor.compress(contenido) + compresor.flush()
+        return cls(nombre, _metodo(nivel), zlib.crc32(contenido), datos, len(contenido))
+
+
+class _SalidaParte:
+    """Stream de una parte dinámica: comprime y escribe al zip conforme recibe datos"""
+
+    def __init__(self, escritor, nombre, nivel):
+        self.escritor = escritor
+        self.nombre = nombre
+        self.metodo = _metodo(nivel)
+        self.crc = 0
+        self.tamano = 0
+        self.comprimido = 0
+        self._compresor = _compresor(nivel) if self.metodo == _DEFLATE else None
+        # Sin compresión y sin poder volver a la cabecera, la parte se junta en memoria
+        self._pendiente = [] if self.metodo == _GUARDADO and not escritor.posicionable else None
+        self.banderas = _CON_DESCRIPTOR if not escritor.posicionable and self._pendiente is None else 0
+        self.desplazamiento = escritor.posicion
+        if self._pendiente is None:
+            escritor.escribir_bytes(_cabecera_local(nombre, self.metodo, self.banderas))
+
+    def write(self, datos):
+        self.crc = zlib.crc32(datos, self.crc)
+        self.tamano += len(datos)
+        if self._pendiente is not None:
+            self._pendiente.append(bytes(datos))
+            return len(datos)
+        comprimidos = self._compresor.compress(datos) if self._compresor is not None else datos
+        if comprimidos:
+            self.comprimido += len(comprimidos)
+            self.escritor.escribir_bytes(comprimidos)
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        escritor = self.escritor
+        if self._compresor is not None:
+            resto = self._compresor.flush()
+            self.comprimido += len(resto)
+            escritor.escribir_bytes(resto)
+        if self._pendiente is not None:
+            datos = b''.join(self._pendiente)
+            self.comprimido = len(datos)
+            escritor.escribir_bytes(_cabecera_local(self.nombre, self.metodo, 0, self.crc, self.comprimido, self.tamano))
+            escritor.escribir_bytes(datos)
+        elif self.banderas & _CON_DESCRIPTOR:
+            escritor.escribir_bytes(_DESCRIPTOR.pack(b'PK\x07\x08', self.crc, self.comprimido, self.tamano))
+        else:
+            escritor.completar_cabecera(self.desplazamiento, self.crc, self.comprimido, self.tamano)
+        escritor.directorio.append((self, self.desplazamiento))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is None:
+            self.close()
+
+
+class EscritorZip:
+    """Zip escrito en orden sobre un stream: partes ya comprimidas o dinámicas"""
+
+    def __init__(self, destino):
+        self.destino = destino
+        seekable = getattr(destino, 'seekable', None)
+        self.posicionable = bool(seekable and seekable())
+        self._inicio = destino.tell() if self.posicionable else 0
+        self.posicion = 0
+        self.directorio = []
+
+    def escribir_bytes(self, datos):
+        self.destino.write(datos)
+        self.posicion += len(datos)
+
+    def completar_cabecera(self, desplazamiento, crc, comprimido, tamano):
+        self.destino.seek(self._inicio + desplazamiento + _POSICION_CRC)
+        self.destino.write(struct.pack('<3L', crc, comprimido, tamano))
+        self.destino.seek(self._inicio + self.posicion)
+
+    def copiar(self, entrada):
+        """Agrega una parte ya comprimida (_Entrada) tal cual"""
+        self.directorio.append((entrada, self.posicion))
+        self.escribir_bytes(entrada.bytes_locales)
+
+    def escribir(self, nombre, contenido, nivel=COMPRESION_PREDETERMINADA):
+        self.copiar(_Entrada.comprimir(nombre, contenido, nivel))
+
+    def abrir(self, nombre, nivel=COMPRESION_PREDETERMINADA):
+        """Stream para escribir una parte; la parte queda en el zip al cerrarlo"""
+        return _SalidaParte(self, nombre, nivel)
+
+    def cerrar(self):
+        inicio_directorio = self.posicion
+        for entrada, desplazamiento in self.directorio:
+            nombre = entrada.nombre.encode('utf-8')
+            self.escribir_bytes(_DIRECTORIO.pack(
+                b'PK\x01\x02', _VERSION, 0, _VERSION, 0, entrada.banderas, entrada.metodo, _HORA, _FECHA,
+                entrada.crc, entrada.comprimido, entrada.tamano, len(nombre), 0, 0, 0, 0, 0, desplazamiento
+            ) + nombre)
+        total = len(self.directorio)
+        self.escribir_bytes(_FIN_DIRECTORIO.pack(
+            b'PK\x05\x06', 0, 0, total, total, self.posicion - inicio_directorio, inicio_directorio, 0
+        ))
+
+
+class PaqueteDocx:
+    """Partes de un .docx en su orden; las que no son dinámicas se comprimen una sola
+    vez por nivel (el predeterminado al crearlo, los demás la primera vez que se piden)"""
+
+    def __init__(self, partes, dinamicas=(PARTE_DOCUMENTO,)):
+        self.orden = [nombre for nombre, _ in partes]
+        self.dinamicas = frozenset(dinamicas)
+        self._fijas = [(nombre, contenido) for nombre, contenido in partes if nombre not in self.dinamicas]
+        self._comprimidas = {}
+        self.partes_fijas(COMPRESION_PREDETERMINADA)
+
+    def partes_fijas(self, nivel):
+        """{nombre: _Entrada} de las partes fijas comprimidas con `nivel`"""
+        entradas = self._comprimidas.get(nivel)
+        if entradas is None:
+            entradas = {nombre: _Entrada.comprimir(nombre, contenido, nivel) for nombre, contenido in self._fijas}
+            self._comprimidas[nivel] = entradas
+        return entradas
+
+    def escribir(self, destino, dinamicas, nivel=COMPRESION_PREDETERMINADA):
+        """Escribe el paquete en destino. `dinamicas` da por nombre de parte sus bytes o
+        una función que recibe un stream y escribe la parte en él (se comprime conforme
+        se escribe)"""
+        fijas = self.partes_fijas(nivel)
+        escritor = EscritorZip(destino)
+        for nombre in self.orden:
+            if nombre in fijas:
+                escritor.copiar(fijas[nombre])
+                continue
+            contenido = dinamicas[nombre]
+            if callable(contenido):
+                with escritor.abrir(nombre, nivel) as salida:
+                    contenido(salida)
+            else:
+                escritor.escribir(nombre, contenido, nivel)
+        escritor.cerrar()
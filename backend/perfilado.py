@@ -0,0 +1,174 @@
+"""Perfilado del render de una solicitud, a pedido o por muestreo.
+
+Dos perfiladores de la biblioteca estándar, según el formato que se quiera:
+
+- `colapsado`: un hilo toma la pila del hilo que genera cada `INTERVALO_MUESTREO`
+  segundos y cuenta las pilas en el formato de flamegraph.pl / speedscope
+  (`modulo:funcion;modulo:funcion N`).
+- `pstats` y `html`: cProfile; `pstats` es el mismo archivo que escribe
+  `Profile.dump_stats` (se abre con `python -m pstats` o snakeviz) y `html` una tabla
+  con las funciones de mayor tiempo acumulado.
+
+`PerfilesLentos` guarda los K perfiles más lentos del muestreo 1 de cada N.
+"""
+from collections import Counter
+import cProfile
+import heapq
+import html
+import itertools
+import marshal
+import random
+import sys
+import threading
+import time
+import uuid
+
+INTERVALO_MUESTREO = 0.001
+
+# Tipo de contenido y extensión de cada formato de salida
+FORMATOS = {
+    'colapsado': ('text/plain; charset=utf-8', 'txt'),
+    'pstats': ('application/octet-stream', 'pstats'),
+    'html': ('text/html; charset=utf-8', 'html'),
+}
+
+# Máximo de funciones en la tabla HTML
+_FILAS_HTML = 150
+
+
+class FormatoNoDisponible(ValueError):
+    """El perfil no se tomó con el perfilador que ese formato necesita"""
+
+
+class Muestreador:
+    """Cuenta las pilas del hilo que entra al bloque `with`, desde la función que abrió
+    el bloque hacia adentro"""
+
+    def __init__(self, intervalo=INTERVALO_MUESTREO):
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._fin = threading.Event()
+
+    def __enter__(self):
+        self._objetivo = threading.get_ident()
+        self._raiz = sys._getframe(1)
+        self._hilo = threading.Thread(target=self._muestrear, name='perfil-muestreo', daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._fin.set()
+        self._hilo.join()
+
+    def _muestrear(self):
+        while not self._fin.wait(self.intervalo):
+            marco = sys._current_frames().get(self._objetivo)
+            pila = []
+            while marco is not None and marco is not self._raiz:
+                pila.append(f"{marco.f_globals.get('__name__', '?')}:{marco.f_code.co_qualname}")
+                marco = marco.f_back
+            if pila:
+                self.pilas[';'.join(reversed(pila))] += 1
+
+
+class Perfil:
+    """Resultado de perfilar una llamada: pilas muestreadas o estadísticas de cProfile"""
+
+    def __init__(self, duracion_ms, pilas=None, estadisticas=None, **datos):
+        self.id = uuid.uuid4().hex[:12]
+        self.creado = time.time()
+        self.duracion_ms = duracion_ms
+        self.pilas = pilas
+        self.estadisticas = estadisticas
+        self.datos = datos
+
+    @property
+    def formatos(self):
+        return ['colapsado'] if self.pilas is not None else ['pstats', 'html']
+
+    def resumen(self):
+        return dict(self.datos, id=self.id, creado=self.creado,
+                    duracion_ms=round(self.duracion_ms, 2), formatos=self.formatos)
+
+    def exportar(self, formato):
+        """Bytes del perfil en `formato` (uno de FORMATOS)"""
+        if formato not in self.formatos:
+            raise FormatoNoDisponible(f"Formato '{formato}' no disponible para este perfil, opciones: {self.formatos}")
+        if formato == 'colapsado':
+            return ''.join(f"{pila} {cuenta}\n" for pila, cuenta in self.pilas.most_common()).encode('utf-8')
+        if formato == 'pstats':
+            return marshal.dumps(self.estadisticas)
+        return self._html().encode('utf-8')
+
+    def _html(self):
+        funciones = sorted(self.estadisticas.items(), key=lambda elemento: elemento[1][3], reverse=True)
+        filas = []
+        for (archivo, linea, funcion), (primitivas, llamadas, propio, acumulado, _) in funciones[:_FILAS_HTML]:
+            llamadas_texto = str(llamadas) if primitivas == llamadas else f"{llamadas}/{primitivas}"
+            filas.append(
+                f"<tr><td>{llamadas_texto}</td><td>{propio * 1000:.3f}</td><td>{acumulado * 1000:.3f}</td>"
+                f"<td>{html.escape(funcion)}</td><td>{html.escape(archivo)}:{linea}</td></tr>"
+            )
+        titulo = html.escape(' '.join(f"{clave}={valor}" for clave, valor in self.datos.items()))
+        return (
+            "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+            f"<title>Perfil {self.id}</title></head><body>"
+            f"<h1>Perfil {self.id}</h1><p>{titulo} · {self.duracion_ms:.2f} ms</p>"
+            "<table border=\"1\" cellspacing=\"0\" cellpadding=\"3\">"
+            "<tr><th>llamadas</th><th>propio ms</th><th>acumulado ms</th><th>función</th><th>archivo</th></tr>"
+            + ''.join(filas) + "</table></body></html>\n"
+        )
+
+
+def perfilar(funcion, formato, **datos):
+    """Ejecuta `funcion()` con el perfilador que necesita `formato` y regresa su
+    resultado y el Perfil; `datos` se guardan en el perfil (modalidad, etc.)"""
+    if formato not in FORMATOS:
+        raise FormatoNoDisponible(f"Formato '{formato}' no válido, opciones: {list(FORMATOS)}")
+    inicio = time.perf_counter()
+    if formato == 'colapsado':
+        with Muestreador() as muestreador:
+            resultado = funcion()
+        return resultado, Perfil((time.perf_counter() - inicio) * 1000, pilas=muestreador.pilas, **datos)
+
+    perfilador = cProfile.Profile()
+    resultado = perfilador.runcall(funcion)
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+    perfilador.create_stats()
+    return resultado, Perfil(duracion_ms, estadisticas=perfilador.stats, **datos)
+
+
+class PerfilesLentos:
+    """Los `maximo` perfiles más lentos de las solicitudes muestreadas (1 de cada `cada`)"""
+
+    def __init__(self, cada, maximo):
+        self.cada = cada
+        self.maximo = maximo
+        self._perfiles = []  # montículo por duración: el más rápido sale primero
+        self._orden = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def habilitado(self):
+        return self.cada > 0 and self.maximo > 0
+
+    def toca_muestra(self):
+        return self.habilitado and random.random() * self.cada < 1
+
+    def agregar(self, perfil):
+        elemento = (perfil.duracion_ms, next(self._orden), perfil)
+        with self._lock:
+            if len(self._perfiles) < self.maximo:
+                heapq.heappush(self._perfiles, elemento)
+            elif perfil.duracion_ms > self._perfiles[0][0]:
+                heapq.heapreplace(self._perfiles, elemento)
+
+    def lista(self):
+        """Resúmenes del más lento al más rápido"""
+        with self._lock:
+            perfiles = sorted(self._perfiles, reverse=True)
+        return [perfil.resumen() for _, _, perfil in perfiles]
+
+    def obtener(self, id_perfil):
+        with self._lock:
+            return next((perfil for _, _, perfil in self._perfiles if perfil.id == id_perfil), None)
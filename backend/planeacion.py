@@ -0,0 +1,324 @@
+"""Datos de la planeación compartidos por los motores de generación de Word.
+
+Contiene la configuración de modalidades y momentos, los encabezados de las tablas
+y las funciones que recorren los datos de la solicitud para obtener el texto de cada
+celda, de modo que el motor python-docx y el escritor OOXML produzcan lo mismo.
+"""
+from typing import NamedTuple, Tuple
+import re
+import time
+import unicodedata
+
+# Versión del formato del documento generado. Forma parte de la clave de cache y del
+# ETag, así que hay que incrementarla cada vez que cambie el Word que se produce.
+VERSION_DOCUMENTO = 4
+
+# Planeación mínima para calentar un motor (importarlo y recorrer sus esqueletos)
+PLANEACION_CALENTAMIENTO = {'titulo': 'Calentamiento', 'camposFormativos': [''], 'momentos': {}}
+
+_NO_ALFANUMERICO = re.compile(r'[\W_]+')
+_NUMERACION = re.compile(r'^\d+\.\s*')
+
+# Configuración de momentos para cada modalidad
+MODALIDADES_CONFIG = {
+    'abj': ['planteamiento_juego', 'desarrollo_actividades', 'compartamos_experiencia', 'comunidad_juego'],
+    'aprendizaje basado en el juego': ['planteamiento_juego', 'desarrollo_actividades', 'compartamos_experiencia', 'comunidad_juego'],
+    'centros': ['contacto_realidad', 'identificacion_integracion', 'expresion'],
+    'centros de interes': ['contacto_realidad', 'identificacion_integracion', 'expresion'],
+    'centros de interés': ['contacto_realidad', 'identificacion_integracion', 'expresion'],
+    'talleres': ['situacion_inicial', 'organizacion_acciones', 'puesta_marcha', 'valoramos_aprendido'],
+    'taller crítico': ['situacion_inicial', 'organizacion_acciones', 'puesta_marcha', 'valoramos_aprendido'],
+    'taller critico': ['situacion_inicial', 'organizacion_acciones', 'puesta_marcha', 'valoramos_aprendido'],
+    'rincones': ['punto_partida', 'asamblea_inicial', 'exploracion_rincones', 'exploracion_descubrimiento', 'compartimos_aprendido', 'evaluamos_experiencia'],
+    'rincones de aprendizaje': ['punto_partida', 'asamblea_inicial', 'exploracion_rincones', 'exploracion_descubrimiento', 'compartimos_aprendido', 'evaluamos_experiencia'],
+    'proyecto': ['punto_partida', 'planeacion', 'a_trabajar', 'comunicamos_logros', 'reflexion_aprendizaje'],
+    'unidad': ['lectura_realidad', 'identificacion_trama', 'planificacion', 'exploracion', 'participacion', 'conclusion'],
+    'unidad didactica': ['lectura_realidad', 'identificacion_trama', 'planificacion', 'exploracion', 'participacion', 'conclusion'],
+    'unidad didáctica': ['lectura_realidad', 'identificacion_trama', 'planificacion', 'exploracion', 'participacion', 'conclusion'],
+    # ✅ NUEVA MODALIDAD AGREGADA
+    'situacion didactica': ['inicio', 'desarrollo', 'cierre'],
+    'situación didáctica': ['inicio', 'desarrollo', 'cierre']
+}
+
+# Mapeo de nombres internos a nombres bonitos para mostrar en el Word
+NOMBRES_MOMENTOS = {
+    # ABJ
+    'planteamiento_juego': '1. Planteamiento del Juego',
+    'desarrollo_actividades': '2. Desarrollo de las Actividades', 
+    'compartamos_experiencia': '3. Compartamos la Experiencia',
+    'comunidad_juego': '4. Comunidad de Juego',
+    
+    # Centros de Interés
+    'contacto_realidad': '1. En contacto de la realidad',
+    'identificacion_integracion': '2. Identificación e integración',
+    'expresion': '3. Expresión',
+    
+    # Talleres
+    'situacion_inicial': '1. Situación inicial',
+    'organizacion_acciones': '2. Organización de las acciones',
+    'puesta_marcha': '3. Puesta en marcha',
+    'valoramos_aprendido': '4. Valoramos lo aprendido',
+    
+    # Rincones / Rincones de Aprendizaje
+    'punto_partida': '1. Punto de partida (Saberes previos)',
+    'asamblea_inicial': '2. Asamblea inicial y planeación',
+    'exploracion_rincones': '3. Exploración de los rincones',
+    'exploracion_descubrimiento': '4. Exploración y descubrimiento',
+    'compartimos_aprendido': '5. Compartimos lo aprendido',
+    'evaluamos_experiencia': '6. Evaluamos la experiencia',
+    
+    # Proyecto
+    'punto_partida': '1. Punto de partida',
+    'planeacion': '2. Planeación',
+    'a_trabajar': '3. ¡A trabajar!',
+    'comunicamos_logros': '4. Comunicamos nuestros logros',
+    'reflexion_aprendizaje': '5. Reflexión sobre el aprendizaje',
+    
+    # Unidad Didáctica
+    'lectura_realidad': '1. Lectura de la realidad',
+    'identificacion_trama': '2. Identificación de la trama y complejidad',
+    'planificacion': '3. Planificación y organización del trabajo',
+    'exploracion': '4. Exploración y descubrimiento',
+    'participacion': '5. Participación activa y horizontal',
+    'conclusion': '6. Conclusión de la experiencia (Valoración)',
+    
+    # ✅ SITUACIÓN DIDÁCTICA - NUEVOS MOMENTOS
+    'inicio': '1. Inicio',
+    'desarrollo': '2. Desarrollo', 
+    'cierre': '3. Cierre'
+}
+
+# Modalidades que usan la tabla simplificada (sin relación de contenidos ni eje articulador)
+MODALIDADES_SIMPLIFICADAS = ['situacion didactica', 'situación didáctica']
+
+# ✅ NUEVA FUNCIÓN: Detectar si es modalidad que requiere tabla simplificada
+def es_modalidad_simplificada(modalidad):
+    """Detecta si la modalidad necesita tabla simplificada (sin relación de contenidos ni eje articulador)"""
+    encontrada = buscar_modalidad(modalidad)
+    return encontrada is not None and encontrada.simplificada
+
+# Encabezados de las tablas del documento
+ENCABEZADOS_DATOS_GENERALES = ['Periodo de Aplicación', 'Propósito', 'Relevancia Social']
+ENCABEZADOS_CONTENIDO = ['Campos Formativos', 'Contenidos', 'Procesos de Desarrollo', 'Relación de Contenidos', 'Eje Articulador']
+ENCABEZADOS_CONTENIDO_SIMPLIFICADO = ['Campos Formativos', 'Contenidos', 'Procesos de Desarrollo y Aprendizaje']
+ENCABEZADOS_MOMENTOS = ['Momentos', 'Descripción']
+ENCABEZADOS_VARIANTES = ['Posibles Variantes']
+ENCABEZADOS_RECURSOS = ['Materiales', 'Espacios', 'Producción Sugerida']
+
+class Fases:
+    """Cronómetro de las fases del render: `marcar(fase)` suma a `tiempos[fase]` los
+    milisegundos desde la marca anterior. Sin dict de tiempos no mide nada."""
+    __slots__ = ('tiempos', '_anterior')
+
+    def __init__(self, tiempos=None):
+        self.tiempos = tiempos
+        self._anterior = time.perf_counter() if tiempos is not None else None
+
+    def marcar(self, fase):
+        if self.tiempos is None:
+            return
+        ahora = time.perf_counter()
+        self.tiempos[fase] = self.tiempos.get(fase, 0.0) + (ahora - self._anterior) * 1000
+        self._anterior = ahora
+
+def nombre_momento(momento):
+    """Nombre bonito del momento para mostrar en el Word"""
+    return NOMBRES_MOMENTOS.get(momento, momento.replace('_', ' ').title())
+
+def titulo_documento(data, modalidad):
+    """Texto del título principal"""
+    return f"Planeación {modalidad.upper()}: {data.get('titulo', '')}"
+
+def fila_datos_generales(data):
+    """Valores de la fila de datos de la Tabla 1"""
+    return [
+        data.get('periodoAplicacion', ''),
+        data.get('proposito', ''),
+        data.get('relevanciaSocial', '')
+    ]
+
+def lineas_procesos(campo_proc):
+    """Líneas de la celda de procesos: cada contenido, sus grados y sus elementos con viñeta"""
+    lineas = []
+    for cont, grados in campo_proc.get('gradosPorContenido', {}).items():
+        lineas.append(cont)
+        for grado, elementos in grados.items():
+            lineas.append(f"  Grado {grado}:")
+            lineas.extend(f"    • {el}" for el in elementos)
+    return lineas
+
+def filas_contenido_curricular(data, modalidad):
+    """Genera los valores de cada fila de datos de la Tabla 2.
+    
+    Cada valor es un texto (un párrafo en la celda) o una lista de líneas (un párrafo
+    por línea), como los que recibe el llenado de tablas de los motores."""
+    campos = data.get('camposFormativos', [])
+    contenidos = data.get('contenidos', [])
+    procesos = data.get('procesosDesarrollo', [])
+    relaciones = data.get('relacionContenidos', {})
+    
+    max_rows = max(len(campos), len(contenidos), len(procesos))
+    simplificada = obtener_modalidad(modalidad).simplificada
+    
+    for i in range(max_rows):
+        campo = campos[i] if i < len(campos) else ''
+        contenido = contenidos[i] if i < len(contenidos) else ''
+        
+        # Procesos
+        lineas = lineas_procesos(procesos[i]) if i < len(procesos) else []
+        
+        valores = [campo, contenido, lineas]
+        
+        # ✅ Solo agregar columnas adicionales si NO es modalidad simplificada
+        if not simplificada:
+            relacion = relaciones.get(campo, '') if campo in relaciones else ''
+            eje = data.get('ejeArticulador', '') if i == 0 else ''
+            valores += [relacion, eje]
+        
+        yield valores
+
+def normalizar_clave(texto):
+    """Forma comparable de una clave: sin acentos, en minúsculas y sin espacios,
+    guiones bajos ni signos de puntuación"""
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub('', texto.lower())
+
+class ResolutorMomentos:
+    """Resuelve las claves de `momentos` que envía el cliente a los momentos de una modalidad.
+
+    Se compila una vez por modalidad con una tabla de alias normalizados: la clave
+    interna ('planteamiento_juego') y el nombre bonito con y sin numeración
+    ('1. Planteamiento del Juego'). Las claves recibidas se recorren una sola vez; la
+    que no está en la tabla se busca por contención contra las claves internas, como
+    búsqueda por palabras clave. Cada momento se queda con la mejor coincidencia y,
+    entre iguales, con la primera clave recibida."""
+    __slots__ = ('momentos', '_alias', '_normalizados')
+
+    # Calidad de cada tipo de coincidencia (menor es mejor)
+    _EXACTA, _ALIAS, _CONTENIDA = 0, 1, 2
+
+    def __init__(self, momentos):
+        self.momentos = tuple(momentos)
+        self._alias = {}
+        for momento in self.momentos:
+            nombre = nombre_momento(momento)
+            for alias in (momento, nombre, _NUMERACION.sub('', nombre)):
+                clave = normalizar_clave(alias)
+                if self._alias.get(clave, momento) != momento:
+                    # El alias apunta a dos momentos distintos; no se usa como alias
+                    self._alias[clave] = None
+                else:
+                    self._alias[clave] = momento
+        self._normalizados = [(momento, normalizar_clave(momento)) for momento in self.momentos]
+
+    def resolver(self, recibidos):
+        """Regresa las descripciones en el orden de los momentos y el reporte de claves
+        recibidas sin coincidencia o ambiguas (que coinciden con más de un momento)"""
+        mejores = {}  # momento -> (calidad, descripción)
+        sin_coincidencia = []
+        ambiguas = []
+        for clave, descripcion in recibidos.items():
+            normalizada = normalizar_clave(clave)
+            if not normalizada:
+                sin_coincidencia.append(clave)
+                continue
+            if clave in self.momentos:
+                candidatos, calidad = [clave], self._EXACTA
+            elif self._alias.get(normalizada):
+                candidatos, calidad = [self._alias[normalizada]], self._ALIAS
+            else:
+                candidatos = [
+                    momento for momento, momento_normalizado in self._normalizados
+                    if momento_normalizado in normalizada or normalizada in momento_normalizado
+                ]
+                calidad = self._CONTENIDA
+                if not candidatos:
+                    sin_coincidencia.append(clave)
+                    continue
+                if len(candidatos) > 1:
+                    ambiguas.append(clave)
+            for momento in candidatos:
+                if momento not in mejores or calidad < mejores[momento][0]:
+                    mejores[momento] = (calidad, descripcion)
+        
+        descripciones = [mejores[momento][1] if momento in mejores else '' for momento in self.momentos]
+        reporte = {}
+        if sin_coincidencia:
+            reporte['sin_coincidencia'] = sin_coincidencia
+        if ambiguas:
+            reporte['ambiguas'] = ambiguas
+        faltantes = [momento for momento in self.momentos if momento not in mejores]
+        if faltantes:
+            reporte['momentos_sin_descripcion'] = faltantes
+        return descripciones, reporte
+
+class Modalidad(NamedTuple):
+    """Modalidad canónica: todos sus alias apuntan a este mismo objeto inmutable"""
+    clave: str                      # primer nombre de la modalidad en MODALIDADES_CONFIG
+    alias: Tuple[str, ...]          # todos los nombres de MODALIDADES_CONFIG para la modalidad
+    momentos: Tuple[str, ...]
+    nombres_momentos: Tuple[str, ...]
+    simplificada: bool
+    encabezados_contenido: Tuple[str, ...]  # columnas de la Tabla 2
+    resolutor: ResolutorMomentos
+
+def nombre_modalidad(texto):
+    """Nombre de la modalidad como se usa en el documento: minúsculas y espacios colapsados"""
+    return ' '.join(texto.lower().split())
+
+def clave_alias(texto):
+    """Clave de búsqueda de un alias: nombre_modalidad sin acentos"""
+    texto = unicodedata.normalize('NFKD', nombre_modalidad(texto))
+    return unicodedata.normalize('NFC', ''.join(c for c in texto if not unicodedata.combining(c)))
+
+def _construir_registro():
+    """Agrupa los nombres de MODALIDADES_CONFIG que comparten momentos en una sola Modalidad"""
+    grupos = {}
+    for nombre, momentos in MODALIDADES_CONFIG.items():
+        grupos.setdefault(tuple(momentos), []).append(nombre)
+    
+    modalidades = []
+    registro = {}
+    for momentos, nombres in grupos.items():
+        simplificada = any(nombre in MODALIDADES_SIMPLIFICADAS for nombre in nombres)
+        modalidad = Modalidad(
+            clave=nombres[0],
+            alias=tuple(nombres),
+            momentos=momentos,
+            nombres_momentos=tuple(nombre_momento(momento) for momento in momentos),
+            simplificada=simplificada,
+            encabezados_contenido=tuple(ENCABEZADOS_CONTENIDO_SIMPLIFICADO if simplificada else ENCABEZADOS_CONTENIDO),
+            resolutor=ResolutorMomentos(momentos)
+        )
+        modalidades.append(modalidad)
+        for nombre in nombres:
+            registro[clave_alias(nombre)] = modalidad
+    return tuple(modalidades), registro
+
+# Registro construido al iniciar: alias normalizado -> Modalidad
+MODALIDADES, REGISTRO_MODALIDADES = _construir_registro()
+NOMBRES_MODALIDADES = list(MODALIDADES_CONFIG)
+
+def buscar_modalidad(texto):
+    """Modalidad de cualquier alias (sin importar acentos, mayúsculas ni espacios) o None"""
+    return REGISTRO_MODALIDADES.get(clave_alias(texto))
+
+def obtener_modalidad(modalidad):
+    """Como buscar_modalidad, pero la modalidad ya fue validada y debe existir"""
+    return REGISTRO_MODALIDADES[clave_alias(modalidad)]
+
+def resolver_momentos(data, modalidad):
+    """Descripciones de la Tabla 3 y reporte de claves de `momentos` que no se pudieron usar"""
+    return obtener_modalidad(modalidad).resolutor.resolver(data.get('momentos', {}))
+
+def fila_recursos(data):
+    """Valores de la fila de datos de la Tabla 5: una línea con viñeta por elemento"""
+    materiales = data.get('materiales', [])
+    espacios = data.get('espacios', [])
+    produccion = data.get('produccionSugerida', [])
+    return [
+        [f'• {m}' for m in materiales],
+        [f'• {e}' for e in espacios],
+        [f'• {p}' for p in produccion]
+    ]
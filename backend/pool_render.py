@@ -0,0 +1,119 @@
+"""Pool de procesos que generan los documentos fuera del hilo de la solicitud.
+
+El hilo HTTP solo entrega los datos al pool y espera los bytes, así que un documento
+pesado no bloquea las demás solicitudes (con gunicorn en modo --threads) y un solo
+contenedor puede usar todos sus núcleos sin duplicar la memoria de Flask/gunicorn:
+los procesos del pool solo importan el motor de generación.
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, wait
+from io import BytesIO
+import importlib
+import logging
+import multiprocessing
+import threading
+
+from paquete_docx import COMPRESION_PREDETERMINADA
+from planeacion import PLANEACION_CALENTAMIENTO
+
+logger = logging.getLogger(__name__)
+
+_generar_documento = None
+
+
+class PoolSaturado(Exception):
+    """La cola del pool está llena; el cliente debe reintentar más tarde"""
+    codigo = 503
+
+
+def _inicializar_proceso(motor):
+    """Carga el motor (módulo motor_<nombre>) en el proceso del pool (una vez por proceso)"""
+    global _generar_documento
+    _generar_documento = importlib.import_module(f'motor_{motor}').generar_documento
+
+
+def _generar(data, modalidad, compresion=COMPRESION_PREDETERMINADA):
+    """Bytes del documento y tiempos de sus fases (ms) medidos dentro del proceso"""
+    buffer = BytesIO()
+    tiempos = {}
+    _generar_documento(data, modalidad, buffer, tiempos, compresion)
+    return buffer.getvalue(), tiempos
+
+
+class PoolRender:
+    """Pool acotado de procesos generadores.
+
+    A lo más `procesos + max_cola` trabajos esperan o se ejecutan a la vez; si no hay
+    cupo, `generar` lanza PoolSaturado en lugar de encolar sin límite. Cada proceso se
+    recicla después de `trabajos_por_proceso` documentos para liberar la memoria que
+    dejan los árboles lxml grandes."""
+
+    def __init__(self, procesos, max_cola, trabajos_por_proceso, motor, timeout):
+        self.procesos = procesos
+        self.max_cola = max_cola
+        self.trabajos_por_proceso = trabajos_por_proceso
+        self.motor = motor
+        self.timeout = timeout
+        self._cupo = threading.BoundedSemaphore(procesos + max_cola)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def habilitado(self):
+        return self.procesos > 0
+
+    def iniciar(self, modalidades=()):
+        """Crea los procesos y los calienta generando un documento en cada uno"""
+        if multiprocessing.current_process().name != 'MainProcess':
+            # 'spawn' vuelve a importar el módulo principal dentro de cada proceso del
+            # pool; ahí no se debe crear otro pool
+            return
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.procesos,
+                # max_tasks_per_child no admite 'fork'; 'spawn' además evita heredar hilos
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_proceso,
+                initargs=(self.motor,),
+                max_tasks_per_child=self.trabajos_por_proceso or None
+            )
+        calentamiento = [
+            self._executor.submit(_generar, PLANEACION_CALENTAMIENTO, modalidad)
+            for modalidad in (list(modalidades) or ['abj'])[:self.procesos]
+        ]
+        wait(calentamiento)
+        logger.info(f"Pool de render iniciado: {self.procesos} procesos, cola máxima {self.max_cola}")
+
+    def generar(self, data, modalidad, tiempos=None, compresion=COMPRESION_PREDETERMINADA):
+        """Genera el documento en el pool y regresa sus bytes.
+
+        Si se da `tiempos` (dict), ahí se suman los ms de cada fase del render;
+        `compresion` es el nivel de zlib del zip"""
+        if not self._cupo.acquire(blocking=False):
+            raise PoolSaturado()
+        try:
+            if self._executor is None:
+                self.iniciar()
+            futuro = self._executor.submit(_generar, data, modalidad, compresion)
+        except BaseException:
+            self._cupo.release()
+            raise
+        # El cupo se libera cuando el proceso termina el documento, no cuando la solicitud
+        # deja de esperarlo: uno que pasó el timeout sigue ocupando su proceso
+        futuro.add_done_callback(lambda _: self._cupo.release())
+        try:
+            contenido, fases = futuro.result(timeout=self.timeout)
+        except TimeoutError:
+            futuro.cancel()  # si aún estaba en la cola ya no se genera
+            raise
+        if tiempos is not None:
+            for fase, ms in fases.items():
+                tiempos[fase] = tiempos.get(fase, 0) + ms
+        return contenido
+
+    def cerrar(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
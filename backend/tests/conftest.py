@@ -0,0 +1,28 @@
+import logging
+import os
+import sys
+
+import pytest
+
+# Los módulos del backend se importan por nombre, igual que con `gunicorn app:app`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def sin_registros_info():
+    """Cada solicitud deja un registro INFO; se silencian solo mientras corre la prueba"""
+    anterior = logging.root.manager.disable
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(anterior)
+
+
+@pytest.fixture
+def planeacion():
+    """Planeación válida de modalidad Proyecto, nueva en cada prueba"""
+    return {
+        'modalidad': 'Proyecto',
+        'titulo': 'El huerto escolar',
+        'camposFormativos': ['Lenguajes'],
+        'momentos': {'punto_partida': 'Saberes previos'},
+    }
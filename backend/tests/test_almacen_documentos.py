@@ -0,0 +1,122 @@
+from unittest import mock
+import os
+
+import pytest
+
+import app as servidor
+from almacen_documentos import AlmacenDocumentos
+from cache_documentos import CacheDocumentos
+
+
+def clave(caracter):
+    return caracter * 64
+
+
+def test_guarda_por_hash_en_subdirectorios(tmp_path):
+    almacen = AlmacenDocumentos(str(tmp_path), max_bytes=1024)
+    almacen.guardar(clave('a'), b'documento')
+
+    assert (tmp_path / 'aa' / 'aa' / (clave('a') + '.docx')).read_bytes() == b'documento'
+    assert almacen.leer(clave('a')) == b'documento'
+    assert almacen.leer(clave('b')) is None
+    assert almacen.abrir('../../etc/passwd') is None
+
+
+def test_borra_los_menos_usados_al_pasar_el_limite(tmp_path):
+    almacen = AlmacenDocumentos(str(tmp_path), max_bytes=10)
+    almacen.guardar(clave('a'), b'1234')
+    almacen.guardar(clave('b'), b'1234')
+    almacen.leer(clave('a'))
+    almacen.guardar(clave('c'), b'1234')
+
+    assert not os.path.exists(almacen.ruta(clave('b')))
+    assert almacen.leer(clave('a')) == b'1234'
+    assert almacen.estadisticas() == {'documentos': 2, 'bytes': 8, 'max_bytes': 10, 'expulsiones': 1}
+
+
+def test_al_arrancar_recupera_el_indice_en_orden_de_uso(tmp_path):
+    almacen = AlmacenDocumentos(str(tmp_path), max_bytes=100)
+    almacen.guardar(clave('a'), b'1234')
+    almacen.guardar(clave('b'), b'1234')
+    os.utime(almacen.ruta(clave('a')), (1000, 1000))
+    (tmp_path / 'aa' / 'aa' / 'interrumpido.tmp').write_bytes(b'x')
+
+    recargado = AlmacenDocumentos(str(tmp_path), max_bytes=6)
+
+    assert recargado.estadisticas()['documentos'] == 1
+    assert recargado.contiene(clave('b')) and not recargado.contiene(clave('a'))
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = AlmacenDocumentos(str(tmp_path), max_bytes=1 << 20)
+    with mock.patch.multiple(servidor, almacen_documentos=almacen,
+                             cache_documentos=CacheDocumentos(max_bytes=0, max_entradas=0, ttl=0)):
+        yield almacen
+
+
+def test_documento_generado_se_descarga_por_rangos(almacen, planeacion):
+    cliente = servidor.app.test_client()
+    generado = cliente.post('/generar-word', json=planeacion)
+    ruta = generado.headers['Content-Location']
+    etag = generado.headers['ETag']
+
+    completo = cliente.get(ruta)
+    parcial = cliente.get(ruta, headers={'Range': 'bytes=100-'})
+    misma_version = cliente.get(ruta, headers={'Range': 'bytes=0-99', 'If-Range': etag})
+    otra_version = cliente.get(ruta, headers={'Range': 'bytes=0-99', 'If-Range': '"otro"'})
+    no_modificado = cliente.get(ruta, headers={'If-None-Match': etag})
+    fuera_de_rango = cliente.get(ruta, headers={'Range': f"bytes={len(generado.data)}-"})
+
+    assert ruta == '/documentos/' + etag.strip('"')
+    assert completo.status_code == 200
+    assert completo.data == generado.data
+    assert completo.headers['ETag'] == etag
+    assert completo.headers['Accept-Ranges'] == 'bytes'
+    assert parcial.status_code == 206
+    assert parcial.data == generado.data[100:]
+    assert parcial.headers['Content-Range'] == f"bytes 100-{len(generado.data) - 1}/{len(generado.data)}"
+    assert misma_version.status_code == 206 and misma_version.data == generado.data[:100]
+    assert otra_version.status_code == 200
+    assert no_modificado.status_code == 304
+    assert fuera_de_rango.status_code == 416
+    assert cliente.get(f"/documentos/{'f' * 64}").status_code == 404
+
+
+def test_documento_del_almacen_no_se_vuelve_a_generar(almacen, planeacion):
+    cliente = servidor.app.test_client()
+    primera = cliente.post('/generar-word', json=planeacion)
+    with mock.patch.dict(servidor.MOTORES_WORD, {servidor.MOTOR_WORD: mock.Mock(side_effect=AssertionError)}):
+        segunda = cliente.post('/generar-word', json=planeacion)
+        with mock.patch.object(servidor, 'RESPUESTA_WORD', 'memoria'):
+            tercera = cliente.post('/generar-word', json=planeacion)
+
+    assert primera.status_code == segunda.status_code == tercera.status_code == 200
+    assert segunda.data == tercera.data == primera.data
+
+
+def test_documento_grande_en_disco_tambien_se_guarda(almacen, planeacion):
+    cliente = servidor.app.test_client()
+    with mock.patch.object(servidor, 'RESPUESTA_UMBRAL', 1024):
+        generado = cliente.post('/generar-word', json=planeacion)
+
+    assert generado.status_code == 200
+    assert almacen.leer(generado.headers['ETag'].strip('"')) == generado.data
+
+
+def test_otro_motor_no_usa_el_documento_del_almacen(almacen, planeacion):
+    cliente = servidor.app.test_client()
+    primera = cliente.post('/generar-word', json=planeacion)
+    motor = mock.Mock(wraps=servidor.MOTORES_WORD[servidor.MOTOR_WORD])
+    with mock.patch.dict(servidor.MOTORES_WORD, {servidor.MOTOR_WORD: motor}), \
+            mock.patch.object(servidor, 'VERSION_MOTOR', 'plantilla:otra'):
+        segunda = cliente.post('/generar-word', json=planeacion)
+
+    assert primera.status_code == segunda.status_code == 200
+    motor.assert_called_once()
+    assert segunda.headers['ETag'] != primera.headers['ETag']
+
+
+def test_version_del_motor_incluye_el_hash_de_la_plantilla():
+    assert servidor.version_motor('ooxml') == 'ooxml'
+    assert servidor.version_motor('plantilla').startswith('plantilla:')
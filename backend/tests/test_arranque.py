@@ -0,0 +1,49 @@
+import json
+import os
+import runpy
+import subprocess
+import sys
+
+DIRECTORIO_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Presupuesto de arranque en segundos: carga de la app y calentamiento del motor. Con
+# holgura para máquinas de CI lentas; en un contenedor de Railway tarda menos de la mitad
+PRESUPUESTO_CARGA = 1.5
+PRESUPUESTO_CALENTAMIENTO = 4.0
+
+# Corre en un proceso nuevo: en el de pytest los motores ya están importados
+_ARRANQUE = '''
+import json, logging, sys, time
+inicio = time.perf_counter()
+import app
+carga = time.perf_counter() - inicio
+cliente = app.app.test_client()
+estados = [cliente.get(ruta).status_code for ruta in ('/', '/test', '/modalidades')]
+sin_docx = 'docx' not in sys.modules and not any(nombre.startswith('motor_') and nombre != 'motor_vista' for nombre in sys.modules)
+calentamiento = app.calentar() / 1000
+print(json.dumps({'carga': carga, 'estados': estados, 'sin_docx': sin_docx,
+                  'calentamiento': calentamiento, 'docx_al_calentar': 'docx' in sys.modules}))
+'''
+
+
+def test_arranque_dentro_del_presupuesto_y_sin_motores_en_rutas_ligeras():
+    entorno = dict(os.environ, LOG_NIVEL='WARNING', RENDER_PROCESOS='0')
+    salida = subprocess.run(
+        [sys.executable, '-c', _ARRANQUE], cwd=DIRECTORIO_BACKEND, env=entorno,
+        capture_output=True, text=True, timeout=60, check=True
+    )
+    arranque = json.loads(salida.stdout.splitlines()[-1])
+
+    assert arranque['estados'] == [200, 200, 200]
+    assert arranque['sin_docx']
+    assert arranque['docx_al_calentar']
+    assert arranque['carga'] < PRESUPUESTO_CARGA
+    assert arranque['calentamiento'] < PRESUPUESTO_CALENTAMIENTO
+
+
+def test_configuracion_de_gunicorn_precarga_y_calienta():
+    configuracion = runpy.run_path(os.path.join(DIRECTORIO_BACKEND, 'gunicorn.conf.py'))
+
+    assert configuracion['preload_app'] is True
+    assert callable(configuracion['on_starting'])
+    assert callable(configuracion['post_fork'])
@@ -0,0 +1,120 @@
+from unittest import mock
+import asyncio
+import io
+import json
+import threading
+import zipfile
+
+import asgi
+import app as servidor
+from cache_documentos import CacheDocumentos
+
+
+async def llamar(app, metodo, ruta, cuerpo=b'', encabezados=(), enviados=None):
+    """Una solicitud ASGI completa; regresa (estado, encabezados, cuerpo). Los mensajes
+    enviados quedan en `enviados` si se pasa una lista"""
+    pendientes = [{'type': 'http.request', 'body': cuerpo, 'more_body': False}]
+    enviados = [] if enviados is None else enviados
+
+    async def receive():
+        if pendientes:
+            return pendientes.pop(0)
+        await asyncio.Event().wait()  # el cliente sigue conectado
+
+    async def send(mensaje):
+        enviados.append(mensaje)
+
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': metodo, 'scheme': 'http', 'path': ruta,
+        'root_path': '', 'query_string': b'', 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+        'headers': [(b'content-length', str(len(cuerpo)).encode()), *encabezados],
+    }
+    await app(scope, receive, send)
+    inicio = enviados[0]
+    return (inicio['status'], {nombre.decode(): valor.decode() for nombre, valor in inicio['headers']},
+            b''.join(mensaje.get('body', b'') for mensaje in enviados[1:]))
+
+
+def post_json(app, ruta, data):
+    return llamar(app, 'POST', ruta, json.dumps(data).encode(), [(b'content-type', b'application/json')])
+
+
+def motor_bloqueado(liberar):
+    def generar_documento(data, modalidad, destino, tiempos=None, compresion=None):
+        liberar.wait(5)
+        destino.write(b'documento')
+    return generar_documento
+
+
+def test_clases_de_rutas():
+    assert asgi.clase_ruta('GET', '/') == 'ligera'
+    assert asgi.clase_ruta('GET', '/modalidades') == 'ligera'
+    assert asgi.clase_ruta('POST', '/generar-word') == 'documentos'
+    assert asgi.clase_ruta('GET', '/jobs/abc/result') == 'documentos'
+    assert asgi.clase_ruta('GET', '/jobs/abc') == 'general'
+    assert asgi.clase_ruta('POST', '/modalidades') == 'general'
+
+
+def test_misma_respuesta_que_la_app_wsgi(planeacion):
+    wsgi = servidor.app.test_client().post('/generar-word', json=planeacion)
+    estado, encabezados, cuerpo = asyncio.run(post_json(asgi.app, '/generar-word', planeacion))
+
+    assert estado == 200
+    assert cuerpo == wsgi.data
+    assert encabezados['etag'] == wsgi.headers['ETag']
+    assert encabezados['content-type'] == wsgi.headers['Content-Type']
+
+
+def test_rutas_ligeras_no_esperan_a_los_documentos(planeacion):
+    liberar = threading.Event()
+    app = asgi.AppASGI(servidor.app, {'documentos': 1, 'general': 1}, espera_maxima=0.2)
+
+    async def escenario():
+        documentos = [asyncio.ensure_future(post_json(app, '/generar-word', dict(planeacion, titulo=titulo)))
+                      for titulo in ('uno', 'dos')]
+        salud = await asyncio.wait_for(llamar(app, 'GET', '/'), 1)
+        modalidades = await asyncio.wait_for(llamar(app, 'GET', '/modalidades'), 1)
+        # El segundo documento no cabe y agota su espera mientras el primero sigue
+        await asyncio.wait([documentos[1]], timeout=2)
+        liberar.set()
+        return salud, modalidades, await documentos[0], await documentos[1]
+
+    with mock.patch.object(servidor, 'cache_documentos', CacheDocumentos(max_bytes=0, max_entradas=0, ttl=0)), \
+            mock.patch.dict(servidor.MOTORES_WORD, {servidor.MOTOR_WORD: motor_bloqueado(liberar)}):
+        salud, modalidades, primero, segundo = asyncio.run(escenario())
+
+    assert salud[0] == modalidades[0] == 200
+    assert json.loads(modalidades[2])['modalidades'] == servidor.NOMBRES_MODALIDADES
+    assert primero[0] == 200 and primero[2] == b'documento'
+    assert segundo[0] == 503 and segundo[1]['retry-after'] == str(servidor.RENDER_RETRY_AFTER)
+
+
+def test_lote_por_partes_desde_el_pool(planeacion):
+    estado, _, cuerpo = asyncio.run(post_json(asgi.app, '/generar-word/batch', [planeacion, {'modalidad': 'Otra'}]))
+
+    with zipfile.ZipFile(io.BytesIO(cuerpo)) as paquete:
+        manifiesto = json.loads(paquete.read('manifest.json'))
+    assert estado == 200
+    assert [elemento['estado'] for elemento in manifiesto['documentos']] == ['ok', 'error']
+
+
+def test_cuerpo_mayor_al_maximo(planeacion):
+    with mock.patch.dict(servidor.app.config, MAX_CONTENT_LENGTH=10):
+        estado, _, cuerpo = asyncio.run(post_json(asgi.app, '/generar-word/batch', [planeacion]))
+
+    assert estado == 413
+    assert json.loads(cuerpo)['maximo_bytes'] == 10
+
+
+def test_cuerpo_vacio_termina_la_respuesta():
+    _, encabezados, _ = asyncio.run(llamar(asgi.app, 'GET', '/modalidades'))
+    no_modificado, cabeza = [], []
+    estado_304, _, _ = asyncio.run(llamar(asgi.app, 'GET', '/modalidades', encabezados=[
+        (b'if-none-match', encabezados['etag'].encode())], enviados=no_modificado))
+    estado_head, _, cuerpo = asyncio.run(llamar(asgi.app, 'HEAD', '/', enviados=cabeza))
+
+    assert estado_304 == 304
+    assert estado_head == 200 and cuerpo == b''
+    for enviados in (no_modificado, cabeza):
+        assert enviados[-1] == {'type': 'http.response.body', 'body': b'', 'more_body': False}
+        assert [mensaje['type'] for mensaje in enviados].count('http.response.body') == 1
@@ -0,0 +1,31 @@
+import pytest
+
+import app as servidor
+from benchmarks.cargas import ESCALAS, planeacion_sintetica
+from benchmarks.generar_word import comparar, medir
+
+
+@pytest.mark.parametrize('modalidad', list(servidor.MODALIDADES_CONFIG))
+def test_planeaciones_sinteticas_son_validas(modalidad):
+    for escala in ESCALAS:
+        data = planeacion_sintetica(modalidad, escala)
+        assert servidor.validar_planeacion(data) == modalidad
+        assert len(data['camposFormativos']) == ESCALAS[escala]
+
+
+def test_medir_reporta_todas_las_fases():
+    resultado = medir(servidor, 'abj', 'chica', repeticiones=1)
+
+    assert set(resultado['fases_ms']) == {'json', 'compilar', 'esqueleto', 'tabla1', 'tabla2', 'tabla3', 'tabla4', 'tabla5', 'guardar'}
+    assert resultado['pico_kb'] > 0
+    assert resultado['documentos_por_segundo'] > 0
+
+
+def test_comparar_detecta_regresiones():
+    base = {'abj/chica': {'mediana_ms': 10.0, 'pico_kb': 100.0}}
+
+    assert comparar({'abj/chica': {'mediana_ms': 14.0, 'pico_kb': 110.0}}, base, 0.5, 0.2) == []
+    regresiones = comparar({'abj/chica': {'mediana_ms': 16.0, 'pico_kb': 130.0}}, base, 0.5, 0.2)
+    assert len(regresiones) == 2
+    # Combinaciones sin línea base no se comparan
+    assert comparar({'proyecto/chica': {'mediana_ms': 99.0, 'pico_kb': 999.0}}, base, 0.5, 0.2) == []
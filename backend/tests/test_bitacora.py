@@ -0,0 +1,62 @@
+import json
+import logging
+
+import pytest
+
+import app as servidor
+import bitacora
+
+
+def registro(nivel, mensaje='mensaje', campos=None):
+    record = logging.LogRecord('prueba', nivel, __file__, 1, mensaje, None, None)
+    if campos is not None:
+        record.campos = campos
+    return record
+
+
+def test_formato_json_incluye_campos_extra():
+    linea = json.loads(bitacora.FormatoJSON().format(registro(logging.INFO, 'solicitud', {'ruta': '/x', 'duracion_ms': 1.5})))
+
+    assert isinstance(linea.pop('ts'), float)
+    assert linea == {
+        'nivel': 'INFO',
+        'logger': 'prueba',
+        'mensaje': 'solicitud',
+        'ruta': '/x',
+        'duracion_ms': 1.5,
+    }
+
+
+def test_muestreo_solo_filtra_debug():
+    filtro = bitacora.MuestreoDebug(tasa=0.0)
+
+    bitacora.muestrear_solicitud(0.0)
+    assert filtro.filter(registro(logging.INFO))
+    assert not filtro.filter(registro(logging.DEBUG))
+
+    bitacora.muestrear_solicitud(1.0)
+    assert filtro.filter(registro(logging.DEBUG))
+
+
+@pytest.fixture
+def logging_habilitado():
+    # conftest.sin_registros_info silencia INFO durante cada prueba
+    anterior = logging.root.manager.disable
+    logging.disable(logging.NOTSET)
+    yield
+    logging.disable(anterior)
+
+
+def test_un_registro_por_solicitud_con_tiempos(caplog, logging_habilitado):
+    cliente = servidor.app.test_client()
+
+    with caplog.at_level(logging.INFO, logger='app'):
+        respuesta = cliente.post('/generar-word', json={'modalidad': 'Talleres', 'titulo': 'Bitácora'})
+
+    registros = [r for r in caplog.records if r.name == 'app' and r.levelno >= logging.INFO]
+    assert respuesta.status_code == 200
+    assert len(registros) == 1
+    campos = registros[0].campos
+    assert (campos['ruta'], campos['estado'], campos['modalidad']) == ('/generar-word', 200, 'talleres')
+    assert campos['duracion_ms'] >= 0
+    assert 'render_ms' in campos or campos['cache']
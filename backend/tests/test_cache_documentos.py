@@ -0,0 +1,75 @@
+from unittest import mock
+
+import app as servidor
+from cache_documentos import CacheDocumentos, clave_documento
+
+
+def test_clave_no_depende_del_orden_de_las_llaves(planeacion):
+    reordenada = dict(reversed(list(planeacion.items())))
+    assert clave_documento(planeacion, 'proyecto') == clave_documento(reordenada, 'proyecto')
+    assert clave_documento(planeacion, 'proyecto') != clave_documento(dict(planeacion, titulo='Otro'), 'proyecto')
+
+
+def test_expulsa_la_entrada_menos_usada():
+    cache = CacheDocumentos(max_bytes=1024, max_entradas=2, ttl=60)
+    cache.guardar('a', b'1')
+    cache.guardar('b', b'2')
+    cache.obtener('a')
+    cache.guardar('c', b'3')
+
+    assert cache.obtener('b') is None
+    assert cache.obtener('a') == b'1'
+    assert cache.estadisticas()['expulsiones'] == 1
+
+
+def test_respeta_el_limite_de_bytes():
+    cache = CacheDocumentos(max_bytes=10, max_entradas=100, ttl=60)
+    cache.guardar('a', b'x' * 6)
+    cache.guardar('b', b'y' * 6)
+    cache.guardar('grande', b'z' * 11)
+
+    assert cache.obtener('a') is None
+    assert cache.obtener('b') == b'y' * 6
+    assert cache.obtener('grande') is None
+    assert cache.estadisticas()['bytes'] == 6
+
+
+def test_entradas_expiran():
+    cache = CacheDocumentos(max_bytes=1024, max_entradas=10, ttl=5)
+    with mock.patch('cache_documentos.time.monotonic', return_value=100.0):
+        cache.guardar('a', b'1')
+    with mock.patch('cache_documentos.time.monotonic', return_value=106.0):
+        assert cache.obtener('a') is None
+
+
+@mock.patch.object(servidor, 'cache_documentos', CacheDocumentos(max_bytes=1 << 20, max_entradas=10, ttl=60))
+def test_generar_word_usa_cache_y_etag(planeacion):
+    cliente = servidor.app.test_client()
+
+    primera = cliente.post('/generar-word', json=planeacion)
+    with mock.patch.dict(servidor.MOTORES_WORD, {servidor.MOTOR_WORD: mock.Mock(side_effect=AssertionError)}):
+        segunda = cliente.post('/generar-word', json=planeacion)
+        no_modificado = cliente.post('/generar-word', json=planeacion,
+                                     headers={'If-None-Match': primera.headers['ETag']})
+
+    assert primera.status_code == segunda.status_code == 200
+    assert segunda.data == primera.data
+    assert segunda.headers['ETag'] == primera.headers['ETag']
+    assert no_modificado.status_code == 304
+    assert no_modificado.data == b''
+    estadisticas = cliente.get('/cache/estadisticas').get_json()
+    assert (estadisticas['aciertos'], estadisticas['fallos']) == (1, 1)
+
+
+@mock.patch.object(servidor, 'cache_documentos', CacheDocumentos(max_bytes=1 << 20, max_entradas=10, ttl=60))
+def test_acierto_usa_el_reporte_de_momentos_guardado(planeacion):
+    cliente = servidor.app.test_client()
+    planeacion = dict(planeacion, momentos={'punto_partida': 'Saberes previos', 'desconocido': 'x'})
+
+    primera = cliente.post('/generar-word', json=planeacion)
+    with mock.patch.object(servidor, 'resolver_momentos', side_effect=AssertionError):
+        segunda = cliente.post('/generar-word', json=planeacion)
+
+    assert segunda.status_code == 200
+    assert segunda.headers['X-Momentos-Reporte'] == primera.headers['X-Momentos-Reporte']
+    assert 'desconocido' in primera.headers['X-Momentos-Reporte']
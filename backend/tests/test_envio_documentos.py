@@ -0,0 +1,79 @@
+from io import BytesIO
+from unittest import mock
+import threading
+import zipfile
+
+import pytest
+
+import app as servidor
+from cache_documentos import clave_documento
+import motor_ooxml
+from envio_documentos import enviar_por_partes, generar_en_spool
+
+
+PLANEACION = {'modalidad': 'Rincones', 'titulo': 'Envío', 'materiales': ['Bloques'] * 200}
+
+
+def render(destino):
+    motor_ooxml.generar_documento(PLANEACION, 'rincones', destino)
+
+
+def test_por_partes_entrega_el_zip_completo_y_lo_conserva():
+    conservado = []
+    archivo = enviar_por_partes(render, tam_bloque=1024, conservar_hasta=10 ** 6, al_terminar=conservado.append)
+
+    bloques = list(iter(lambda: archivo.read(1024), b''))
+
+    assert len(bloques) > 1
+    contenido = b''.join(bloques)
+    assert zipfile.ZipFile(BytesIO(contenido)).testzip() is None
+    assert conservado == [contenido]
+
+
+def test_por_partes_lanza_el_error_del_motor_antes_de_responder():
+    def falla(destino):
+        raise ValueError('texto inválido')
+
+    with pytest.raises(ValueError):
+        enviar_por_partes(falla)
+
+
+def test_cerrar_antes_de_tiempo_detiene_al_motor():
+    terminado = threading.Event()
+
+    def lento(destino):
+        try:
+            for _ in range(1000):
+                destino.write(b'x' * 1024)
+        finally:
+            terminado.set()
+
+    archivo = enviar_por_partes(lento, tam_bloque=1024, max_bloques=1)
+    archivo.read(1024)
+    archivo.close()
+
+    assert terminado.wait(5)
+
+
+def test_spool_pasa_a_disco_arriba_del_umbral():
+    archivo, tamano, en_disco = generar_en_spool(render, umbral=1024)
+
+    assert en_disco
+    assert zipfile.ZipFile(archivo).testzip() is None
+    assert archivo.seek(0, 2) == tamano
+
+
+@pytest.mark.parametrize('modo,umbral', [('partes', 10 ** 6), ('spool', 1024), ('spool', 10 ** 6)])
+def test_generar_word_en_cada_modo(modo, umbral):
+    cliente = servidor.app.test_client()
+    planeacion = dict(PLANEACION, titulo=f'Envío {modo} {umbral}')
+
+    with mock.patch.multiple(servidor, RESPUESTA_WORD=modo, RESPUESTA_UMBRAL=umbral):
+        respuesta = cliente.post('/generar-word', json=planeacion)
+
+    assert respuesta.status_code == 200
+    assert zipfile.ZipFile(BytesIO(respuesta.data)).testzip() is None
+    assert respuesta.headers['ETag']
+    # Solo los documentos que caben en el umbral entran a la cache
+    en_cache = clave_documento(planeacion, 'rincones', servidor.VERSION_MOTOR) in servidor.cache_documentos._entradas
+    assert en_cache == (umbral > 1024)
@@ -0,0 +1,111 @@
+from io import BytesIO
+from unittest import mock
+import json
+import os
+
+import pytest
+
+import app as servidor
+import esquema
+from esquema import ErrorEsquema, compilar_esquema
+
+
+GOLDEN = os.path.join(os.path.dirname(__file__), 'golden')
+CASOS = sorted(nombre[:-len('.json')] for nombre in os.listdir(GOLDEN) if nombre.endswith('.json'))
+
+
+def cargar(nombre):
+    with open(os.path.join(GOLDEN, f'{nombre}.json'), encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+@pytest.mark.parametrize('caso', CASOS)
+def test_planeaciones_golden_cumplen_el_esquema(caso):
+    servidor.esquema_planeacion.validar(cargar(caso))
+
+
+def test_error_con_la_ruta_del_campo():
+    validador = compilar_esquema(max_texto=10, max_elementos=3)
+    data = {'procesosDesarrollo': [{'gradosPorContenido': {'Conteo': {'1': ['a', 7]}}}]}
+
+    with pytest.raises(ErrorEsquema) as error:
+        validador.validar(data)
+
+    assert error.value.ruta == 'procesosDesarrollo[0].gradosPorContenido["Conteo"]["1"][1]'
+    assert error.value.codigo == 400
+    assert 'se recibió int' in str(error.value)
+
+    with pytest.raises(ErrorEsquema) as error:
+        validador.validar({'materiales': ['a', 'b', 'c', 'd']})
+    assert (error.value.ruta, error.value.codigo, error.value.maximo) == ('materiales', 413, 3)
+
+
+def test_proceso_malformado_se_rechaza_antes_de_generar():
+    data = dict(cargar('proyecto'), procesosDesarrollo=[cargar('proyecto')['procesosDesarrollo'][0], 'Cuenta hasta 5'])
+    motor = mock.Mock(side_effect=AssertionError('no se debe generar'))
+
+    with mock.patch.dict(servidor.MOTORES_WORD, {servidor.MOTOR_WORD: motor}):
+        respuesta = servidor.app.test_client().post('/generar-word', json=data)
+
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['campo'] == 'procesosDesarrollo[1]'
+    motor.assert_not_called()
+
+
+def test_texto_demasiado_largo_responde_413():
+    data = dict(cargar('abj'), titulo='x' * 20001)
+
+    respuesta = servidor.app.test_client().post('/generar-word', json=data)
+
+    assert respuesta.status_code == 413
+    assert respuesta.get_json() == {
+        'error': 'titulo: excede el máximo de 20000 caracteres', 'campo': 'titulo', 'maximo': 20000}
+
+
+@pytest.mark.parametrize('ruta', ['/generar-word', '/jobs'])
+def test_cuerpo_mayor_al_limite_no_se_lee(ruta):
+    cuerpo = json.dumps(dict(cargar('abj'), proposito='x' * 2048))
+
+    with mock.patch.object(servidor, 'PLANEACION_MAX_BYTES', 1024), \
+            mock.patch.object(servidor, 'leer_json', side_effect=AssertionError('no se debe decodificar')):
+        respuesta = servidor.app.test_client().post(ruta, data=cuerpo, content_type='application/json')
+
+    assert respuesta.status_code == 413
+    assert respuesta.get_json()['maximo_bytes'] == 1024
+
+
+def test_lote_mayor_a_max_content_length():
+    cliente = servidor.app.test_client()
+    with mock.patch.dict(servidor.app.config, {'MAX_CONTENT_LENGTH': 1024}):
+        respuesta = cliente.post('/generar-word/batch', data='\n'.join(['{"modalidad": "abj"}'] * 100),
+                                 content_type='application/x-ndjson')
+
+    assert respuesta.status_code == 413
+    assert respuesta.get_json()['maximo_bytes'] == 1024
+
+
+@pytest.mark.parametrize('cuerpo, tipo, estado', [
+    ('{"modalidad": "abj",', 'application/json', 400),
+    ('{"modalidad": "abj"}', 'text/plain', 415),
+])
+def test_json_no_valido_o_sin_content_type(cuerpo, tipo, estado):
+    respuesta = servidor.app.test_client().post('/generar-word', data=cuerpo, content_type=tipo)
+
+    assert respuesta.status_code == estado
+    assert 'error' in respuesta.get_json()
+
+
+def test_decodificador_sin_orjson():
+    with mock.patch.object(esquema, 'orjson', None):
+        assert esquema.leer_json(b'{"titulo": "\\u00d1and\\u00fa"}') == {'titulo': 'Ñandú'}
+        with pytest.raises(ValueError):
+            esquema.leer_json(b'{"titulo": ')
+
+
+def test_cuerpo_sin_content_length_se_corta_al_pasar_el_limite():
+    cuerpo = json.dumps(dict(cargar('abj'), proposito='x' * 600000)).encode('utf-8')
+    respuesta = servidor.app.test_client().post('/generar-word', input_stream=BytesIO(cuerpo), headers={
+        'Content-Type': 'application/json', 'Transfer-Encoding': 'chunked'},
+        environ_overrides={'wsgi.input_terminated': True})
+
+    assert respuesta.status_code == 413
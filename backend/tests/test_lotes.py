@@ -0,0 +1,51 @@
+from io import BytesIO
+import json
+import zipfile
+
+import app as servidor
+from lotes import NOMBRE_MANIFIESTO
+
+
+def leer_zip(respuesta):
+    paquete = zipfile.ZipFile(BytesIO(respuesta.data))
+    return paquete, json.loads(paquete.read(NOMBRE_MANIFIESTO))
+
+
+def test_lote_json_reporta_errores_sin_fallar_el_lote():
+    cliente = servidor.app.test_client()
+
+    respuesta = cliente.post('/generar-word/batch', json=[
+        {'modalidad': 'ABJ', 'titulo': 'Uno'},
+        {'modalidad': 'inexistente'},
+        {'modalidad': 'situación didáctica', 'titulo': 'Dos'},
+    ])
+
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'application/zip'
+    paquete, manifiesto = leer_zip(respuesta)
+    assert paquete.namelist() == ['001_planeacion_abj.docx', '003_planeacion_situación_didáctica.docx', NOMBRE_MANIFIESTO]
+    assert (manifiesto['total'], manifiesto['correctos']) == (3, 2)
+    assert manifiesto['documentos'][1] == {
+        'indice': 2, 'estado': 'error', 'error': "Modalidad 'inexistente' no válida", 'codigo': 400
+    }
+    individual = cliente.post('/generar-word', json={'modalidad': 'ABJ', 'titulo': 'Uno'})
+    assert paquete.read('001_planeacion_abj.docx') == individual.data
+
+
+def test_lote_ndjson():
+    cliente = servidor.app.test_client()
+    cuerpo = '{"modalidad": "proyecto"}\n\nno es json\n{"modalidad": "talleres"}\n'
+
+    respuesta = cliente.post('/generar-word/batch', data=cuerpo, content_type='application/x-ndjson')
+
+    paquete, manifiesto = leer_zip(respuesta)
+    assert [entrada['estado'] for entrada in manifiesto['documentos']] == ['ok', 'error', 'ok']
+    assert paquete.namelist() == ['001_planeacion_proyecto.docx', '003_planeacion_talleres.docx', NOMBRE_MANIFIESTO]
+
+
+def test_lote_rechaza_cuerpo_que_no_es_arreglo():
+    cliente = servidor.app.test_client()
+
+    respuesta = cliente.post('/generar-word/batch', json={'modalidad': 'abj'})
+
+    assert respuesta.status_code == 400
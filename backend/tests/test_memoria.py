@@ -0,0 +1,144 @@
+from unittest import mock
+import os
+import runpy
+import signal
+import threading
+
+import pytest
+
+import app as servidor
+import memoria
+from cache_documentos import CacheDocumentos
+from memoria import GobernadorMemoria, MemoriaInsuficiente
+
+MB = 1024 * 1024
+
+
+def test_reserva_hasta_el_limite_y_libera():
+    gobernador = GobernadorMemoria(limite=100 * MB, base=10 * MB, factor=0, espera=0)
+    with mock.patch.object(memoria, 'rss', return_value=75 * MB):
+        primera = gobernador.reservar(0)
+        segunda = gobernador.reservar(0)
+        with pytest.raises(MemoriaInsuficiente):
+            gobernador.reservar(0)
+        primera.liberar()
+        primera.liberar()
+        with gobernador.reservar(0):
+            pass
+        segunda.liberar()
+
+    assert gobernador.reciclando is None
+
+
+def test_espera_a_que_termine_otro_render():
+    gobernador = GobernadorMemoria(limite=100 * MB, base=20 * MB, factor=0, espera=5)
+    with mock.patch.object(memoria, 'rss', return_value=70 * MB):
+        primera = gobernador.reservar(0)
+        threading.Timer(0.05, primera.liberar).start()
+        segunda = gobernador.reservar(0)
+
+    assert segunda.bytes == 20 * MB
+
+
+def test_worker_demasiado_grande_se_recicla_sin_esperar():
+    gobernador = GobernadorMemoria(limite=100 * MB, base=10 * MB, factor=0, espera=30)
+    gobernador.al_reciclar = mock.Mock()
+    with mock.patch.object(memoria, 'rss', return_value=95 * MB):
+        with pytest.raises(MemoriaInsuficiente):
+            gobernador.reservar(0)
+
+    gobernador.al_reciclar.assert_called_once_with('limite')
+
+
+def test_recicla_una_vez_por_rss():
+    gobernador = GobernadorMemoria(reciclar_en=100 * MB)
+    gobernador.al_reciclar = mock.Mock()
+    with mock.patch.object(memoria, 'rss', side_effect=[90 * MB, 150 * MB, 150 * MB, 150 * MB]), \
+            mock.patch.object(memoria, 'devolver_memoria_libre', return_value=True):
+        for _ in range(3):
+            gobernador.solicitud_terminada()
+
+    gobernador.al_reciclar.assert_called_once_with('rss')
+
+
+def test_gunicorn_retira_al_worker_que_crecio():
+    configuracion = runpy.run_path(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                'gunicorn.conf.py'))
+    with mock.patch('os.kill') as kill:
+        configuracion['retirar_worker']('rss')
+
+    kill.assert_called_once_with(os.getpid(), signal.SIGTERM)
+
+
+def test_muestrea_una_solicitud_a_la_vez():
+    gobernador = GobernadorMemoria(muestreo=1)
+    muestra = gobernador.muestrear()
+
+    assert gobernador.muestrear() is None
+    assert gobernador.terminar_muestra(muestra) >= 0
+    assert gobernador.muestrear() is not None
+
+
+def test_descarta_muestras_con_otros_renders():
+    gobernador = GobernadorMemoria(muestreo=1)
+    otro = gobernador.reservar(0)
+    con_otro_en_curso = gobernador.muestrear()
+    otro.liberar()
+    assert gobernador.terminar_muestra(con_otro_en_curso) is None
+
+    sola = gobernador.muestrear()
+    with gobernador.reservar(0):
+        pass
+    assert gobernador.terminar_muestra(sola) is not None
+
+    con_dos_renders = gobernador.muestrear()
+    with gobernador.reservar(0), gobernador.reservar(0):
+        pass
+    assert gobernador.terminar_muestra(con_dos_renders) is None
+
+
+@pytest.fixture
+def sin_cache():
+    with mock.patch.object(servidor, 'cache_documentos', CacheDocumentos(max_bytes=0, max_entradas=0, ttl=0)):
+        yield
+
+
+def test_generar_word_responde_503_sobre_el_limite(sin_cache, planeacion):
+    gobernador = GobernadorMemoria(limite=100 * MB, base=10 * MB, factor=0, espera=0)
+    motor = mock.Mock(side_effect=AssertionError)
+    with mock.patch.object(servidor, 'gobernador_memoria', gobernador), \
+            mock.patch.object(memoria, 'rss', return_value=85 * MB), \
+            mock.patch.dict(servidor.MOTORES_WORD, {servidor.MOTOR_WORD: motor}):
+        gobernador.reservar(0)  # otro render en curso
+        cliente = servidor.app.test_client()
+        respuestas = [cliente.post('/generar-word', json=planeacion)]
+        with mock.patch.object(servidor, 'RESPUESTA_WORD', 'memoria'):
+            respuestas.append(cliente.post('/generar-word', json=planeacion))
+        with mock.patch.object(servidor, 'RESPUESTA_WORD', 'partes'):
+            respuestas.append(cliente.post('/generar-word', json=planeacion))
+
+    assert [respuesta.status_code for respuesta in respuestas] == [503, 503, 503]
+    assert respuestas[0].headers['Retry-After'] == str(servidor.RENDER_RETRY_AFTER)
+    motor.assert_not_called()
+
+
+def test_pico_de_memoria_en_metrics(sin_cache, planeacion):
+    with mock.patch.object(servidor, 'gobernador_memoria', GobernadorMemoria(muestreo=1)):
+        cliente = servidor.app.test_client()
+        assert cliente.post('/generar-word', json=planeacion).status_code == 200
+        texto = cliente.get('/metrics').get_data(as_text=True)
+
+    assert 'plantcher_memoria_pico_bytes_count{modalidad="proyecto",tamano="<16KB"}' in texto
+    assert 'plantcher_memoria_rss_bytes ' in texto
+
+
+def test_por_partes_la_muestra_termina_al_cerrar(sin_cache, planeacion):
+    gobernador = GobernadorMemoria(muestreo=1)
+    with mock.patch.object(servidor, 'gobernador_memoria', gobernador), \
+            mock.patch.object(servidor, 'RESPUESTA_WORD', 'partes'), \
+            mock.patch.object(gobernador, 'terminar_muestra', wraps=gobernador.terminar_muestra) as terminar:
+        respuesta = servidor.app.test_client().post('/generar-word', json=planeacion)
+        terminar.assert_not_called()
+        respuesta.close()
+
+    terminar.assert_called_once()
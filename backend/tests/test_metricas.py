@@ -0,0 +1,105 @@
+from unittest import mock
+
+import pytest
+
+import app as servidor
+from cache_documentos import CacheDocumentos
+from metricas import RegistroMetricas
+
+
+FASES = ['json', 'compilar', 'esqueleto', 'tabla1', 'tabla2', 'tabla3', 'tabla4', 'tabla5', 'guardar']
+
+
+def test_exposicion_de_contadores_e_histogramas():
+    registro = RegistroMetricas()
+    contador = registro.contador('prueba_total', 'Contador de prueba', ('ruta',))
+    histograma = registro.histograma('prueba_segundos', 'Histograma de prueba', ('fase',), buckets=(0.1, 1.0))
+    contador.inc(ruta='/a"b')
+    contador.inc(2, ruta='/a"b')
+    for valor in (0.05, 0.5, 5):
+        histograma.observar(valor, fase='tabla1')
+
+    lineas = registro.exponer().splitlines()
+
+    assert '# TYPE prueba_total counter' in lineas
+    assert 'prueba_total{ruta="/a\\"b"} 3' in lineas
+    assert 'prueba_segundos_bucket{fase="tabla1",le="0.1"} 1' in lineas
+    assert 'prueba_segundos_bucket{fase="tabla1",le="1.0"} 2' in lineas
+    assert 'prueba_segundos_bucket{fase="tabla1",le="+Inf"} 3' in lineas
+    assert 'prueba_segundos_sum{fase="tabla1"} 5.55' in lineas
+    assert 'prueba_segundos_count{fase="tabla1"} 3' in lineas
+
+
+def test_etiquetas_incompletas():
+    contador = RegistroMetricas().contador('prueba_total', 'Contador de prueba', ('ruta', 'metodo'))
+    with pytest.raises(ValueError):
+        contador.inc(ruta='/')
+
+
+@pytest.mark.parametrize('modo', ['memoria', 'spool', 'partes'])
+def test_generar_word_registra_fases_y_server_timing(modo):
+    cliente = servidor.app.test_client()
+    antes = {fase: servidor.duracion_fase.conteo(fase=fase) for fase in FASES + ['envio']}
+    documentos = servidor.tamano_documento.conteo()
+
+    with mock.patch.object(servidor, 'RESPUESTA_WORD', modo):
+        respuesta = cliente.post('/generar-word', json={'modalidad': 'Talleres', 'titulo': f'Métricas {modo}'})
+        respuesta.close()
+
+    assert respuesta.status_code == 200
+    server_timing = respuesta.headers['Server-Timing']
+    assert server_timing.startswith('json;dur=')
+    assert 'total;dur=' in server_timing
+    for fase in FASES + ['envio']:
+        assert servidor.duracion_fase.conteo(fase=fase) == antes[fase] + 1
+    assert servidor.tamano_documento.conteo() == documentos + 1
+    assert servidor.duracion_documento.conteo(modalidad='talleres') > 0
+
+
+def test_metrics_expone_solicitudes_errores_y_cache():
+    cliente = servidor.app.test_client()
+    cliente.post('/generar-word', json={'modalidad': 'inexistente'}).close()
+    with mock.patch.object(servidor, 'enviar_documento', side_effect=RuntimeError('falla')):
+        cliente.post('/generar-word', json={'modalidad': 'Talleres', 'titulo': 'Error'}).close()
+
+    respuesta = cliente.get('/metrics')
+    texto = respuesta.get_data(as_text=True)
+
+    assert respuesta.mimetype == 'text/plain'
+    assert 'version=0.0.4' in respuesta.headers['Content-Type']
+    assert 'plantcher_solicitudes_total{ruta="/generar-word",metodo="POST",estado="400"}' in texto
+    assert 'plantcher_errores_total{ruta="/generar-word"}' in texto
+    assert 'plantcher_solicitudes_en_curso 1' in texto
+    assert 'plantcher_cache_aciertos_total' in texto
+
+
+def test_por_partes_el_motor_marca_sus_fases_aparte():
+    motor = mock.Mock(wraps=servidor.MOTORES_WORD[servidor.MOTOR_WORD])
+    with mock.patch.object(servidor, 'RESPUESTA_WORD', 'partes'), \
+            mock.patch.object(servidor, 'cache_documentos', CacheDocumentos(max_bytes=0, max_entradas=0, ttl=0)), \
+            mock.patch.dict(servidor.MOTORES_WORD, {servidor.MOTOR_WORD: motor}):
+        respuesta = servidor.app.test_client().post('/generar-word', json={'modalidad': 'Talleres', 'titulo': 'Aparte'})
+        respuesta.close()
+
+    tiempos_render = motor.call_args.kwargs['tiempos']
+    assert 'guardar' in tiempos_render and 'json' not in tiempos_render
+
+
+def test_server_timing_por_partes_solo_con_fases_terminadas():
+    with mock.patch.object(servidor, 'RESPUESTA_WORD', 'partes'), \
+            mock.patch.object(servidor, 'cache_documentos', CacheDocumentos(max_bytes=0, max_entradas=0, ttl=0)):
+        respuesta = servidor.app.test_client().post('/generar-word', json={'modalidad': 'Talleres', 'titulo': 'Encabezado'})
+        respuesta.close()
+
+    assert 'json;dur=' in respuesta.headers['Server-Timing']
+    assert 'guardar;dur=' not in respuesta.headers['Server-Timing']
+
+
+def test_etiqueta_modalidad_canonica():
+    cliente = servidor.app.test_client()
+    antes = servidor.duracion_documento.conteo(modalidad='abj')
+    for modalidad in ('abj', 'ABJ ', 'Aprendizaje basado en el juego'):
+        cliente.post('/generar-word', json={'modalidad': modalidad, 'titulo': 'Etiqueta'}).close()
+
+    assert servidor.duracion_documento.conteo(modalidad='abj') == antes + 3
+    assert servidor.etiqueta_modalidad('inexistente') == 'desconocida'
@@ -0,0 +1,29 @@
+import app as servidor
+from planeacion import MODALIDADES_CONFIG, buscar_modalidad, obtener_modalidad
+
+
+def test_busqueda_ignora_acentos_mayusculas_y_espacios():
+    assert buscar_modalidad('  Unidad   DIDÁCTICA ') is buscar_modalidad('unidad didactica')
+    assert buscar_modalidad('CENTROS DE INTERÉS') is obtener_modalidad('centros')
+    assert buscar_modalidad('modalidad inexistente') is None
+
+
+def test_alias_comparten_la_misma_modalidad():
+    abj = obtener_modalidad('abj')
+
+    assert obtener_modalidad('aprendizaje basado en el juego') is abj
+    assert abj.momentos == tuple(MODALIDADES_CONFIG['abj'])
+    assert 'aprendizaje basado en el juego' in abj.alias
+    assert obtener_modalidad('situación didáctica').simplificada
+
+
+def test_modalidades_responde_304_con_etag():
+    cliente = servidor.app.test_client()
+
+    respuesta = cliente.get('/modalidades')
+    no_modificado = cliente.get('/modalidades', headers={'If-None-Match': respuesta.headers['ETag']})
+
+    assert respuesta.get_json()['config'] == MODALIDADES_CONFIG
+    assert 'max-age' in respuesta.headers['Cache-Control']
+    assert no_modificado.status_code == 304
+    assert no_modificado.data == b''
@@ -0,0 +1,130 @@
+"""Comparación de los motores de generación de Word contra archivos golden.
+
+Cada caso `golden/<caso>.json` es el cuerpo de una solicitud a /generar-word y
+`golden/<caso>.document.xml` es el word/document.xml esperado. Los dos motores deben
+producir exactamente ese XML y las mismas partes fijas del paquete.
+
+Para regenerar los golden con el motor python-docx:
+    ACTUALIZAR_GOLDEN=1 python -m pytest tests/test_motores.py
+"""
+from io import BytesIO
+import json
+import os
+import zipfile
+
+import pytest
+
+import motor_docx
+import motor_ooxml
+from planeacion import resolver_momentos
+
+
+DIRECTORIO_GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+CASOS = sorted(nombre[:-len('.json')] for nombre in os.listdir(DIRECTORIO_GOLDEN) if nombre.endswith('.json'))
+MOTORES = {
+    'docx': motor_docx.generar_documento,
+    'ooxml': motor_ooxml.generar_documento,
+}
+
+
+def cargar_caso(caso):
+    with open(os.path.join(DIRECTORIO_GOLDEN, f'{caso}.json'), encoding='utf-8') as archivo:
+        data = json.load(archivo)
+    return data, data['modalidad'].lower()
+
+
+def generar_partes(motor, data, modalidad):
+    """Genera el documento con el motor y regresa sus partes {nombre: bytes} en orden"""
+    buffer = BytesIO()
+    MOTORES[motor](data, modalidad, buffer)
+    with zipfile.ZipFile(buffer) as paquete:
+        assert paquete.testzip() is None
+        return {nombre: paquete.read(nombre) for nombre in paquete.namelist()}
+
+
+@pytest.fixture(scope='module', autouse=True)
+def actualizar_golden():
+    if not os.environ.get('ACTUALIZAR_GOLDEN'):
+        return
+    for caso in CASOS:
+        data, modalidad = cargar_caso(caso)
+        partes = generar_partes('docx', data, modalidad)
+        with open(os.path.join(DIRECTORIO_GOLDEN, f'{caso}.document.xml'), 'wb') as archivo:
+            archivo.write(partes['word/document.xml'])
+
+
+@pytest.mark.parametrize('motor', sorted(MOTORES))
+@pytest.mark.parametrize('caso', CASOS)
+def test_document_xml_igual_al_golden(caso, motor):
+    data, modalidad = cargar_caso(caso)
+    with open(os.path.join(DIRECTORIO_GOLDEN, f'{caso}.document.xml'), 'rb') as archivo:
+        esperado = archivo.read()
+
+    partes = generar_partes(motor, data, modalidad)
+
+    assert partes['word/document.xml'].decode('utf-8') == esperado.decode('utf-8')
+
+
+@pytest.mark.parametrize('caso', CASOS)
+def test_partes_fijas_iguales_entre_motores(caso):
+    data, modalidad = cargar_caso(caso)
+
+    partes_docx = generar_partes('docx', data, modalidad)
+    partes_ooxml = generar_partes('ooxml', data, modalidad)
+
+    assert list(partes_ooxml) == list(partes_docx)
+    for nombre in partes_docx:
+        if nombre != 'word/document.xml':
+            assert partes_ooxml[nombre] == partes_docx[nombre], nombre
+
+
+def test_motores_coinciden_con_muchas_filas_y_lineas():
+    data = {
+        'camposFormativos': [f'Campo {i}' for i in range(35)],
+        'contenidos': [f'Contenido {i}' for i in range(35)],
+        'procesosDesarrollo': [
+            {'gradosPorContenido': {f'Contenido {i}': {'1': ['a', 'b'], '2': [], '3': ['c']}}}
+            for i in range(30)
+        ],
+        'materiales': ['Hojas', 'Colores'],
+    }
+
+    partes_docx = generar_partes('docx', data, 'proyecto')
+    partes_ooxml = generar_partes('ooxml', data, 'proyecto')
+
+    documento = partes_docx['word/document.xml'].decode('utf-8')
+    assert partes_ooxml['word/document.xml'].decode('utf-8') == documento
+    # Tablas 1 a 5: encabezado más filas de datos (proyecto tiene 5 momentos)
+    assert documento.count('<w:tr>') == 2 + (1 + 35) + (1 + 5) + 2 + 2
+    assert documento.count('Grado 3:') == 30
+
+
+def test_texto_invalido_se_rechaza_en_ambos_motores():
+    data = {'titulo': 'Con byte nulo \x00'}
+    for motor in MOTORES:
+        with pytest.raises(ValueError):
+            generar_partes(motor, data, 'abj')
+
+
+def test_resolucion_de_momentos_con_alias_y_reporte():
+    descripciones, reporte = resolver_momentos({'momentos': {
+        'Planteamiento del Juego': 'alias del nombre bonito',
+        'planteamiento_juego': 'clave exacta',
+        'DESARROLLO actividades': 'sin guion bajo',
+        'juego': 'coincide con dos momentos',
+        'momento_desconocido': 'no coincide',
+    }}, 'abj')
+
+    assert descripciones == ['clave exacta', 'sin guion bajo', '', 'coincide con dos momentos']
+    assert reporte == {
+        'sin_coincidencia': ['momento_desconocido'],
+        'ambiguas': ['juego'],
+        'momentos_sin_descripcion': ['compartamos_experiencia'],
+    }
+
+
+def test_resolucion_de_momentos_ignora_acentos():
+    descripciones, reporte = resolver_momentos({'momentos': {'Situación Inicial': 'a', 'organización acciones': 'b'}}, 'taller crítico')
+
+    assert descripciones[:2] == ['a', 'b']
+    assert 'sin_coincidencia' not in reporte
@@ -0,0 +1,90 @@
+from io import BytesIO
+from unittest import mock
+import zipfile
+
+import pytest
+
+import app as servidor
+import motor_ooxml
+from paquete_docx import PaqueteDocx
+
+
+PARTES = [
+    ('[Content_Types].xml', b'<Types/>' * 50),
+    ('word/document.xml', None),
+    ('word/styles.xml', b'<w:styles/>' * 200),
+]
+
+
+class SalidaSinPosicion:
+    """Destino que solo admite write, como el envío por partes"""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+
+def escribir_documento(salida):
+    for linea in range(100):
+        salida.write(f'<w:p>{linea}</w:p>'.encode('utf-8'))
+
+
+@pytest.mark.parametrize('nivel', [0, 1, 6, 9])
+@pytest.mark.parametrize('posicionable', [True, False])
+@pytest.mark.parametrize('dinamica', ['bytes', 'stream'])
+def test_paquete_legible_por_zipfile(nivel, posicionable, dinamica):
+    paquete = PaqueteDocx(PARTES)
+    documento = BytesIO()
+    escribir_documento(documento)
+    contenido = documento.getvalue() if dinamica == 'bytes' else escribir_documento
+    destino = BytesIO() if posicionable else SalidaSinPosicion()
+
+    paquete.escribir(destino, {'word/document.xml': contenido}, nivel)
+
+    datos = destino.getvalue() if posicionable else b''.join(destino.partes)
+    with zipfile.ZipFile(BytesIO(datos)) as leido:
+        assert leido.testzip() is None
+        assert leido.namelist() == [nombre for nombre, _ in PARTES]
+        assert leido.read('word/document.xml') == documento.getvalue()
+        assert leido.read('word/styles.xml') == PARTES[2][1]
+        metodo = zipfile.ZIP_STORED if nivel == 0 else zipfile.ZIP_DEFLATED
+        assert {info.compress_type for info in leido.infolist()} == {metodo}
+
+
+def test_partes_fijas_se_comprimen_una_vez_por_nivel():
+    paquete = PaqueteDocx(PARTES)
+    fijas = paquete.partes_fijas(6)
+    destino = BytesIO()
+
+    paquete.escribir(destino, {'word/document.xml': b'<w:document/>'})
+
+    assert paquete.partes_fijas(6) is fijas
+    assert fijas['word/styles.xml'].bytes_locales in destino.getvalue()
+    assert set(paquete.partes_fijas(0)) == {'[Content_Types].xml', 'word/styles.xml'}
+
+
+def test_mismo_documento_mismos_bytes():
+    primero, segundo = BytesIO(), BytesIO()
+    motor_ooxml.generar_documento({'modalidad': 'abj', 'titulo': 'Igual'}, 'abj', primero)
+    motor_ooxml.generar_documento({'modalidad': 'abj', 'titulo': 'Igual'}, 'abj', segundo)
+
+    assert primero.getvalue() == segundo.getvalue()
+
+
+def test_lote_sin_compresion():
+    cliente = servidor.app.test_client()
+    planeacion = {'modalidad': 'talleres', 'titulo': 'Lote sin compresión'}
+
+    with mock.patch.object(servidor, 'LOTE_COMPRESION', 0):
+        respuesta = cliente.post('/generar-word/batch', json=[planeacion])
+    individual = cliente.post('/generar-word', json=planeacion)
+
+    with zipfile.ZipFile(BytesIO(respuesta.data)) as lote:
+        guardado = lote.read('001_planeacion_talleres.docx')
+    with zipfile.ZipFile(BytesIO(guardado)) as documento:
+        assert {info.compress_type for info in documento.infolist()} == {zipfile.ZIP_STORED}
+        assert documento.read('word/document.xml') == zipfile.ZipFile(BytesIO(individual.data)).read('word/document.xml')
+    assert len(guardado) > len(individual.data)
@@ -0,0 +1,93 @@
+from unittest import mock
+import marshal
+import time
+
+import pytest
+
+import app as servidor
+from perfilado import FormatoNoDisponible, PerfilesLentos, perfilar
+
+
+PLANEACION = {'modalidad': 'Proyecto', 'titulo': 'Perfil', 'materiales': ['Cartulina'] * 50}
+AUTORIZACION = {'Authorization': 'Bearer secreto'}
+
+
+def lenta():
+    fin = time.perf_counter() + 0.05
+    while time.perf_counter() < fin:
+        pass
+    return 'listo'
+
+
+def test_colapsado_cuenta_pilas_desde_la_funcion_perfilada():
+    resultado, perfil = perfilar(lenta, 'colapsado')
+
+    assert resultado == 'listo'
+    assert perfil.formatos == ['colapsado']
+    lineas = perfil.exportar('colapsado').decode('utf-8').splitlines()
+    assert lineas
+    pila, cuenta = lineas[0].rsplit(' ', 1)
+    assert pila.split(';')[0] == 'test_perfilado:lenta'
+    assert int(cuenta) > 0
+    with pytest.raises(FormatoNoDisponible):
+        perfil.exportar('pstats')
+
+
+def test_pstats_y_html_con_cprofile():
+    _, perfil = perfilar(lenta, 'pstats', modalidad='abj')
+
+    estadisticas = marshal.loads(perfil.exportar('pstats'))
+    assert any(funcion == 'lenta' for _, _, funcion in estadisticas)
+    assert '<td>lenta</td>' in perfil.exportar('html').decode('utf-8')
+    assert perfil.resumen()['modalidad'] == 'abj'
+
+
+def test_perfiles_lentos_conserva_los_mas_lentos():
+    perfiles = PerfilesLentos(cada=1, maximo=2)
+    for duracion in (5, 30, 10, 20):
+        _, perfil = perfilar(lambda: None, 'pstats')
+        perfil.duracion_ms = duracion
+        perfiles.agregar(perfil)
+
+    assert [resumen['duracion_ms'] for resumen in perfiles.lista()] == [30, 20]
+    assert PerfilesLentos(cada=0, maximo=2).toca_muestra() is False
+
+
+def test_perfil_a_pedido_requiere_token():
+    cliente = servidor.app.test_client()
+
+    with mock.patch.object(servidor, 'ADMIN_TOKEN', ''):
+        # Sin ADMIN_TOKEN el encabezado se ignora y se responde el documento
+        respuesta = cliente.post('/generar-word', json=PLANEACION, headers={'X-Perfil': 'html'})
+        assert respuesta.mimetype == servidor.MIMETYPE_DOCX
+
+    with mock.patch.object(servidor, 'ADMIN_TOKEN', 'secreto'):
+        assert cliente.post('/generar-word?perfil=html', json=PLANEACION).status_code == 403
+        assert cliente.post('/generar-word', json=PLANEACION,
+                            headers={'X-Perfil': 'svg', **AUTORIZACION}).status_code == 400
+
+        respuesta = cliente.post('/generar-word', json=PLANEACION, headers={'X-Perfil': 'colapsado', **AUTORIZACION})
+
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/plain'
+    assert respuesta.headers['X-Perfil-Id']
+    assert 'motor_' in respuesta.get_data(as_text=True)
+
+
+def test_muestreo_guarda_el_perfil_y_responde_el_documento():
+    cliente = servidor.app.test_client()
+    perfiles = PerfilesLentos(cada=1, maximo=3)
+
+    with mock.patch.multiple(servidor, ADMIN_TOKEN='secreto', perfiles_lentos=perfiles):
+        respuesta = cliente.post('/generar-word', json=dict(PLANEACION, titulo='Muestreo'))
+        assert respuesta.mimetype == servidor.MIMETYPE_DOCX
+
+        assert cliente.get('/admin/perfiles').status_code == 403
+        lista = cliente.get('/admin/perfiles', headers=AUTORIZACION).get_json()
+        assert len(lista['perfiles']) == 1
+        id_perfil = lista['perfiles'][0]['id']
+
+        html = cliente.get(f'/admin/perfiles/{id_perfil}?formato=html', headers=AUTORIZACION)
+        assert html.mimetype == 'text/html'
+        assert cliente.get(f'/admin/perfiles/{id_perfil}?formato=colapsado', headers=AUTORIZACION).status_code == 400
+        assert cliente.get('/admin/perfiles/otro', headers=AUTORIZACION).status_code == 404
@@ -0,0 +1,98 @@
+from io import BytesIO
+import json
+import os
+import zipfile
+
+from lxml import etree
+import pytest
+
+import motor_plantilla
+from modelo import compilar_planeacion
+
+
+GOLDEN = os.path.join(os.path.dirname(__file__), 'golden')
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+DOCUMENTO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    '<w:p><w:r><w:rPr><w:b/></w:rPr><w:t xml:space="preserve">Planeación {{mod</w:t></w:r>'
+    '<w:proofErr w:type="spellStart"/><w:r><w:t>alidad}}: {{</w:t></w:r>'
+    '<w:r><w:rPr><w:i/></w:rPr><w:t>titulo}}</w:t></w:r></w:p>'
+    '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>{{momento}}</w:t></w:r></w:p></w:tc>'
+    '<w:tc><w:p><w:r><w:t>{{descripcion}}</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+    '<w:p><w:r><w:t>{{materiales}}</w:t></w:r></w:p>'
+    '</w:body></w:document>'
+).encode('utf-8')
+
+
+def cargar(nombre):
+    with open(os.path.join(GOLDEN, f'{nombre}.json'), encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def escribir(segmentos, data, modalidad):
+    partes = []
+    motor_plantilla._escribir(segmentos, compilar_planeacion(data, modalidad), None, partes)
+    return etree.fromstring(b''.join(partes))
+
+
+def textos_parrafos(raiz):
+    return [''.join(t.text or '' for t in parrafo.iter(f'{W}t')) for parrafo in raiz.iter(f'{W}p')]
+
+
+def test_marcadores_partidos_en_varios_runs():
+    data = dict(cargar('abj'), titulo='Árboles & <raíces>', materiales=['Hojas', 'Lupa'])
+    raiz = escribir(motor_plantilla.compilar_documento(DOCUMENTO), data, 'abj')
+    titulo = next(raiz.iter(f'{W}p'))
+
+    assert textos_parrafos(raiz)[0] == 'Planeación ABJ: Árboles & <raíces>'
+    # Cada marcador conserva el formato del run donde empieza
+    assert titulo.findall(f'{W}r')[1].find(f'{W}rPr/{W}b') is not None
+    assert titulo.find(f'{W}proofErr') is None
+    assert len(raiz.findall(f'.//{W}tr')) == len(compilar_planeacion(data, 'abj').momentos.filas)
+    assert textos_parrafos(raiz)[-2:] == ['• Hojas', '• Lupa']
+
+
+def test_marcador_desconocido():
+    with pytest.raises(ValueError, match='nombreDocente'):
+        motor_plantilla.compilar_documento(DOCUMENTO.replace(b'{{materiales}}', b'{{nombreDocente}}'))
+
+
+def test_plantilla_del_repositorio_repite_filas():
+    data = cargar('centros_de_interes')
+    modelo = compilar_planeacion(data, 'centros de interés')
+    destino = BytesIO()
+    tiempos = {}
+
+    motor_plantilla.generar_documento(data, 'centros de interés', destino, tiempos)
+
+    with zipfile.ZipFile(destino) as paquete:
+        assert paquete.namelist() == [nombre for nombre, _ in motor_plantilla.PARTES_PLANTILLA]
+        raiz = etree.fromstring(paquete.read(motor_plantilla.PARTE_DOCUMENTO))
+    textos = textos_parrafos(raiz)
+    assert any(texto.endswith(f"CENTROS DE INTERÉS: {data['titulo']}") for texto in textos)
+    assert not any('{{' in texto for texto in textos)
+    for momento in modelo.modalidad.nombres_momentos:
+        assert momento in textos
+    for campo in data['camposFormativos']:
+        assert campo in textos
+    assert list(tiempos) == ['compilar', 'plantilla', 'guardar']
+
+
+def test_columnas_condicionales_e_ids_nuevos_por_copia():
+    def tabla_contenido(data, modalidad):
+        destino = BytesIO()
+        motor_plantilla.generar_documento(data, modalidad, destino)
+        raiz = etree.fromstring(zipfile.ZipFile(destino).read(motor_plantilla.PARTE_DOCUMENTO))
+        tabla = next(tabla for tabla in raiz.iter(f'{W}tbl') if 'Procesos de Desarrollo' in ''.join(tabla.itertext()))
+        return raiz, tabla
+
+    raiz, completa = tabla_contenido(cargar('abj'), 'abj')
+    _, simplificada = tabla_contenido(cargar('situacion_didactica'), 'situación didáctica')
+
+    assert len(completa.findall(f'{W}tblGrid/{W}gridCol')) == 5
+    assert len(simplificada.findall(f'{W}tblGrid/{W}gridCol')) == 3
+    assert {len(fila.findall(f'.//{W}tc')) for fila in simplificada.iter(f'{W}tr')} == {3}
+    assert 'Eje articulador' not in ''.join(simplificada.itertext())
+    ids = [identificador.get(f'{W}val') for identificador in raiz.iter(f'{W}id')]
+    assert len(ids) > 2 and len(ids) == len(set(ids))
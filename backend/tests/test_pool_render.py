@@ -0,0 +1,70 @@
+from concurrent.futures import Future, TimeoutError
+from io import BytesIO
+from unittest import mock
+import zipfile
+
+import pytest
+
+import app as servidor
+import motor_docx
+from pool_render import PoolRender, PoolSaturado
+
+
+PLANEACION = {'modalidad': 'talleres', 'titulo': 'Taller de cocina', 'camposFormativos': ['Lenguajes']}
+
+
+def document_xml(contenido):
+    return zipfile.ZipFile(BytesIO(contenido)).read('word/document.xml')
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = PoolRender(procesos=1, max_cola=0, trabajos_por_proceso=2, motor='docx', timeout=60)
+    pool.iniciar(['talleres'])
+    yield pool
+    pool.cerrar()
+
+
+def test_pool_genera_lo_mismo_que_el_hilo_de_la_solicitud(pool):
+    esperado = BytesIO()
+    motor_docx.generar_documento(PLANEACION, 'talleres', esperado)
+
+    # Más trabajos que trabajos_por_proceso para pasar por el reciclado del proceso
+    documentos = [pool.generar(PLANEACION, 'talleres') for _ in range(3)]
+
+    for documento in documentos:
+        assert document_xml(documento) == document_xml(esperado.getvalue())
+
+
+def test_pool_sin_cupo_lanza_saturado(pool):
+    pool._cupo.acquire()
+    try:
+        with pytest.raises(PoolSaturado):
+            pool.generar(PLANEACION, 'talleres')
+    finally:
+        pool._cupo.release()
+
+
+def test_timeout_no_libera_el_cupo_hasta_que_termina_el_proceso():
+    pool = PoolRender(procesos=1, max_cola=0, trabajos_por_proceso=0, motor='docx', timeout=0.01)
+    en_proceso = Future()
+    en_proceso.set_running_or_notify_cancel()
+    pool._executor = mock.Mock(submit=mock.Mock(return_value=en_proceso))
+
+    with pytest.raises(TimeoutError):
+        pool.generar(PLANEACION, 'talleres')
+    with pytest.raises(PoolSaturado):
+        pool.generar(PLANEACION, 'talleres')
+    en_proceso.set_result((b'documento', {}))
+    pool._executor.submit.return_value = en_proceso
+
+    assert pool.generar(PLANEACION, 'talleres') == b'documento'
+
+
+def test_generar_word_responde_503_con_retry_after():
+    saturado = mock.Mock(habilitado=True, generar=mock.Mock(side_effect=PoolSaturado))
+    with mock.patch.object(servidor, 'pool_render', saturado):
+        respuesta = servidor.app.test_client().post('/generar-word', json=dict(PLANEACION, titulo='Otro'))
+
+    assert respuesta.status_code == 503
+    assert respuesta.headers['Retry-After'] == str(servidor.RENDER_RETRY_AFTER)
@@ -0,0 +1,49 @@
+import os
+import threading
+
+from werkzeug.serving import make_server
+
+import app as servidor
+from benchmarks.prueba_carga import (
+    Trafico, comando_procfile, ejecutar_carga, leer_pesos, resumir, rss_arbol, variante
+)
+
+
+def test_variantes_del_comando_del_procfile():
+    comando = comando_procfile()
+
+    assert comando[:2] == ['gunicorn', 'app:app']
+    otra = variante(comando, 2, 8)
+    assert otra[otra.index('--workers') + 1] == '2'
+    assert otra[otra.index('--threads') + 1] == '8'
+    assert comando[comando.index('--workers') + 1] == '1'
+
+
+def test_resumen_con_percentiles_y_errores():
+    muestras = [('/', 200, float(ms)) for ms in range(1, 100)] + [('/generar-word', 503, 500.0), ('/generar-word', None, 1.0)]
+
+    resumen = resumir(muestras, [(0.0, 50 * 2 ** 20), (1.0, 60 * 2 ** 20)], segundos=2)
+
+    assert resumen['solicitudes'] == 101
+    assert resumen['por_ruta']['/']['p50_ms'] == 50.0
+    assert resumen['por_ruta']['/generar-word']['errores'] == 2
+    assert resumen['estados'] == {'200': 99, '503': 1, 'conexion': 1}
+    assert resumen['rss_max_mb'] == 60.0
+
+
+def test_carga_contra_servidor_local():
+    http = make_server('127.0.0.1', 0, servidor.app, threaded=True)
+    hilo = threading.Thread(target=http.serve_forever, daemon=True)
+    hilo.start()
+    try:
+        trafico = Trafico(leer_pesos(['/modalidades=1', '/generar-word=1']), leer_pesos(['chica=1']), semilla=3)
+        muestras, serie_rss, segundos = ejecutar_carga(
+            f'http://127.0.0.1:{http.server_port}', trafico, duracion=0.5, concurrencia=2,
+            medir_rss=lambda: rss_arbol(os.getpid()), intervalo_rss=0.1
+        )
+    finally:
+        http.shutdown()
+
+    assert muestras
+    assert all(estado == 200 for _, estado, _ in muestras)
+    assert serie_rss
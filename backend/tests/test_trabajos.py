@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+
+import app as servidor
+from trabajos import GestorTrabajos, ColaTrabajosLlena, EN_COLA, GENERANDO, TERMINADO, FALLIDO
+
+
+def test_flujo_completo_de_un_trabajo():
+    cliente = servidor.app.test_client()
+    planeacion = {'modalidad': 'centros', 'titulo': 'Los animales'}
+
+    creado = cliente.post('/jobs', json=planeacion)
+    assert creado.status_code == 202
+    id_trabajo = creado.get_json()['id']
+    assert creado.headers['Location'] == f'/jobs/{id_trabajo}'
+
+    estado = cliente.get(f'/jobs/{id_trabajo}?esperar=10').get_json()
+    assert estado['estado'] == TERMINADO
+    assert estado['resultado'] == f'/jobs/{id_trabajo}/result'
+
+    resultado = cliente.get(estado['resultado'])
+    directo = cliente.post('/generar-word', json=planeacion)
+    assert resultado.status_code == 200
+    assert resultado.data == directo.data
+    assert resultado.headers['ETag'] == directo.headers['ETag']
+
+
+def test_trabajo_con_modalidad_invalida_se_rechaza_al_encolar():
+    respuesta = servidor.app.test_client().post('/jobs', json={'modalidad': 'otra'})
+
+    assert respuesta.status_code == 400
+
+
+def test_trabajo_inexistente():
+    assert servidor.app.test_client().get('/jobs/no-existe').status_code == 404
+
+
+def test_posicion_en_cola_y_limite_de_pendientes():
+    liberar = threading.Event()
+
+    def ejecutar(data, modalidad):
+        liberar.wait(10)
+        if data == 'falla':
+            raise ValueError('sin datos')
+        return data
+
+    gestor = GestorTrabajos(ejecutar, hilos=1, ttl=60, max_pendientes=3)
+    primero = gestor.encolar('uno', 'abj')
+    segundo = gestor.encolar('falla', 'abj')
+    tercero = gestor.encolar('tres', 'abj')
+    with pytest.raises(ColaTrabajosLlena):
+        gestor.encolar('cuatro', 'abj')
+
+    assert primero.estado in (EN_COLA, GENERANDO)
+    assert (gestor.posicion(segundo), gestor.posicion(tercero)) in ((1, 2), (2, 3))
+
+    liberar.set()
+    for trabajo in (primero, segundo, tercero):
+        assert trabajo.listo.wait(10)
+    assert (primero.estado, primero.resultado) == (TERMINADO, 'uno')
+    assert (segundo.estado, segundo.error, segundo.codigo) == (FALLIDO, 'sin datos', 500)
+    assert gestor.posicion(tercero) is None
+
+
+def test_resultados_expiran():
+    gestor = GestorTrabajos(lambda data, modalidad: data, hilos=1, ttl=0, max_pendientes=1)
+    trabajo = gestor.encolar('uno', 'abj')
+    trabajo.listo.wait(10)
+
+    assert gestor.obtener(trabajo.id) is None
+
+
+class SinCupo(Exception):
+    codigo = 503
+
+
+def test_sin_cupo_el_trabajo_espera_en_la_cola_hasta_el_plazo():
+    intentos = []
+
+    def ejecutar(data, modalidad):
+        intentos.append(data)
+        if data == 'siempre' or len(intentos) < 3:
+            raise SinCupo('ocupado')
+        return data
+
+    gestor = GestorTrabajos(ejecutar, hilos=1, ttl=60, max_pendientes=3,
+                            reintentar=(SinCupo,), espera_reintento=0.01, plazo=0.2)
+    reintentado = gestor.encolar('uno', 'abj')
+    assert reintentado.listo.wait(5)
+    vencido = gestor.encolar('siempre', 'abj')
+    assert vencido.listo.wait(5)
+
+    assert reintentado.estado == TERMINADO and reintentado.resultado == 'uno'
+    assert intentos[:3] == ['uno'] * 3
+    assert vencido.estado == FALLIDO and vencido.codigo == 503
+
+
+def test_el_reintento_no_bloquea_a_los_demas_trabajos():
+    sin_cupo = threading.Event()
+
+    def ejecutar(data, modalidad):
+        if data == 'sin_cupo' and not sin_cupo.is_set():
+            raise SinCupo('ocupado')
+        return data
+
+    gestor = GestorTrabajos(ejecutar, hilos=1, ttl=60, max_pendientes=3,
+                            reintentar=(SinCupo,), espera_reintento=0.5, plazo=30)
+    esperando = gestor.encolar('sin_cupo', 'abj')
+    siguiente = gestor.encolar('dos', 'abj')
+
+    assert siguiente.listo.wait(0.4) and siguiente.resultado == 'dos'
+    assert esperando.estado == EN_COLA
+    sin_cupo.set()
+    assert esperando.listo.wait(5) and esperando.resultado == 'sin_cupo'
+
+
+def test_terminados_limitados_por_entradas_y_bytes():
+    gestor = GestorTrabajos(lambda data, modalidad: data, hilos=1, ttl=60, max_pendientes=5,
+                            max_terminados=2, max_bytes=10)
+    uno, dos = gestor.encolar('1234', 'abj'), gestor.encolar('1234', 'abj')
+    assert uno.listo.wait(5) and dos.listo.wait(5)
+    assert gestor.obtener(uno.id) is uno  # ahora dos es el menos consultado
+    tres = gestor.encolar('1234', 'abj')
+    assert tres.listo.wait(5)
+    assert gestor.obtener(dos.id) is None and gestor.obtener(uno.id) is uno
+
+    grande = gestor.encolar('x' * 20, 'abj')
+    assert grande.listo.wait(5)
+    assert gestor.obtener(grande.id) is grande
+    assert gestor.obtener(uno.id) is None and gestor.obtener(tres.id) is None
+
+
+def test_expirados_se_quitan_sin_consultas():
+    gestor = GestorTrabajos(lambda data, modalidad: data, hilos=1, ttl=0.1, max_pendientes=1)
+    trabajo = gestor.encolar('uno', 'abj')
+    assert trabajo.listo.wait(5)
+    time.sleep(0.5)
+
+    assert trabajo.id not in gestor._trabajos
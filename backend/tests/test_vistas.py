@@ -0,0 +1,74 @@
+import json
+import os
+import pickle
+
+import pytest
+
+import app as servidor
+from modelo import compilar_planeacion
+
+
+GOLDEN = os.path.join(os.path.dirname(__file__), 'golden')
+
+
+def cargar(nombre):
+    with open(os.path.join(GOLDEN, f'{nombre}.json'), encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def test_modelo_resuelve_tablas_momentos_y_procesos():
+    data = cargar('centros_de_interes')
+    modelo = compilar_planeacion(data, 'centros de interés')
+
+    assert modelo.titulo == f"Planeación CENTROS DE INTERÉS: {data['titulo']}"
+    assert [len(tabla.encabezados) for tabla in modelo.tablas] == [3, 5, 2, 1, 3]
+    assert [fila[0] for fila in modelo.momentos.filas] == list(modelo.modalidad.nombres_momentos)
+    assert modelo.contenido_curricular.filas[0][2][1] == '  Grado 1:'
+    assert modelo.procesos[0].campo == data['camposFormativos'][0]
+    assert not hasattr(modelo, '__dict__')
+    assert pickle.loads(pickle.dumps(modelo)).titulo == modelo.titulo
+
+
+def test_vista_json_con_el_mismo_contenido_que_el_modelo():
+    data = cargar('proyecto')
+    respuesta = servidor.app.test_client().post('/generar-word?format=json', json=data)
+
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'application/json'
+    vista = respuesta.get_json()
+    modelo = compilar_planeacion(data, 'proyecto')
+    assert vista['titulo'] == modelo.titulo
+    assert [tabla['nombre'] for tabla in vista['tablas']] == list(modelo.NOMBRES_TABLAS)
+    assert vista['tablas'][2]['filas'] == [list(fila) for fila in modelo.momentos.filas]
+
+
+def test_vista_html_escapa_y_responde_304():
+    cliente = servidor.app.test_client()
+    data = dict(cargar('caracteres_especiales'), titulo='<b>Ñandú & "amigos"</b>')
+
+    respuesta = cliente.post('/generar-word', json=data, headers={'Accept': 'text/html'})
+
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/html'
+    html = respuesta.get_data(as_text=True)
+    assert '&lt;b&gt;Ñandú &amp; &quot;amigos&quot;&lt;/b&gt;' in html
+    assert html.count('<table') == 5
+
+    repetida = cliente.post('/generar-word', json=data, headers={
+        'Accept': 'text/html', 'If-None-Match': respuesta.headers['ETag']})
+    assert repetida.status_code == 304
+
+
+@pytest.mark.parametrize('accept', [None, '*/*', 'application/json, text/plain, */*'])
+def test_accept_con_comodin_sigue_respondiendo_docx(accept):
+    headers = {'Accept': accept} if accept else {}
+    respuesta = servidor.app.test_client().post('/generar-word', json=cargar('abj'), headers=headers)
+
+    assert respuesta.mimetype == servidor.MIMETYPE_DOCX
+
+
+def test_formato_desconocido():
+    respuesta = servidor.app.test_client().post('/generar-word?format=pdf', json=cargar('abj'))
+
+    assert respuesta.status_code == 400
+    assert 'html' in respuesta.get_json()['formatos_disponibles']
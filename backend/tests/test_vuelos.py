@@ -0,0 +1,162 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import threading
+
+import pytest
+
+import app as servidor
+from almacen_documentos import AlmacenDocumentos
+from cache_documentos import CacheDocumentos
+from vuelos import RegistroIdempotencia, VuelosEnCurso
+
+
+class VuelosContados(VuelosEnCurso):
+    """Avisa cuando `esperados` llamadas ya se unieron a algún vuelo"""
+
+    def __init__(self, esperados):
+        super().__init__()
+        self.esperados = esperados
+        self.unidos = threading.Semaphore(0)
+
+    def unirse(self, clave):
+        resultado = super().unirse(clave)
+        self.unidos.release()
+        return resultado
+
+    def esperar_unidos(self):
+        for _ in range(self.esperados):
+            assert self.unidos.acquire(timeout=5)
+
+
+def test_ejecuta_una_vez_por_clave_y_comparte_el_resultado():
+    vuelos = VuelosContados(3)
+    liberar = threading.Event()
+    llamadas = []
+
+    def generar():
+        llamadas.append(1)
+        liberar.wait(5)
+        return b'documento'
+
+    with ThreadPoolExecutor(max_workers=3) as hilos:
+        futuros = [hilos.submit(vuelos.ejecutar, 'clave', generar, 5) for _ in range(3)]
+        vuelos.esperar_unidos()
+        liberar.set()
+        resultados = [futuro.result() for futuro in futuros]
+
+    assert len(llamadas) == 1
+    assert sorted(resultados) == [(b'documento', False), (b'documento', True), (b'documento', True)]
+    assert vuelos.en_curso() == 0
+
+
+def test_el_error_del_vuelo_llega_a_los_que_esperan():
+    vuelos = VuelosEnCurso()
+    vuelo, lider = vuelos.unirse('clave')
+    otro, segundo_lider = vuelos.unirse('clave')
+    vuelo.fallar(ValueError('texto inválido'))
+
+    assert lider and not segundo_lider and otro is vuelo
+    with pytest.raises(ValueError, match='texto inválido'):
+        otro.esperar(1)
+    # Resuelto el vuelo, la siguiente llamada genera de nuevo
+    assert vuelos.ejecutar('clave', lambda: b'nuevo') == (b'nuevo', False)
+
+
+def test_registro_de_idempotencia_expira_y_respeta_limites():
+    registro = RegistroIdempotencia(ttl=30, max_entradas=2, max_bytes=10)
+    with mock.patch('vuelos.time.monotonic', return_value=100.0):
+        registro.guardar('a', 'clave-a', b'1234')
+        registro.guardar('a', 'clave-otra', b'5678')
+        registro.guardar('b', 'clave-b', b'1234')
+        registro.guardar('c', 'clave-c', b'1234')
+        assert registro.obtener('a') is None
+        assert registro.obtener('b') == ('clave-b', b'1234')
+    with mock.patch('vuelos.time.monotonic', return_value=131.0):
+        assert registro.obtener('c') is None
+
+
+def motor_lento(liberar, llamadas):
+    def generar_documento(data, modalidad, destino, tiempos=None, compresion=None):
+        llamadas.append(modalidad)
+        liberar.wait(5)
+        destino.write(f'docx {data["titulo"]}'.encode('utf-8'))
+    return generar_documento
+
+
+@pytest.mark.parametrize('modo', ['memoria', 'spool', 'partes'])
+def test_solicitudes_identicas_concurrentes_comparten_un_render(modo, planeacion):
+    liberar = threading.Event()
+    llamadas = []
+    antes = servidor.solicitudes_coalescidas.valor(motivo='en_curso')
+
+    def solicitar():
+        with servidor.app.test_client() as cliente:
+            respuesta = cliente.post('/generar-word', json=planeacion)
+            return respuesta.status_code, respuesta.get_data()
+
+    vuelos = VuelosContados(3)
+    with mock.patch.multiple(servidor, RESPUESTA_WORD=modo, vuelos=vuelos,
+                             cache_documentos=CacheDocumentos(max_bytes=0, max_entradas=0, ttl=0)), \
+            mock.patch.dict(servidor.MOTORES_WORD, {servidor.MOTOR_WORD: motor_lento(liberar, llamadas)}):
+        with ThreadPoolExecutor(max_workers=3) as hilos:
+            futuros = [hilos.submit(solicitar) for _ in range(3)]
+            vuelos.esperar_unidos()
+            liberar.set()
+            respuestas = [futuro.result() for futuro in futuros]
+
+    assert llamadas == ['proyecto']
+    assert respuestas == [(200, 'docx El huerto escolar'.encode('utf-8'))] * 3
+    assert servidor.solicitudes_coalescidas.valor(motivo='en_curso') - antes == 2
+
+
+@mock.patch.object(servidor, 'cache_documentos', CacheDocumentos(max_bytes=0, max_entradas=0, ttl=0))
+@mock.patch.object(servidor, 'idempotencia', RegistroIdempotencia(ttl=60, max_entradas=10, max_bytes=1 << 20))
+def test_idempotency_key_repite_la_respuesta_sin_volver_a_generar(planeacion):
+    cliente = servidor.app.test_client()
+    encabezados = {'Idempotency-Key': 'toque-1'}
+
+    primera = cliente.post('/generar-word', json=planeacion, headers=encabezados)
+    with mock.patch.dict(servidor.MOTORES_WORD, {servidor.MOTOR_WORD: mock.Mock(side_effect=AssertionError)}):
+        repetida = cliente.post('/generar-word', json=planeacion, headers=encabezados)
+        otra = cliente.post('/generar-word', json=dict(planeacion, titulo='Otro'), headers=encabezados)
+    metricas = cliente.get('/metrics').get_data(as_text=True)
+
+    assert primera.status_code == repetida.status_code == 200
+    assert repetida.data == primera.data
+    assert repetida.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in primera.headers
+    assert otra.status_code == 422
+    assert 'plantcher_solicitudes_coalescidas_total{motivo="idempotencia"}' in metricas
+
+
+@pytest.mark.parametrize('modo', ['spool', 'partes'])
+def test_idempotency_key_con_documento_grande(modo, tmp_path, planeacion):
+    registro = RegistroIdempotencia(ttl=60, max_entradas=10, max_bytes=1 << 20)
+    encabezados = {'Idempotency-Key': f'grande-{modo}'}
+    with mock.patch.multiple(servidor, idempotencia=registro, RESPUESTA_WORD=modo, RESPUESTA_UMBRAL=1024,
+                             cache_documentos=CacheDocumentos(max_bytes=0, max_entradas=0, ttl=0),
+                             almacen_documentos=AlmacenDocumentos(str(tmp_path), max_bytes=1 << 20)):
+        cliente = servidor.app.test_client()
+        primera = cliente.post('/generar-word', json=planeacion, headers=encabezados)
+        primera_datos = primera.get_data()
+        primera.close()
+        motor = mock.Mock(side_effect=servidor.MOTORES_WORD[servidor.MOTOR_WORD])
+        with mock.patch.dict(servidor.MOTORES_WORD, {servidor.MOTOR_WORD: motor}):
+            repetida = cliente.post('/generar-word', json=planeacion, headers=encabezados)
+            otra = cliente.post('/generar-word', json=dict(planeacion, titulo='Otro'), headers=encabezados)
+
+    assert len(primera_datos) > 1024
+    assert registro.obtener(encabezados['Idempotency-Key'])[1] is None
+    assert repetida.status_code == 200 and repetida.data == primera_datos
+    assert otra.status_code == 422
+    if modo == 'spool':
+        # Quedó en el almacén: el reintento no vuelve a generar
+        assert repetida.headers['Idempotent-Replayed'] == 'true'
+        motor.assert_not_called()
+
+
+def test_idempotency_key_demasiado_larga(planeacion):
+    respuesta = servidor.app.test_client().post(
+        '/generar-word', json=planeacion, headers={'Idempotency-Key': 'x' * 256})
+
+    assert respuesta.status_code == 400
@@ -0,0 +1,187 @@
+"""Trabajos asíncronos de generación de documentos.
+
+El cliente recibe un id de inmediato y consulta el estado del trabajo, así que el
+tiempo de conexión deja de depender del tiempo de render. Los trabajos se ejecutan
+en un pool de hilos en segundo plano y sus resultados se conservan un tiempo (TTL)
+después de terminar, con un máximo de entradas y de bytes (se expulsan los menos
+consultados). Viven en la memoria del proceso, por lo que las consultas deben
+llegar al mismo worker que recibió el trabajo (con `--workers 1` siempre es así).
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import uuid
+
+EN_COLA = 'queued'
+GENERANDO = 'rendering'
+TERMINADO = 'done'
+FALLIDO = 'failed'
+
+
+class ColaTrabajosLlena(Exception):
+    """Hay demasiados trabajos pendientes; el cliente debe reintentar más tarde"""
+    codigo = 503
+
+
+class Trabajo:
+    """Estado de un trabajo de generación"""
+
+    def __init__(self, data, modalidad):
+        self.id = uuid.uuid4().hex
+        self.data = data
+        self.modalidad = modalidad
+        self.estado = EN_COLA
+        self.creado = time.time()
+        self.terminado = None
+        self.resultado = None  # lo que regresa la función de generación
+        self.bytes = 0  # tamaño del resultado, para el límite de los terminados
+        self.error = None
+        self.codigo = None
+        self.listo = threading.Event()
+
+    @property
+    def pendiente(self):
+        return self.estado in (EN_COLA, GENERANDO)
+
+
+class GestorTrabajos:
+    """Encola trabajos, los ejecuta en segundo plano y guarda sus resultados con TTL.
+
+    `ejecutar(data, modalidad)` produce el resultado del trabajo; si lanza una excepción
+    con atributo `codigo` ese código se reporta, si no se reporta 500. Las excepciones
+    de `reintentar` (falta de cupo momentánea) no hacen fallar al trabajo: vuelve a la
+    cola y se reintenta cada `espera_reintento` segundos hasta `plazo` segundos después
+    de creado, sin ocupar un hilo mientras espera. `al_terminar(trabajo)`, si se indica,
+    se llama cuando el trabajo termina o falla.
+
+    De los trabajos terminados se conservan a lo más `max_terminados`, y sus resultados
+    (medidos con `tamano(resultado)`) suman a lo más `max_bytes`; al pasarse se expulsan
+    los menos consultados, salvo el último en terminar."""
+
+    def __init__(self, ejecutar, hilos, ttl, max_pendientes, al_terminar=None,
+                 reintentar=(), espera_reintento=1, plazo=0,
+                 max_terminados=100, max_bytes=64 * 1024 * 1024, tamano=len):
+        self._ejecutar = ejecutar
+        self._al_terminar = al_terminar
+        self.ttl = ttl
+        self.max_pendientes = max_pendientes
+        self.reintentar = tuple(reintentar)
+        self.espera_reintento = espera_reintento
+        self.plazo = plazo
+        self.max_terminados = max_terminados
+        self.max_bytes = max_bytes
+        self._tamano = tamano
+        self._trabajos = OrderedDict()  # id -> Trabajo; los terminados, del menos al más consultado
+        self._terminados = 0
+        self._bytes = 0
+        self._limpieza = None  # temporizador que quita los expirados aunque nadie consulte
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='trabajo')
+
+    def encolar(self, data, modalidad):
+        with self._lock:
+            self._limpiar_expirados()
+            pendientes = sum(1 for trabajo in self._trabajos.values() if trabajo.pendiente)
+            if pendientes >= self.max_pendientes:
+                raise ColaTrabajosLlena()
+            trabajo = Trabajo(data, modalidad)
+            self._trabajos[trabajo.id] = trabajo
+        self._executor.submit(self._procesar, trabajo)
+        return trabajo
+
+    def obtener(self, id_trabajo):
+        with self._lock:
+            self._limpiar_expirados()
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is not None and trabajo.terminado is not None:
+                self._trabajos.move_to_end(id_trabajo)
+            return trabajo
+
+    def posicion(self, trabajo):
+        """Posición en la cola (1 = el siguiente en generarse); None si ya no está en cola"""
+        if trabajo.estado != EN_COLA:
+            return None
+        with self._lock:
+            en_cola = [t for t in self._trabajos.values() if t.estado == EN_COLA]
+        return en_cola.index(trabajo) + 1 if trabajo in en_cola else None
+
+    def _procesar(self, trabajo):
+        trabajo.estado = GENERANDO
+        try:
+            trabajo.resultado = self._ejecutar(trabajo.data, trabajo.modalidad)
+            trabajo.bytes = self._tamano(trabajo.resultado)
+            trabajo.estado = TERMINADO
+        except self.reintentar as e:
+            if time.time() + self.espera_reintento > trabajo.creado + self.plazo:
+                self._fallar(trabajo, e)
+            else:
+                # Sin cupo por ahora: el trabajo espera en la cola en lugar de fallar en
+                # la ráfaga que los trabajos existen para absorber, y el hilo queda libre
+                # para los demás mientras tanto
+                trabajo.estado = EN_COLA
+                self._en_segundos(self.espera_reintento, self._executor.submit, self._procesar, trabajo)
+                return
+        except Exception as e:
+            self._fallar(trabajo, e)
+        trabajo.data = None
+        with self._lock:
+            trabajo.terminado = time.time()
+            self._guardar_terminado(trabajo)
+        trabajo.listo.set()
+        if self._al_terminar is not None:
+            self._al_terminar(trabajo)
+
+    @staticmethod
+    def _fallar(trabajo, error):
+        trabajo.error = str(error)
+        trabajo.codigo = getattr(error, 'codigo', 500)
+        trabajo.estado = FALLIDO
+
+    @staticmethod
+    def _en_segundos(segundos, funcion, *args):
+        temporizador = threading.Timer(segundos, funcion, args)
+        temporizador.daemon = True
+        temporizador.start()
+        return temporizador
+
+    def _guardar_terminado(self, trabajo):
+        """Cuenta el trabajo recién terminado y expulsa los terminados menos consultados
+        hasta caber en los límites"""
+        self._trabajos.move_to_end(trabajo.id)
+        self._terminados += 1
+        self._bytes += trabajo.bytes
+        while self._terminados > self.max_terminados or self._bytes > self.max_bytes:
+            id_trabajo = next(
+                id_trabajo for id_trabajo, otro in self._trabajos.items() if otro.terminado is not None)
+            if id_trabajo == trabajo.id:
+                break
+            self._quitar(id_trabajo)
+        if self._limpieza is None:
+            self._programar_limpieza()
+
+    def _programar_limpieza(self):
+        """Quita los expirados cuando expire el terminado más antiguo"""
+        primero = min(trabajo.terminado for trabajo in self._trabajos.values() if trabajo.terminado is not None)
+        self._limpieza = self._en_segundos(max(primero + self.ttl - time.time(), 0), self._limpiar_periodicamente)
+
+    def _limpiar_periodicamente(self):
+        with self._lock:
+            self._limpieza = None
+            self._limpiar_expirados()
+            if self._terminados:
+                self._programar_limpieza()
+
+    def _quitar(self, id_trabajo):
+        trabajo = self._trabajos.pop(id_trabajo)
+        self._terminados -= 1
+        self._bytes -= trabajo.bytes
+
+    def _limpiar_expirados(self):
+        limite = time.time() - self.ttl
+        expirados = [
+            id_trabajo for id_trabajo, trabajo in self._trabajos.items()
+            if trabajo.terminado is not None and trabajo.terminado < limite
+        ]
+        for id_trabajo in expirados:
+            self._quitar(id_trabajo)
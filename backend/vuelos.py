@@ -0,0 +1,140 @@
+"""Coalescencia de solicitudes idénticas de documentos.
+
+Los reintentos de la app en redes móviles y los dobles toques mandan la misma
+planeación dos o tres veces en un segundo. VuelosEnCurso junta las solicitudes con la
+misma clave (el hash canónico de cache_documentos) mientras el documento se genera:
+la primera genera y las demás esperan su resultado y reciben los mismos bytes.
+
+RegistroIdempotencia extiende eso un rato después de terminar para las solicitudes
+que traen el encabezado Idempotency-Key: guarda por llave la clave de la solicitud y
+los bytes entregados, aunque la cache de documentos esté deshabilitada o ya los haya
+expulsado.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+import threading
+import time
+
+
+class Vuelo:
+    """Generación en curso de un documento; la resuelve una vez `terminar` o `fallar`"""
+
+    def __init__(self, vuelos, clave):
+        self._vuelos = vuelos
+        self.clave = clave
+        self._futuro = Future()
+
+    def terminar(self, contenido):
+        """Entrega los bytes a quienes esperan; None si el documento no quedó en memoria
+        (por ejemplo, uno grande que se sirvió desde disco) y cada quien genera el suyo"""
+        self._resolver(self._futuro.set_result, contenido)
+
+    def fallar(self, error):
+        """Los que esperan reciben el mismo error"""
+        self._resolver(self._futuro.set_exception, error)
+
+    def _resolver(self, resolver, valor):
+        self._vuelos._quitar(self)
+        try:
+            resolver(valor)
+        except InvalidStateError:
+            pass  # ya estaba resuelto
+
+    def esperar(self, timeout=None):
+        """Resultado del vuelo; relanza su error y TimeoutError si no termina a tiempo"""
+        return self._futuro.result(timeout)
+
+
+class VuelosEnCurso:
+    """Un vuelo por clave mientras se genera el documento"""
+
+    def __init__(self):
+        self._vuelos = {}
+        self._lock = threading.Lock()
+
+    def unirse(self, clave):
+        """(vuelo, True) si no había uno con esa clave: quien llama genera y debe
+        resolverlo; (vuelo, False) si se une a uno en curso y solo espera"""
+        with self._lock:
+            vuelo = self._vuelos.get(clave)
+            if vuelo is not None:
+                return vuelo, False
+            vuelo = self._vuelos[clave] = Vuelo(self, clave)
+            return vuelo, True
+
+    def _quitar(self, vuelo):
+        with self._lock:
+            if self._vuelos.get(vuelo.clave) is vuelo:
+                del self._vuelos[vuelo.clave]
+
+    def ejecutar(self, clave, generar, timeout=None):
+        """Llama `generar()` una sola vez entre las llamadas concurrentes con la misma
+        clave. Regresa (resultado, coalescida); coalescida es True si se esperó a otra"""
+        vuelo, lider = self.unirse(clave)
+        if not lider:
+            return vuelo.esperar(timeout), True
+        try:
+            resultado = generar()
+        except BaseException as e:
+            vuelo.fallar(e)
+            raise
+        vuelo.terminar(resultado)
+        return resultado, False
+
+    def en_curso(self):
+        with self._lock:
+            return len(self._vuelos)
+
+
+class RegistroIdempotencia:
+    """Documentos entregados por Idempotency-Key durante `ttl` segundos, acotado por
+    número de entradas y por bytes totales (se expulsan los más viejos). De los
+    documentos sin bytes en memoria (grandes, servidos desde disco) solo se recuerda
+    la clave"""
+
+    def __init__(self, ttl, max_entradas, max_bytes):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()  # llave -> (expira, clave, contenido)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def habilitado(self):
+        return self.ttl > 0 and self.max_entradas > 0 and self.max_bytes > 0
+
+    def obtener(self, llave):
+        """(clave, contenido) guardados con la llave (contenido None si solo se recordó la
+        clave), o None si no hay o ya expiró"""
+        with self._lock:
+            entrada = self._entradas.get(llave)
+            if entrada is None:
+                return None
+            if entrada[0] < time.monotonic():
+                self._quitar(llave)
+                return None
+            return entrada[1], entrada[2]
+
+    def guardar(self, llave, clave, contenido=None):
+        """Recuerda la respuesta de la llave; no se reemplaza una que no ha expirado. Sin
+        `contenido`, o si no cabe en `max_bytes`, solo se recuerda la clave"""
+        if not self.habilitado:
+            return
+        if contenido is not None and len(contenido) > self.max_bytes:
+            contenido = None
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(llave)
+            if entrada is not None:
+                if entrada[0] >= ahora:
+                    return
+                self._quitar(llave)
+            self._entradas[llave] = (ahora + self.ttl, clave, contenido)
+            self._bytes += len(contenido or b'')
+            while self._bytes > self.max_bytes or len(self._entradas) > self.max_entradas:
+                self._quitar(next(iter(self._entradas)))
+
+    def _quitar(self, llave):
+        _, _, contenido = self._entradas.pop(llave)
+        self._bytes -= len(contenido or b'')